@@ -5,6 +5,7 @@ from pystream.utils.general import (
     get_profiler_db_folder,
     set_profiler_db_folder,
 )
+from pystream.data.pipeline_data import DROP as _DROP
 from pystream.pipeline.pipeline import Pipeline
 from pystream.stage.stage import Stage
 
@@ -19,3 +20,9 @@ MAIN_PIPELINE_NAME = _PIPELINE_NAME_IN_PROFILE
 """
 The name of main pipeline in profiling result
 """
+
+DROP = _DROP
+"""
+Return this from a stage to drop the data. The data skips the remaining stages and
+does not come out of the pipeline
+"""
@@ -0,0 +1,134 @@
+from contextlib import contextmanager
+from threading import Lock, local
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from pystream.data.pipeline_data import PipelineData
+
+
+_BufferKey = Tuple[Tuple[int, ...], str]
+
+# The data being processed by the stage in the current thread
+_current = local()
+
+
+@contextmanager
+def borrowing_for(data: PipelineData) -> Iterator[None]:
+    """Make the buffers borrowed in the current thread belong to the given data
+    until the context ends"""
+    previous = getattr(_current, "data", None)
+    _current.data = data
+    try:
+        yield
+    finally:
+        _current.data = previous
+
+
+class BufferPool:
+    def __init__(self, max_idle_bytes: Optional[int] = None) -> None:
+        """Pool of preallocated NumPy arrays that are recycled across data. A
+        buffer borrowed by a stage belongs to the data being processed, and it
+        goes back to the pool when the data leaves the pipeline, including when
+        it is dropped. If the buffer is still referenced by the output data, e.g.
+        it is the output itself or an item of an output tuple or dict, it is given
+        to the user instead. A buffer borrowed outside a stage must be returned with
+        `release`.
+
+        Args:
+            max_idle_bytes (Optional[int], optional): Maximum total size in bytes
+                of the idle buffers kept in the pool. Buffers returned beyond it are
+                freed. If None, all returned buffers are kept. Defaults to None.
+        """
+        self.max_idle_bytes = max_idle_bytes
+        self._idle: Dict[_BufferKey, List[np.ndarray]] = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.idle_bytes = 0
+        self.in_use_bytes = 0
+
+    def borrow(
+        self,
+        shape: Union[int, Tuple[int, ...]],
+        dtype: Any = np.float64,
+    ) -> np.ndarray:
+        """Get an array of the given shape and dtype. The content of a recycled
+        array is not cleared.
+
+        Args:
+            shape (Union[int, Tuple[int, ...]]): shape of the array
+            dtype (Any, optional): dtype of the array. Defaults to np.float64.
+
+        Returns:
+            np.ndarray: the array
+        """
+        shape = (shape,) if isinstance(shape, int) else tuple(shape)
+        key = (shape, np.dtype(dtype).str)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                buffer = idle.pop()
+                self.hits += 1
+                self.idle_bytes -= buffer.nbytes
+            else:
+                buffer = None
+                self.misses += 1
+        if buffer is None:
+            buffer = np.empty(shape, dtype=dtype)
+        with self._lock:
+            self.in_use_bytes += buffer.nbytes
+        data: Optional[PipelineData] = getattr(_current, "data", None)
+        if data is not None:
+            data.buffers.append((self, buffer))
+        return buffer
+
+    def release(self, buffer: np.ndarray) -> None:
+        """Return a borrowed array to the pool
+
+        Args:
+            buffer (np.ndarray): the array
+        """
+        key = (buffer.shape, buffer.dtype.str)
+        with self._lock:
+            self.in_use_bytes -= buffer.nbytes
+            if (
+                self.max_idle_bytes is not None
+                and self.idle_bytes + buffer.nbytes > self.max_idle_bytes
+            ):
+                return
+            self._idle.setdefault(key, []).append(buffer)
+            self.idle_bytes += buffer.nbytes
+
+    def detach(self, buffer: np.ndarray) -> None:
+        """Remove a borrowed array from the pool without recycling it
+
+        Args:
+            buffer (np.ndarray): the array
+        """
+        with self._lock:
+            self.in_use_bytes -= buffer.nbytes
+
+    def clear(self) -> None:
+        """Free all idle buffers"""
+        with self._lock:
+            self._idle.clear()
+            self.idle_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistics of the pool
+
+        Returns:
+            Dict[str, Any]: the number of hits and misses, the hit ratio, and the
+            memory footprint in bytes of the buffers in use and the idle ones
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total > 0 else 0.0,
+                "in_use_bytes": self.in_use_bytes,
+                "idle_bytes": self.idle_bytes,
+                "footprint_bytes": self.in_use_bytes + self.idle_bytes,
+            }
@@ -1,13 +1,128 @@
-from dataclasses import dataclass, field
-from typing import Any
+from dataclasses import dataclass, field, fields, is_dataclass
+from typing import Any, List, Optional, Protocol, Set, Tuple
+
+import numpy as np
 
 from pystream.data.profiler_data import ProfileData
 
 
+class BufferPoolProtocol(Protocol):
+    def release(self, buffer: Any) -> None:
+        ...
+
+    def detach(self, buffer: Any) -> None:
+        ...
+
+
+def _referenced_arrays(data: Any) -> Set[int]:
+    """Get the IDs of the NumPy arrays reachable from the data through lists,
+    tuples, sets, dicts and dataclasses, including the arrays viewed by them"""
+    out: Set[int] = set()
+    visited: Set[int] = set()
+    stack = [data]
+    while len(stack) > 0:
+        obj = stack.pop()
+        if id(obj) in visited:
+            continue
+        visited.add(id(obj))
+        if isinstance(obj, np.ndarray):
+            base: Any = obj
+            while base is not None:
+                out.add(id(base))
+                base = getattr(base, "base", None)
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif is_dataclass(obj) and not isinstance(obj, type):
+            stack.extend(getattr(obj, f.name) for f in fields(obj))
+    return out
+
+
 @dataclass
 class PipelineData:
     data: Any = None
     profile: ProfileData = field(default_factory=ProfileData)
+    # If True, the remaining stages pass the data through without processing it
+    bypass: bool = False
+    # Data with higher priority overtakes the others in priority queues
+    priority: int = 0
+    # Name of the stage that dropped the data, None if it is not dropped
+    dropped_by: Optional[str] = None
+    drop_reason: Optional[str] = None
+    # Buffers borrowed from buffer pools while processing the data, they are
+    # returned to the pools when the data leaves the pipeline
+    buffers: List[Tuple[BufferPoolProtocol, Any]] = field(default_factory=list)
+    # Earlier data whose output this data takes when it leaves the pipeline, set
+    # for bypassed data whose output is reused before it is available
+    reuse: Optional["PipelineData"] = None
+
+    @property
+    def is_dropped(self) -> bool:
+        return self.dropped_by is not None
+
+    def drop(self, stage_name: str, reason: str) -> None:
+        """Mark the data as dropped, the remaining stages will skip it
+
+        Args:
+            stage_name (str): name of the stage that drops the data
+            reason (str): the drop reason
+        """
+        self.dropped_by = stage_name
+        self.drop_reason = reason
+
+    def take_reused_output(self) -> bool:
+        """Take the output of the reused data, which must have left the
+        pipeline. If it was dropped, this data is dropped as well.
+
+        Returns:
+            bool: False if the reused data has not left the pipeline, e.g. it was
+            lost on the way, so there is no output to take
+        """
+        source = self.reuse
+        if source is None:
+            return True
+        self.reuse = None
+        if source.dropped_by is not None and source.drop_reason is not None:
+            self.drop(source.dropped_by, source.drop_reason)
+        elif not source.profile.is_finished:
+            return False
+        else:
+            self.data = source.data
+        return True
+
+    def detach_buffers(self, output: Any) -> None:
+        """Detach the borrowed buffers referenced by an output that leaves the
+        pipeline with another data, e.g. an output of a flat-map stage, so they
+        are not returned to their pools while the output is still used.
+
+        Args:
+            output (Any): the output
+        """
+        referenced = _referenced_arrays(output)
+        kept = []
+        for pool, buffer in self.buffers:
+            if id(buffer) in referenced:
+                pool.detach(buffer)
+            else:
+                kept.append((pool, buffer))
+        self.buffers = kept
+
+    def release_buffers(self) -> None:
+        """Return the borrowed buffers to their pools, except the buffers that
+        are still referenced by the output, e.g. the output itself, an item of
+        an output tuple or an array viewing the buffer. They are detached from
+        their pools instead."""
+        if len(self.buffers) == 0:
+            return
+        referenced = set() if self.is_dropped else _referenced_arrays(self.data)
+        for pool, buffer in self.buffers:
+            if id(buffer) in referenced:
+                pool.detach(buffer)
+            else:
+                pool.release(buffer)
+        self.buffers.clear()
 
 
 class InputGeneratorRequest:
@@ -15,3 +130,17 @@ class InputGeneratorRequest:
 
 
 _request_generator = InputGeneratorRequest()
+
+
+class DropRequest:
+    def __init__(self, reason: str = "filtered") -> None:
+        """Returned by a stage to drop the data, so that it skips the
+        remaining stages and does not come out of the pipeline
+
+        Args:
+            reason (str, optional): the drop reason. Defaults to "filtered".
+        """
+        self.reason = reason
+
+
+DROP = DropRequest()
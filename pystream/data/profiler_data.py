@@ -1,6 +1,9 @@
 import time
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Tuple
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
 
 from pystream.utils.general import _PIPELINE_NAME_IN_PROFILE, _PROFILE_LEVEL_SEPARATOR
 
@@ -11,6 +14,13 @@ class TimeProfileData:
     ended: Optional[float] = None
     substage: Dict[str, "TimeProfileData"] = field(default_factory=dict)
 
+    def copy(self) -> "TimeProfileData":
+        return TimeProfileData(
+            started=self.started,
+            ended=self.ended,
+            substage={name: data.copy() for name, data in self.substage.items()},
+        )
+
     def flatten(self) -> Tuple[List[str], List[Optional[float]], List[Optional[float]]]:
         name_data = [f"{_PROFILE_LEVEL_SEPARATOR}"]
         start_data = [self.started]
@@ -60,6 +70,67 @@ class ProfileData:
             self.current_stages.pop(-1)
         time_data.ended = time.perf_counter()
 
+    def copy(self) -> "ProfileData":
+        return ProfileData(
+            data=self.data.copy(), current_stages=self.current_stages.copy()
+        )
+
     @property
     def is_at_main(self) -> bool:
         return len(self.current_stages) == 0
+
+    @property
+    def is_finished(self) -> bool:
+        """True if the data has left the main pipeline"""
+        return self.data.ended is not None
+
+
+class LatencyWindow:
+    def __init__(self, size: int = 1000) -> None:
+        """Rolling window of the latest latency records
+
+        Args:
+            size (int, optional): Number of records to keep. Defaults to 1000.
+        """
+        self.records: Deque[float] = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, latency: float) -> None:
+        self.records.append(latency)
+        self.count += 1
+
+    def percentile(self, q: float, last: Optional[int] = None) -> float:
+        """Get a percentile of the latency in the window
+
+        Args:
+            q (float): the percentile, between 0 and 100
+            last (Optional[int], optional): If given, only use this many most
+                recent records. Defaults to None.
+
+        Returns:
+            float: the latency percentile, NaN if there is no record
+        """
+        records = list(self.records)
+        if last is not None:
+            records = records[len(records) - last :] if last > 0 else []
+        if len(records) == 0:
+            return float("nan")
+        return float(np.percentile(records, q))
+
+    def summary(self) -> Dict[str, float]:
+        """Get the summary of the latency in the window
+
+        Returns:
+            Dict[str, float]: the total number of records, and the mean, median,
+            95th percentile and maximum of the latency in the window
+        """
+        records = np.array(self.records)
+        if len(records) == 0:
+            return {"count": self.count}
+        return {
+            "count": self.count,
+            "mean": float(np.mean(records)),
+            "p50": float(np.percentile(records, 50)),
+            "p95": float(np.percentile(records, 95)),
+            "max": float(np.max(records)),
+        }
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Optional, Protocol
+from typing import List, Optional, Protocol
 
 from pystream.data.pipeline_data import PipelineData
 
@@ -16,6 +16,9 @@ class StageQueueProtocol(Protocol):
     def empty(self) -> bool:
         ...
 
+    def qsize(self) -> int:
+        ...
+
 
 class StageEventProtocol(Protocol):
     def set(self) -> None:
@@ -40,3 +43,34 @@ class StageLinks:
     stopper: StageEventProtocol
     # Event to signal the stage is ready
     starter: StageEventProtocol
+    # Event that is cleared to pause the stage, if None the stage cannot be paused
+    runner: Optional[StageEventProtocol] = None
+
+
+@dataclass
+class StageOptions:
+    """Options of a stage that control how the pipeline runs it."""
+
+    # Maximum age of the data in seconds at which the stage must finish processing
+    # it. In parallel mode, data that cannot meet it is dropped before the stage.
+    deadline: Optional[float] = None
+    # Expected processing time of the stage in seconds, used to fuse cheap stages
+    # into one thread in parallel mode. If None, the profiler measurement is used.
+    cost: Optional[float] = None
+    # CPUs that the thread of the stage runs on in parallel mode
+    cpus: Optional[List[int]] = None
+    # Niceness of the thread of the stage in parallel mode
+    nice: Optional[int] = None
+    # Maximum thread count of the BLAS and OpenMP runtimes that the thread of the
+    # stage calls into in parallel mode
+    blas_threads: Optional[int] = None
+    # Maximum time in seconds to process one data. In parallel mode, the watchdog
+    # of the pipeline handles the data that exceeds it.
+    time_budget: Optional[float] = None
+
+    @property
+    def has_placement(self) -> bool:
+        """Whether the thread of the stage is placed by the options"""
+        return not (
+            self.cpus is None and self.nice is None and self.blas_threads is None
+        )
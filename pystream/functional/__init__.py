@@ -1 +1,9 @@
-from pystream.functional.functions import func_parallel_thread, func_serial
+from pystream.functional.cache import cached, disk_cached
+from pystream.functional.functions import (
+    func_accumulate,
+    func_gather_thread,
+    func_map_chunks,
+    func_parallel_process,
+    func_parallel_thread,
+    func_serial,
+)
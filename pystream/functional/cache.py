@@ -0,0 +1,490 @@
+import os
+import pickle
+import time
+import uuid
+from collections import OrderedDict
+from functools import partial
+from threading import Event, Lock
+from types import CodeType, FunctionType, ModuleType
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from pystream.stage.stage import Stage, StageCallable
+from pystream.utils.hashing import hash_payload
+from pystream.utils.logger import LOGGER
+
+
+class CachedStage(Stage):
+    def __init__(
+        self,
+        stage: StageCallable,
+        key: Optional[Callable[[Any], Hashable]] = None,
+        maxsize: Optional[int] = 128,
+        ttl: Optional[float] = None,
+    ) -> None:
+        """Stage that memoizes the outputs of another stage in memory.
+        See `cached` for the details.
+
+        Args:
+            stage (StageCallable): the stage to be memoized
+            key (Optional[Callable[[Any], Hashable]], optional): function that
+                computes the cache key of the input data. By default, the content
+                hash of the data is used. Defaults to None.
+            maxsize (Optional[int], optional): maximum number of cached outputs,
+                the least recently used one is evicted first. If None, the cache
+                is unbounded. Defaults to 128.
+            ttl (Optional[float], optional): time in seconds after which a cached
+                output expires. If None, outputs never expire. Defaults to None.
+        """
+        self.stage = stage
+        self.key = key if key is not None else hash_payload
+        self.maxsize = maxsize
+        self.ttl = ttl
+        if isinstance(stage, Stage):
+            self.name = stage.name
+
+        # key -> (time when stored, compute time, output)
+        self._cache: "OrderedDict[Hashable, Tuple[float, float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, Event] = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_time = 0.0
+
+    def __call__(self, data: Any) -> Any:
+        key = self.key(data)
+        while True:
+            with self._lock:
+                found, output = self._lookup(key)
+                if found:
+                    return output
+                event = self._inflight.get(key)
+                if event is None:
+                    self._inflight[key] = Event()
+                    break
+            # Another caller is computing the same key, wait for its result
+            event.wait()
+
+        try:
+            start = time.perf_counter()
+            output = self.stage(data)
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.misses += 1
+                self._store(key, output, elapsed)
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+        return output
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        """Find a valid output in the cache, must be called with the lock held"""
+        entry = self._cache.get(key)
+        if entry is None:
+            return False, None
+        stored, compute_time, output = entry
+        if self.ttl is not None and time.monotonic() - stored > self.ttl:
+            del self._cache[key]
+            return False, None
+        self._cache.move_to_end(key)
+        self.hits += 1
+        self.saved_time += compute_time
+        return True, output
+
+    def _store(self, key: Hashable, output: Any, compute_time: float) -> None:
+        """Store an output in the cache, must be called with the lock held"""
+        if self.maxsize is not None and self.maxsize <= 0:
+            return
+        self._cache[key] = (time.monotonic(), compute_time, output)
+        self._cache.move_to_end(key)
+        if self.maxsize is not None:
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all cached outputs"""
+        with self._lock:
+            self._cache.clear()
+
+    def setup(self) -> None:
+        if isinstance(self.stage, Stage):
+            self.stage.setup()
+
+    def warmup(self, sample: Any) -> None:
+        if isinstance(self.stage, Stage):
+            self.stage.warmup(sample)
+
+    def cleanup(self) -> None:
+        self.clear()
+        if isinstance(self.stage, Stage):
+            self.stage.cleanup()
+
+    def reset(self) -> None:
+        self.clear()
+        if isinstance(self.stage, Stage):
+            self.stage.reset()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "cache_hits": self.hits,
+                "cache_misses": self.misses,
+                "cache_hit_ratio": self.hits / total if total > 0 else 0.0,
+                "cache_saved_time": self.saved_time,
+                "cache_size": len(self._cache),
+            }
+
+
+def cached(
+    stage: StageCallable,
+    key: Optional[Callable[[Any], Hashable]] = None,
+    maxsize: Optional[int] = 128,
+    ttl: Optional[float] = None,
+) -> CachedStage:
+    """Wrap a stage so that its outputs are memoized in a thread-safe LRU cache.
+
+    When the same input comes again, the cached output is returned without executing
+    the stage. If several callers request the same key at the same time, e.g. from
+    parallel branches, the stage is executed once and the other callers wait for its
+    output. The hit and miss counts and the saved time are reported by the `stats`
+    method of the pipeline.
+
+    Note that the cached output object is shared by all data with the same key, so
+    the next stages should not modify it inplace.
+
+    Args:
+        stage (StageCallable): the stage to be memoized
+        key (Optional[Callable[[Any], Hashable]], optional): function that computes
+            the cache key of the input data. By default, the content hash of the data
+            is used, which supports NumPy arrays and picklable objects.
+            Defaults to None.
+        maxsize (Optional[int], optional): maximum number of cached outputs, the least
+            recently used one is evicted first. If None, the cache is unbounded.
+            Defaults to 128.
+        ttl (Optional[float], optional): time in seconds after which a cached output
+            expires. If None, outputs never expire. Defaults to None.
+
+    Returns:
+        CachedStage: the memoized stage
+    """
+    return CachedStage(stage, key=key, maxsize=maxsize, ttl=ttl)
+
+
+def _identity(value: Any, seen: Set[int]) -> Any:
+    """Replace the functions and code objects inside a value by their content,
+    so that the value can be hashed"""
+    if id(value) in seen:
+        return getattr(value, "__qualname__", None)
+    if isinstance(value, FunctionType):
+        seen.add(id(value))
+        closure = []
+        for cell in value.__closure__ or ():
+            try:
+                closure.append(_identity(cell.cell_contents, seen))
+            except ValueError:
+                # The cell is not filled yet
+                closure.append(None)
+        return (
+            f"{value.__module__}.{value.__qualname__}",
+            _identity(value.__code__, seen),
+            _identity(value.__defaults__, seen),
+            _identity(value.__kwdefaults__, seen),
+            closure,
+        )
+    if isinstance(value, CodeType):
+        return (value.co_code, _identity(value.co_consts, seen), value.co_names)
+    if isinstance(value, partial):
+        seen.add(id(value))
+        return _identity((value.func, value.args, value.keywords), seen)
+    if isinstance(value, (list, tuple)):
+        return [_identity(item, seen) for item in value]
+    if isinstance(value, dict):
+        return {key: _identity(item, seen) for key, item in value.items()}
+    if isinstance(value, type):
+        return f"{value.__module__}.{value.__qualname__}"
+    if isinstance(value, ModuleType):
+        return value.__name__
+    if hasattr(value, "__dict__") and not isinstance(value, np.ndarray):
+        seen.add(id(value))
+        value_type = type(value)
+        return (
+            f"{value_type.__module__}.{value_type.__qualname__}",
+            _identity(vars(value), seen),
+        )
+    return value
+
+
+def _default_namespace(stage: StageCallable) -> str:
+    """Name the disk cache entries of a stage. A module-level function is named
+    by its qualified name. Other stages, e.g. lambdas, closures and objects,
+    share their qualified name with stages that compute something else, so the
+    hash of their code and closure, or of their attributes, is added.
+
+    Args:
+        stage (StageCallable): the stage
+
+    Raises:
+        ValueError: if the stage cannot be told apart from others by its content,
+            so a namespace must be given
+
+    Returns:
+        str: the namespace
+    """
+    if isinstance(stage, FunctionType):
+        name = f"{stage.__module__}.{stage.__qualname__}"
+        if stage.__closure__ is None and "<" not in stage.__qualname__:
+            return name
+    else:
+        stage_type = type(stage)
+        name = f"{stage_type.__module__}.{stage_type.__qualname__}"
+    try:
+        digest = hash_payload(_identity(stage, set()))
+    except Exception as e:
+        raise ValueError(
+            f"Cannot tell the disk cache entries of {name} apart from other stages"
+            " with the same name, give a namespace"
+        ) from e
+    return f"{name}-{digest}"
+
+
+class DiskCachedStage(Stage):
+    _ARRAY_SUFFIX = ".npy"
+    _OBJECT_SUFFIX = ".pkl"
+    _TEMP_PREFIX = ".tmp-"
+
+    def __init__(
+        self,
+        stage: StageCallable,
+        directory: str,
+        max_bytes: Optional[int] = None,
+        key: Optional[Callable[[Any], Any]] = None,
+        namespace: Optional[str] = None,
+        mmap_mode: Optional[str] = "r",
+    ) -> None:
+        """Stage that stores the outputs of another stage on disk, addressed
+        by the content hash of the input. See `disk_cached` for the details.
+
+        Args:
+            stage (StageCallable): the stage to be cached
+            directory (str): directory of the cache files
+            max_bytes (Optional[int], optional): maximum total size of the cache
+                files. If None, the cache is unbounded. Defaults to None.
+            key (Optional[Callable[[Any], Any]], optional): function that computes
+                the cache key of the input data. By default, the input data itself
+                is hashed. Defaults to None.
+            namespace (Optional[str], optional): name that separates the entries of
+                this stage from other stages sharing the directory. If None, it is
+                derived from the stage, see `disk_cached`. Defaults to None.
+            mmap_mode (Optional[str], optional): mode used to load cached arrays with
+                `numpy.load`. If None, the arrays are loaded into memory.
+                Defaults to "r".
+
+        Raises:
+            ValueError: if no namespace is given and it cannot be derived from
+                the stage
+        """
+        self.stage = stage
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.key = key
+        self.mmap_mode = mmap_mode
+        if namespace is None:
+            namespace = _default_namespace(stage)
+        self.namespace = namespace
+        if isinstance(stage, Stage):
+            self.name = stage.name
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = Lock()
+        self._size = self._scan_size()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __call__(self, data: Any) -> Any:
+        key = data if self.key is None else self.key(data)
+        entry = hash_payload((self.namespace, key))
+        found, output = self._load(entry)
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if found:
+            return output
+        output = self.stage(data)
+        self._save(entry, output)
+        return output
+
+    def _entry_path(self, entry: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{entry}{suffix}")
+
+    def _load(self, entry: str) -> Tuple[bool, Any]:
+        """Load an entry from disk, entries that are removed or partially
+        written by another process are treated as missing"""
+        array_path = self._entry_path(entry, self._ARRAY_SUFFIX)
+        object_path = self._entry_path(entry, self._OBJECT_SUFFIX)
+        try:
+            if os.path.exists(array_path):
+                output = np.load(array_path, mmap_mode=self.mmap_mode)
+                path = array_path
+            elif os.path.exists(object_path):
+                with open(object_path, "rb") as f:
+                    output = pickle.load(f)
+                path = object_path
+            else:
+                return False, None
+            # Refresh the modification time, which is used for the LRU eviction
+            os.utime(path)
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+            return False, None
+        return True, output
+
+    def _save(self, entry: str, output: Any) -> None:
+        """Write an entry atomically, so that other processes never see
+        a partially written file"""
+        is_array = isinstance(output, np.ndarray) and not output.dtype.hasobject
+        suffix = self._ARRAY_SUFFIX if is_array else self._OBJECT_SUFFIX
+        temp_path = os.path.join(
+            self.directory, f"{self._TEMP_PREFIX}{uuid.uuid4().hex}{suffix}"
+        )
+        try:
+            with open(temp_path, "wb") as f:
+                if is_array:
+                    np.save(f, output, allow_pickle=False)
+                else:
+                    pickle.dump(output, f, protocol=pickle.HIGHEST_PROTOCOL)
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, self._entry_path(entry, suffix))
+        except (OSError, pickle.PicklingError) as e:
+            LOGGER.warning(f"Cannot write disk cache entry: {e!r}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        with self._lock:
+            self._size += size
+            if self.max_bytes is not None and self._size > self.max_bytes:
+                self._evict()
+
+    def _scan_entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if item.name.startswith(self._TEMP_PREFIX) or not item.is_file():
+                    continue
+                if not item.name.endswith((self._ARRAY_SUFFIX, self._OBJECT_SUFFIX)):
+                    continue
+                try:
+                    stat = item.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, item.path))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._scan_entries())
+
+    def _evict(self) -> None:
+        """Remove the least recently used entries until the cache is 10% below
+        its maximum size. The directory is rescanned since other processes may
+        share it. Must be called with the lock held."""
+        assert self.max_bytes is not None
+        entries = sorted(self._scan_entries())
+        size = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # Removed by another process, or still mapped on some platforms
+                continue
+            size -= entry_size
+            self.evictions += 1
+        self._size = size
+
+    def setup(self) -> None:
+        if isinstance(self.stage, Stage):
+            self.stage.setup()
+
+    def warmup(self, sample: Any) -> None:
+        if isinstance(self.stage, Stage):
+            self.stage.warmup(sample)
+
+    def cleanup(self) -> None:
+        if isinstance(self.stage, Stage):
+            self.stage.cleanup()
+
+    def reset(self) -> None:
+        # The files are kept, they are meant to persist across runs
+        if isinstance(self.stage, Stage):
+            self.stage.reset()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "disk_cache_hits": self.hits,
+                "disk_cache_misses": self.misses,
+                "disk_cache_hit_ratio": self.hits / total if total > 0 else 0.0,
+                "disk_cache_bytes": self._size,
+                "disk_cache_evictions": self.evictions,
+            }
+
+
+def disk_cached(
+    stage: StageCallable,
+    directory: str,
+    max_bytes: Optional[int] = None,
+    key: Optional[Callable[[Any], Any]] = None,
+    namespace: Optional[str] = None,
+    mmap_mode: Optional[str] = "r",
+) -> DiskCachedStage:
+    """Wrap a stage so that its outputs are stored on disk, addressed by the
+    content hash of the input. The cache persists across runs, which is useful
+    when reprocessing the same data offline.
+
+    NumPy array outputs are saved as `.npy` files and served through memory mapping,
+    so a hit does not deserialize or copy the array. By default, the mapped arrays
+    are read-only, so the next stages should not modify them inplace. Other outputs
+    are pickled. Files are written atomically and the least recently used ones are
+    removed when the cache exceeds its maximum size, so several processes can share
+    the same directory.
+
+    Args:
+        stage (StageCallable): the stage to be cached
+        directory (str): directory of the cache files
+        max_bytes (Optional[int], optional): maximum total size of the cache files.
+            If None, the cache is unbounded. Defaults to None.
+        key (Optional[Callable[[Any], Any]], optional): function that computes the
+            cache key of the input data, which is then hashed. By default, the input
+            data itself is hashed. Defaults to None.
+        namespace (Optional[str], optional): name that separates the entries of this
+            stage from other stages sharing the directory. By default, a module-level
+            function is named by its qualified name. Lambdas, closures and objects
+            are also named by the hash of their code and closure, or of their
+            attributes, since stages of the same name may compute different outputs.
+            Changing them, e.g. the parameters of a stage object, changes the
+            namespace. Give a namespace if they cannot be hashed, or to keep the
+            cache when they change. Defaults to None.
+        mmap_mode (Optional[str], optional): mode used to load cached arrays with
+            `numpy.load`, e.g. "c" for copy-on-write. If None, the arrays are loaded
+            into memory. Defaults to "r".
+
+    Raises:
+        ValueError: if no namespace is given and it cannot be derived from the stage
+
+    Returns:
+        DiskCachedStage: the cached stage
+    """
+    return DiskCachedStage(
+        stage,
+        directory,
+        max_bytes=max_bytes,
+        key=key,
+        namespace=namespace,
+        mmap_mode=mmap_mode,
+    )
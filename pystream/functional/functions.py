@@ -1,8 +1,36 @@
-from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Callable, List
+import pickle
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from pystream.stage.stage import Stage
 
 
 _default_executor = ThreadPoolExecutor(max_workers=10)
+_default_process_executor: Optional[ProcessPoolExecutor] = None
+_attach_lock = Lock()
+
+FunctionCollection = Union[List[Callable[[Any], Any]], Dict[str, Callable[[Any], Any]]]
+CollectedOutputs = Union[Tuple[Any, ...], Dict[str, Any]]
+
+
+def get_default_process_executor() -> ProcessPoolExecutor:
+    """Get the ProcessPoolExecutor managed by this package. It is created
+    when it is requested for the first time.
+
+    Returns:
+        ProcessPoolExecutor: the default process executor
+    """
+    global _default_process_executor
+    if _default_process_executor is None:
+        _default_process_executor = ProcessPoolExecutor()
+    return _default_process_executor
 
 
 def func_parallel_thread(
@@ -81,3 +109,373 @@ def func_serial(funcs: List[Callable[[Any], Any]]) -> Callable[[Any], Any]:
         return x
 
     return wrapper
+
+
+def _submit_and_collect(
+    funcs: FunctionCollection,
+    submit: Callable[[Callable[[Any], Any]], Any],
+) -> CollectedOutputs:
+    """Submit all functions and collect the results of the returned futures,
+    keeping the structure of funcs"""
+    if isinstance(funcs, dict):
+        futures = {key: submit(func) for key, func in funcs.items()}
+        return {key: future.result() for key, future in futures.items()}
+    futures = [submit(func) for func in funcs]
+    return tuple(future.result() for future in futures)
+
+
+def func_gather_thread(
+    funcs: FunctionCollection, executor: ThreadPoolExecutor = _default_executor
+) -> Callable[[Any], CollectedOutputs]:
+    """Create a function made of functions that are executed in parallel
+    using ThreadPoolExecutor from concurrent module, and whose return values
+    are collected.
+
+    Unlike `func_parallel_thread`, the input functions do not need to modify the
+    input data inplace. Note that the threads only run in parallel when the
+    functions release the GIL, e.g. in I/O or in most NumPy operations.
+
+    Args:
+        funcs (FunctionCollection): the list or dict of functions to be executed.
+            Each function only takes one argument, which is the data shared by all
+            functions, and returns its output.
+        executor (ThreadPoolExecutor, optional): ThreadPoolExecutor instance from
+            concurrent.futures that handles the threads. By default, executor
+            managed by this package will be used.
+
+    Returns:
+        Callable[[Any], CollectedOutputs]: The returned function to execute the
+        parallelized input functions. It takes one argument 'x' which will be passed
+        to the input functions and returns their outputs, as a tuple in the order of
+        funcs if funcs is a list, or as a dict with the same keys if funcs is a dict.
+    """
+
+    def wrapper(x: Any) -> CollectedOutputs:
+        """Wrapped parallel threaded pipeline function
+
+        Args:
+            x (Any): input data
+
+        Returns:
+            CollectedOutputs: outputs of the functions
+        """
+        return _submit_and_collect(funcs, lambda func: executor.submit(func, x))
+
+    return wrapper
+
+
+@dataclass
+class _SharedArray:
+    """Descriptor of a NumPy array that is stored in shared memory"""
+
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+def _to_shared_memory(x: Any, threshold: int) -> Tuple[Any, List[SharedMemory]]:
+    """Move the NumPy arrays in x (either x itself or the values of x if it is
+    a dict) into shared memory if they are bigger than threshold bytes"""
+    blocks: List[SharedMemory] = []
+
+    def _share(value: Any) -> Any:
+        if not isinstance(value, np.ndarray) or value.nbytes < threshold:
+            return value
+        shm = SharedMemory(create=True, size=value.nbytes)
+        blocks.append(shm)
+        np.ndarray(value.shape, dtype=value.dtype, buffer=shm.buf)[...] = value
+        return _SharedArray(shm.name, value.shape, value.dtype.str)
+
+    if isinstance(x, dict):
+        return {key: _share(value) for key, value in x.items()}, blocks
+    return _share(x), blocks
+
+
+def _skip_register(name: str, rtype: str) -> None:
+    pass
+
+
+def _attach_shared_memory(name: str) -> SharedMemory:
+    """Attach to a shared memory block created by the parent process, without
+    registering it to the resource tracker, which would unlink the block when
+    the worker exits. The parent process owns and unlinks the block."""
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)  # type: ignore
+    # Before Python 3.13, SharedMemory always registers the block through the
+    # public resource_tracker.register, so the registration is skipped there.
+    # Unregistering afterwards is not safe, since the worker may share the
+    # tracker of the parent, which would then lose track of the block.
+    with _attach_lock:
+        register = resource_tracker.register
+        resource_tracker.register = _skip_register
+        try:
+            return SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def _call_with_shared_memory(func: Callable[[Any], Any], x: Any) -> bytes:
+    """Worker function that attaches the shared arrays in x, calls func,
+    and returns the pickled output"""
+    blocks: List[SharedMemory] = []
+
+    def _attach(value: Any) -> Any:
+        if not isinstance(value, _SharedArray):
+            return value
+        shm = _attach_shared_memory(value.name)
+        blocks.append(shm)
+        return np.ndarray(value.shape, dtype=np.dtype(value.dtype), buffer=shm.buf)
+
+    if isinstance(x, dict):
+        x = {key: _attach(value) for key, value in x.items()}
+    else:
+        x = _attach(x)
+    # Serialize the output before the shared memory is closed,
+    # because the output may be a view of the input arrays
+    output = pickle.dumps(func(x), protocol=pickle.HIGHEST_PROTOCOL)
+    del x
+    for shm in blocks:
+        shm.close()
+    return output
+
+
+def func_parallel_process(
+    funcs: FunctionCollection,
+    executor: Optional[ProcessPoolExecutor] = None,
+    shared_memory_threshold: Optional[int] = 1024 * 1024,
+) -> Callable[[Any], CollectedOutputs]:
+    """Create a function made of functions that are executed in parallel
+    using ProcessPoolExecutor from concurrent module, and whose return values
+    are collected.
+
+    Since each function runs in its own process, CPU-bound functions run in parallel
+    even if they hold the GIL. The functions and the data must be picklable, e.g.
+    the functions must be defined at module level. Modifying the input data inplace
+    has no effect, so the functions must return their results.
+
+    Large NumPy arrays are transferred through shared memory instead of being
+    pickled. This applies to the input data if it is an array, or to the values of
+    the input data if it is a dict. The arrays received by the functions are
+    read-write views of the shared memory, which is released after all functions
+    finish.
+
+    If no executor is provided, a shared default ProcessPoolExecutor is used. This
+    executor will not be killed by shutdown method. To be safe, please pass your own
+    executor.
+
+    Args:
+        funcs (FunctionCollection): the list or dict of functions to be executed.
+            Each function only takes one argument, which is the data shared by all
+            functions, and returns its output.
+        executor (Optional[ProcessPoolExecutor], optional): ProcessPoolExecutor
+            instance from concurrent.futures that handles the processes. By default,
+            executor managed by this package will be used.
+        shared_memory_threshold (Optional[int], optional): Minimum size in bytes of
+            the arrays to be transferred through shared memory. If None, shared
+            memory is not used. Defaults to 1 MiB.
+
+    Returns:
+        Callable[[Any], CollectedOutputs]: The returned function to execute the
+        parallelized input functions. It takes one argument 'x' which will be passed
+        to the input functions and returns their outputs, as a tuple in the order of
+        funcs if funcs is a list, or as a dict with the same keys if funcs is a dict.
+    """
+
+    def wrapper(x: Any) -> CollectedOutputs:
+        """Wrapped parallel process pipeline function
+
+        Args:
+            x (Any): input data
+
+        Returns:
+            CollectedOutputs: outputs of the functions
+        """
+        pool: Executor = (
+            executor if executor is not None else get_default_process_executor()
+        )
+        if shared_memory_threshold is None:
+            return _submit_and_collect(funcs, lambda func: pool.submit(func, x))
+
+        shared_x, blocks = _to_shared_memory(x, shared_memory_threshold)
+        if len(blocks) == 0:
+            return _submit_and_collect(funcs, lambda func: pool.submit(func, x))
+        try:
+            outputs = _submit_and_collect(
+                funcs,
+                lambda func: pool.submit(_call_with_shared_memory, func, shared_x),
+            )
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+        if isinstance(outputs, dict):
+            return {key: pickle.loads(value) for key, value in outputs.items()}
+        return tuple(pickle.loads(value) for value in outputs)
+
+    return wrapper
+
+
+def split_chunks(x: Any, n_chunks: int) -> List[Any]:
+    """Split data into chunks. NumPy arrays are split along axis 0 into views,
+    lists and tuples are split into slices, and dicts of arrays are split
+    value by value into dicts with the same keys.
+
+    Args:
+        x (Any): the data to be split
+        n_chunks (int): number of chunks
+
+    Raises:
+        TypeError: raised if the data type is not supported
+
+    Returns:
+        List[Any]: the chunks
+    """
+    if isinstance(x, np.ndarray):
+        return np.array_split(x, n_chunks)
+    if isinstance(x, (list, tuple)):
+        bounds = np.linspace(0, len(x), n_chunks + 1).astype(int)
+        return [x[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+    if isinstance(x, dict):
+        split_values = {key: split_chunks(value, n_chunks) for key, value in x.items()}
+        return [
+            {key: chunks[i] for key, chunks in split_values.items()}
+            for i in range(n_chunks)
+        ]
+    raise TypeError(f"Cannot split data of type {type(x).__name__} into chunks")
+
+
+def combine_chunks(chunks: List[Any]) -> Any:
+    """Combine chunks that are split by `split_chunks` back into one data.
+
+    Args:
+        chunks (List[Any]): the chunks
+
+    Raises:
+        TypeError: raised if the data type is not supported
+
+    Returns:
+        Any: the combined data
+    """
+    first = chunks[0]
+    if isinstance(first, np.ndarray):
+        return np.concatenate(chunks)
+    if isinstance(first, list):
+        return [item for chunk in chunks for item in chunk]
+    if isinstance(first, tuple):
+        return tuple(item for chunk in chunks for item in chunk)
+    if isinstance(first, dict):
+        return {key: combine_chunks([chunk[key] for chunk in chunks]) for key in first}
+    raise TypeError(f"Cannot combine chunks of type {type(first).__name__}")
+
+
+def _is_inplace_result(x: Any, chunks: List[Any], outputs: List[Any]) -> bool:
+    """Check if the outputs are the input chunks themselves, i.e. views of
+    x that are modified inplace, so that x can be returned without concatenation"""
+    if not isinstance(x, (np.ndarray, dict)):
+        return False
+    return all(output is chunk for chunk, output in zip(chunks, outputs))
+
+
+def func_map_chunks(
+    fn: Callable[[Any], Any],
+    n_chunks: int,
+    executor: Executor = _default_executor,
+    split: Callable[[Any, int], List[Any]] = split_chunks,
+    combine: Callable[[List[Any]], Any] = combine_chunks,
+) -> Callable[[Any], Any]:
+    """Create a function that splits the data into chunks, processes the
+    chunks concurrently, and combines the results.
+
+    By default, NumPy arrays are split along axis 0, lists and tuples are sliced,
+    and dicts of arrays are split value by value. The array chunks are views, so no
+    copy is made when splitting. If fn modifies the array chunks inplace and returns
+    them, the input data is returned as is without concatenation.
+
+    The chunks can be processed by a ThreadPoolExecutor, which is efficient for
+    functions that release the GIL such as most NumPy operations, or by a
+    ProcessPoolExecutor for pure Python functions. With a process executor, fn must
+    be picklable and the chunks are copied to the workers.
+
+    Args:
+        fn (Callable[[Any], Any]): function that takes one chunk and returns the
+            processed chunk
+        n_chunks (int): number of chunks
+        executor (Executor, optional): executor from concurrent.futures that
+            processes the chunks. By default, the ThreadPoolExecutor managed by this
+            package will be used.
+        split (Callable[[Any, int], List[Any]], optional): function that takes the
+            data and the number of chunks, and returns the list of chunks. Defaults
+            to `split_chunks`.
+        combine (Callable[[List[Any]], Any], optional): function that takes the
+            list of processed chunks and returns the combined data. Defaults to
+            `combine_chunks`.
+
+    Returns:
+        Callable[[Any], Any]: The returned function to process the data in chunks.
+        It takes one argument 'x' and returns the combined results.
+    """
+
+    def wrapper(x: Any) -> Any:
+        """Wrapped chunked map function
+
+        Args:
+            x (Any): input data
+
+        Returns:
+            Any: output data
+        """
+        chunks = split(x, n_chunks)
+        outputs = list(executor.map(fn, chunks))
+        if isinstance(executor, ThreadPoolExecutor) and _is_inplace_result(
+            x, chunks, outputs
+        ):
+            return x
+        return combine(outputs)
+
+    return wrapper
+
+
+class _Accumulator(Stage):
+    def __init__(self, size: int, combine: Callable[[List[Any]], Any]) -> None:
+        """Stage that accumulates the input data, see `func_accumulate`"""
+        self.size = size
+        self.combine = combine
+        self._buffer: List[Any] = []
+        self._lock = Lock()
+
+    def __call__(self, x: Any) -> List[Any]:
+        with self._lock:
+            self._buffer.append(x)
+            if len(self._buffer) < self.size:
+                return []
+            batch = self._buffer.copy()
+            self._buffer.clear()
+        return [self.combine(batch)]
+
+    def cleanup(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buffer.clear()
+
+
+def func_accumulate(
+    size: int, combine: Callable[[List[Any]], Any] = list
+) -> Callable[[Any], List[Any]]:
+    """Create a function that accumulates the input data and emits the combined data
+    once every `size` data, e.g. fusing several sweeps into one point cloud. It is
+    meant to be added with `Pipeline.add_flat_map`. The data accumulated so far is
+    discarded when the stage is reset or cleaned up.
+
+    Args:
+        size (int): the number of data to be combined
+        combine (Callable[[List[Any]], Any], optional): function that combines the
+            list of accumulated data into one data. Defaults to list.
+
+    Returns:
+        Callable[[Any], List[Any]]: The returned function. It takes one argument 'x'
+        which supposed to be the input data, and returns a list that contains the
+        combined data if `size` data have been accumulated, or an empty list otherwise.
+    """
+    return _Accumulator(size, combine)
@@ -1,17 +1,75 @@
+from dataclasses import replace
 from queue import Empty, Full, Queue
-from threading import Event, get_ident, Thread
+from threading import Event, get_ident, Lock, Thread
 import time
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 from pystream.data.pipeline_data import PipelineData
-from pystream.data.stage_data import StageLinks, StageQueueProtocol
+from pystream.data.stage_data import StageLinks, StageOptions, StageQueueProtocol
 from pystream.pipeline.pipeline_base import PipelineBase
+from pystream.pipeline.utils.admission import AdmissionPolicy, PipelineLoad
 from pystream.pipeline.utils.profiler import ProfilerHandler
-from pystream.stage.final_stage import FinalStage
+from pystream.pipeline.utils.queues import PriorityStageQueue, resize_queue
+from pystream.pipeline.utils.watchdog import StageWatchdog
+from pystream.stage.container import (
+    BranchContainer,
+    BranchTail,
+    FlatMapContainer,
+    FusedStage,
+    iter_containers,
+    PipelineContainer,
+    PipelineEntry,
+    PipelineExit,
+    StageContainer,
+)
+from pystream.stage.final_stage import FinalStage, SinkProtocol
 from pystream.stage.stage import Stage, StageCallable
-from pystream.utils.errors import PipelineTerminated
+from pystream.utils.errors import PipelineInitiationError, PipelineTerminated
 from pystream.pipeline.utils.general import containerize_stages
+from pystream.utils.general import (
+    _DEADLINE_DROP_REASON,
+    _PROFILE_LEVEL_SEPARATOR,
+    _STALLED_DROP_REASON,
+)
 from pystream.utils.logger import LOGGER
+from pystream.utils.placement import apply_thread_placement
+
+
+# Time in seconds between the checks of a broken pipeline while draining
+_DRAIN_POLL_PERIOD = 0.1
+
+
+def group_by_cost(
+    costs: List[Optional[float]], threshold: Optional[float]
+) -> List[List[int]]:
+    """Group the consecutive stages whose total cost is within the threshold.
+    Stages with unknown cost are not grouped with the others.
+
+    Args:
+        costs (List[Optional[float]]): cost of each stage in seconds, None if the
+            stage cannot be grouped
+        threshold (Optional[float]): the maximum total cost of a group. If None,
+            each stage is in its own group.
+
+    Returns:
+        List[List[int]]: the indices of the stages in each group
+    """
+    groups: List[List[int]] = []
+    group: List[int] = []
+    group_cost = 0.0
+    for i, cost in enumerate(costs):
+        if cost is None or threshold is None or group_cost + cost > threshold:
+            if len(group) > 0:
+                groups.append(group)
+            group, group_cost = [], 0.0
+        if cost is None or threshold is None:
+            groups.append([i])
+            continue
+        group.append(i)
+        group_cost += cost
+    if len(group) > 0:
+        groups.append(group)
+    return groups
 
 
 def send_output(
@@ -59,6 +117,7 @@ class StageThread(Thread):
         name: str = "Stage",
         all_out: bool = True,
         replace_output: bool = False,
+        drop_queue: Optional[StageQueueProtocol] = None,
     ) -> None:
         """Thread class for the stage
 
@@ -72,6 +131,10 @@ class StageThread(Thread):
             replace_output (bool, optional): If true, when the queue is full,
                 replace the data currently in the queue with the new data.
                 Defaults to False.
+            drop_queue (Optional[StageQueueProtocol], optional): Queue that
+                receives the dropped data instead of the output queue, i.e. the
+                input queue of the final stage. If None, the dropped data is sent
+                to the output queue. Defaults to None.
         """
         super().__init__(name=name, daemon=True)
         self.stage = stage
@@ -80,47 +143,373 @@ class StageThread(Thread):
         self.output_enabled = True
         self.daemon = True
         self.replace_output = replace_output
+        self.drop_queue = drop_queue
         self.send_output_timeout = 10
+        # Waiting time in seconds after the input queue is emptied on cleanup
+        self.cleanup_wait = 1.0
+        # Whether to cleanup the stage when the thread is terminated
+        self.owns_stage = True
+        # Maximum age of the data at which the stage must finish processing it
+        self.deadline: Optional[float] = None
+        # Moving average of the stage processing time, used to predict
+        # whether the data can meet the deadline
+        self.expected_duration = 0.0
+        self.duration_smoothing = 0.1
+        # Samples given to the warmup method of the stage
+        self.warmup_samples: Optional[List[Any]] = None
+        # Set when the stage is set up and warmed up, or failed to do so
+        self.ready = Event()
+        self.ready_at: Optional[float] = None
+        self.setup_error: Optional[Exception] = None
+        # Options that place the thread on the CPUs, see `StageOptions`
+        self.placement_options = StageOptions()
+        # Effective placement of the thread, set when the thread is started
+        self.placement: Dict[str, Any] = {}
+        # Maximum time to process one data, watched by the watchdog
+        self.time_budget: Optional[float] = None
+        # The data being processed and since when, read by the watchdog
+        self.current: Optional[PipelineData] = None
+        self.busy_since: Optional[float] = None
+        self.busy_lock = Lock()
+        # Set when the watchdog has released the stalled data, the thread then
+        # exits once the stage returns
+        self.abandoned = False
+        # Data to send to the next stage before taking any input, i.e. the data
+        # released from the stalled thread this thread replaces
+        self.pending: Optional[PipelineData] = None
+        # Number of data that could not be sent to the next stage
+        self.lost = 0
 
     def run(self) -> None:
+        self.place_thread()
         self.start_thread()
+        if not self.prepare():
+            self.process_cleanup()
+            return
         self.run_loop()
 
+    def place_thread(self) -> None:
+        options = self.placement_options
+        self.placement = apply_thread_placement(
+            options.cpus, options.nice, options.blas_threads
+        )
+
     def start_thread(self):
         self.print_log("Thread started...")
         time.sleep(0.1)
         self.links.starter.set()
 
+    def prepare(self) -> bool:
+        """Set up and warm up the stage in this thread. If it fails, the whole
+        pipeline is stopped.
+
+        Returns:
+            bool: True if the stage is ready
+        """
+        try:
+            self.prepare_stage()
+        except Exception as e:
+            LOGGER.error(f"Stage {self.name} failed to get ready: {e!r}")
+            self.setup_error = e
+            self.links.stopper.set()
+        self.ready_at = time.perf_counter()
+        self.ready.set()
+        return self.setup_error is None
+
+    def prepare_stage(self) -> None:
+        if isinstance(self.stage, (StageContainer, BranchTail, FusedStage)):
+            self.stage.prepare(self.warmup_samples)
+
     def run_loop(self):
-        while not self.links.stopper.is_set():
+        if self.pending is not None:
+            data, self.pending = self.pending, None
+            self.emit(data)
+        while not (self.links.stopper.is_set() or self.abandoned):
             try:
                 data: PipelineData = self.links.input_queue.get(timeout=1)
             except Empty:
                 continue
-            data = self.stage(data)
-            if self.output_enabled:
-                send_output(
-                    data,
-                    self.links.output_queue,
-                    block=self.all_out,
-                    replace=self.replace_output,
-                    timeout=self.send_output_timeout,
+            if not self.wait_running():
+                break
+            if self.is_expired(data):
+                data.drop(self.name, _DEADLINE_DROP_REASON)
+                self.emit(data)
+                continue
+            self.process(data)
+        if not self.abandoned:
+            self.process_cleanup()
+
+    def wait_running(self) -> bool:
+        """Wait while the stage is paused
+
+        Returns:
+            bool: False if the pipeline is stopped while waiting
+        """
+        if self.links.runner is None:
+            return True
+        while not self.links.runner.wait(timeout=1):
+            if self.links.stopper.is_set():
+                return False
+        return True
+
+    def is_expired(self, data: PipelineData) -> bool:
+        """Check whether the data cannot finish this stage before the deadline,
+        based on its age and the average processing time of the stage.
+
+        The average is only updated by processed data, so it decays each time it
+        alone makes the data miss the deadline. Otherwise, one slow call could
+        keep every later data from being processed."""
+        if self.deadline is None or data.is_dropped or data.bypass:
+            return False
+        started = data.profile.data.started
+        if started is None:
+            return False
+        age = time.perf_counter() - started
+        if age > self.deadline:
+            return True
+        if age + self.expected_duration <= self.deadline:
+            return False
+        self.expected_duration *= 1 - self.duration_smoothing
+        return True
+
+    def process(self, data: PipelineData) -> None:
+        """Process one data taken from the input queue"""
+        start = time.perf_counter()
+        # The stage may change the data after it is released, so the released data
+        # is a copy taken before the stage is called
+        current = data
+        if self.time_budget is not None:
+            current = replace(data, profile=data.profile.copy())
+        with self.busy_lock:
+            self.current, self.busy_since = current, start
+        data = self.stage(data)
+        with self.busy_lock:
+            self.current, self.busy_since = None, None
+            if self.abandoned:
+                return
+        self.update_duration(time.perf_counter() - start)
+        self.emit(data)
+
+    def abandon(self) -> Optional[PipelineData]:
+        """Give up the data being processed, after which the thread exits once
+        the stage returns
+
+        Returns:
+            Optional[PipelineData]: the data as it was before the stage was called,
+            None if the stage is idle
+        """
+        with self.busy_lock:
+            data = self.current
+            if data is None:
+                return None
+            self.current, self.busy_since = None, None
+            self.abandoned = True
+            return data
+
+    def clone(self) -> "StageThread":
+        """Create a new thread that runs the same stage with the same settings"""
+        stage_thread = StageThread(
+            self.stage,
+            self.links,
+            self.name,
+            all_out=self.all_out,
+            replace_output=self.replace_output,
+            drop_queue=self.drop_queue,
+        )
+        stage_thread.output_enabled = self.output_enabled
+        stage_thread.send_output_timeout = self.send_output_timeout
+        stage_thread.cleanup_wait = self.cleanup_wait
+        stage_thread.owns_stage = self.owns_stage
+        stage_thread.deadline = self.deadline
+        stage_thread.expected_duration = self.expected_duration
+        stage_thread.placement_options = self.placement_options
+        stage_thread.time_budget = self.time_budget
+        stage_thread.lost = self.lost
+        return stage_thread
+
+    def update_duration(self, duration: float) -> None:
+        """Update the average processing time of the stage"""
+        self.expected_duration += self.duration_smoothing * (
+            duration - self.expected_duration
+        )
+
+    def emit(self, data: PipelineData) -> None:
+        """Send the processed data to the next stage. Dropped data goes to the
+        drop queue if any, and data dropped in the main pipeline is not
+        sent out of the pipeline."""
+        if data.is_dropped:
+            if self.drop_queue is not None:
+                self.put_until_stopped(data, self.drop_queue)
+                return
+            if data.profile.is_finished:
+                return
+        if self.output_enabled:
+            sent = send_output(
+                data,
+                self.links.output_queue,
+                block=self.all_out,
+                replace=self.replace_output,
+                timeout=self.send_output_timeout,
+            )
+            if not sent:
+                self.lost += 1
+            if not sent and not self.links.stopper.is_set():
+                LOGGER.warning(
+                    f"Stage {self.name} could not send a data to the next stage"
+                    f" within {self.send_output_timeout} s, the data is lost"
                 )
-        self.process_cleanup()
 
     def process_cleanup(self):
         self.print_log(f"Terminating thread...")
         self.links.stopper.set()
-        if isinstance(self.stage, Stage):
-            self.stage.cleanup()
+        if self.owns_stage:
+            self.cleanup_stage()
         while not self.links.input_queue.empty():
             self.links.input_queue.get()
-        time.sleep(1)
+        time.sleep(self.cleanup_wait)
         self.print_log(f"Thread terminated...")
 
+    def cleanup_stage(self) -> None:
+        if isinstance(self.stage, Stage):
+            self.stage.cleanup()
+
     def print_log(self, msg: str) -> None:
         LOGGER.debug(f"({self.name} {get_ident()}) {msg}")
 
+    def put_until_stopped(self, data: PipelineData, queue: StageQueueProtocol) -> bool:
+        """Put data into a queue, wait as long as the pipeline is running
+
+        Returns:
+            bool: True if the data is put, False if the pipeline is stopped
+        """
+        while not self.links.stopper.is_set():
+            try:
+                queue.put(data, timeout=1)
+            except Full:
+                continue
+            return True
+        return False
+
+    def get_until_stopped(self, queue: StageQueueProtocol) -> Optional[PipelineData]:
+        """Get data from a queue, wait as long as the pipeline is running
+
+        Returns:
+            Optional[PipelineData]: the data, None if the pipeline is stopped
+        """
+        while not self.links.stopper.is_set():
+            try:
+                return queue.get(timeout=1)
+            except Empty:
+                continue
+        return None
+
+
+class FlatMapThread(StageThread):
+    def __init__(
+        self,
+        stage: FlatMapContainer,
+        links: StageLinks,
+        name: str = "Stage",
+        drop_queue: Optional[StageQueueProtocol] = None,
+    ) -> None:
+        """Thread of a flat-map stage, which sends each output to the next
+        stage as soon as it is produced.
+
+        Args:
+            stage (FlatMapContainer): the flat-map stage
+            links (StageLinks): the connection module of the stage
+            name (str, optional): Name of the thread. Defaults to "Stage".
+            drop_queue (Optional[StageQueueProtocol], optional): Queue that
+                receives the dropped data. Defaults to None.
+        """
+        super().__init__(stage, links, name=name, drop_queue=drop_queue)
+        self.flat_map_stage = stage
+
+    def process(self, data: PipelineData) -> None:
+        for output in self.flat_map_stage.iterate(data):
+            self.emit(output)
+
+
+class BranchForkThread(StageThread):
+    def __init__(
+        self,
+        stage: BranchContainer,
+        links: StageLinks,
+        branch_queues: Dict[str, StageQueueProtocol],
+        name: str = "Stage",
+    ) -> None:
+        """Thread that sends the input data to the first stage of each branch.
+        The output queue of the links receives the original data, which is
+        waited by the join thread.
+
+        Args:
+            stage (BranchContainer): the branches stage
+            links (StageLinks): the connection module of the stage
+            branch_queues (Dict[str, StageQueueProtocol]): the input queue
+                of each branch
+            name (str, optional): Name of the thread. Defaults to "Stage".
+        """
+        super().__init__(stage, links, name=name)
+        self.branch_stage = stage
+        self.branch_queues = branch_queues
+
+    def process(self, data: PipelineData) -> None:
+        if data.bypass or data.is_dropped:
+            self.links.output_queue.put(data)
+            return
+        forks = self.branch_stage.fork(data)
+        self.links.output_queue.put(data)
+        for branch_name, branch_queue in self.branch_queues.items():
+            if not self.put_until_stopped(forks[branch_name], branch_queue):
+                return
+
+    def prepare_stage(self) -> None:
+        pass
+
+    def cleanup_stage(self) -> None:
+        pass
+
+
+class BranchJoinThread(StageThread):
+    def __init__(
+        self,
+        stage: BranchContainer,
+        links: StageLinks,
+        branch_queues: Dict[str, StageQueueProtocol],
+        name: str = "Stage",
+    ) -> None:
+        """Thread that collects the outputs of the branches for each data
+        and merges them.
+
+        Args:
+            stage (BranchContainer): the branches stage
+            links (StageLinks): the connection module of the stage, where
+                the input queue contains the original data from the fork thread
+            branch_queues (Dict[str, StageQueueProtocol]): the output queue
+                of each branch
+            name (str, optional): Name of the thread. Defaults to "Stage".
+        """
+        super().__init__(stage, links, name=name)
+        self.branch_stage = stage
+        self.branch_queues = branch_queues
+
+    def process(self, data: PipelineData) -> None:
+        if not (data.bypass or data.is_dropped):
+            outputs = {}
+            for branch_name, branch_queue in self.branch_queues.items():
+                branch_data = self.get_until_stopped(branch_queue)
+                if branch_data is None:
+                    return
+                outputs[branch_name] = branch_data
+            data = self.branch_stage.join(data, outputs)
+        self.emit(data)
+
+    def prepare_stage(self) -> None:
+        self.branch_stage.prepare_join()
+
+    def cleanup_stage(self) -> None:
+        self.branch_stage.cleanup_join()
+
 
 class ParallelThreadPipeline(PipelineBase):
     def __init__(
@@ -132,6 +521,19 @@ class ParallelThreadPipeline(PipelineBase):
         block_output: bool = False,
         output_timeout: float = 10,
         profiler_handler: Optional[ProfilerHandler] = None,
+        sinks: Optional[List[SinkProtocol]] = None,
+        options: Optional[List[StageOptions]] = None,
+        latency_budget: Optional[float] = None,
+        priority: bool = False,
+        queue_size: int = 1,
+        priority_max_wait: Optional[float] = 1.0,
+        admission: Optional[List[AdmissionPolicy]] = None,
+        warmup_samples: Optional[List[Any]] = None,
+        wait_ready: bool = True,
+        flatten: bool = False,
+        fuse_threshold: Optional[float] = None,
+        stage_costs: Optional[Dict[str, float]] = None,
+        watchdog: Optional[StageWatchdog] = None,
     ) -> None:
         """The class that will handle the parallel pipeline
         based on multi-threading.
@@ -152,10 +554,66 @@ class ParallelThreadPipeline(PipelineBase):
             output_timeout (float, optional): Blocking timeout for the `get_results`
             profiler_handler (Optional[ProfilerHandler]): Handler for the profiler.
                 If None, no profiling attempt will be done.
+            sinks (Optional[List[SinkProtocol]]): Consumers that receive every
+                finished data. Defaults to None.
+            options (Optional[List[StageOptions]]): Options of each stage. If None,
+                the default options are used. Defaults to None.
+            latency_budget (Optional[float]): Maximum age of the data in seconds.
+                Data that cannot finish a stage within this age is dropped before
+                the stage. If None, no data is dropped. Defaults to None.
+            priority (bool): Whether to use priority queues between the stages,
+                so that data with higher priority overtakes the others waiting in
+                the queue. Defaults to False.
+            queue_size (int): Size of the queues between the stages. Data can only
+                overtake each other if this is larger than 1. Defaults to 1.
+            priority_max_wait (Optional[float]): Waiting time in seconds after
+                which the oldest data in a priority queue is served first regardless
+                of its priority. If None, low priority data may starve.
+                Defaults to 1.0.
+            admission (Optional[List[AdmissionPolicy]]): Policies that decide
+                whether a new data is admitted by `forward`. The data must be
+                admitted by all policies. Defaults to None.
+            warmup_samples (Optional[List[Any]]): Samples of the input data that
+                are given to the `warmup` method of each stage after it is set up.
+                Defaults to None.
+            wait_ready (bool): Whether to wait until all stages are set up and
+                warmed up before returning. The stages are prepared concurrently,
+                each in its own thread. If False, the data forwarded before the
+                pipeline is ready waits in the queues. Defaults to True.
+            flatten (bool): Whether to run the stages of the child parallel
+                pipelines directly in this pipeline, each in its own thread, so that
+                the data streams through them. The threads of the child pipelines
+                are stopped. Defaults to False.
+            fuse_threshold (Optional[float]): If given, consecutive plain stages
+                whose total cost in seconds is within this threshold are run by one
+                thread, to save the handoff between threads. The cost of a stage is
+                the `cost` option or the measurement in `stage_costs`, stages with
+                unknown cost are not fused. Defaults to None.
+            stage_costs (Optional[Dict[str, float]]): Measured processing time of
+                the stages in seconds, keyed by stage name in the same format as the
+                profiles without the main pipeline name. Defaults to None.
+            watchdog (Optional[StageWatchdog]): Watchdog of the stages that have a
+                `time_budget` option. If None and such stages exist, a watchdog that
+                only reports the stalls is used. Defaults to None.
         """
-        self.final_stage = FinalStage(profiler_handler)
-        self.stages = containerize_stages(stages, names)
+        self.start_time = time.perf_counter()
+        self.warmup_samples = warmup_samples
+        self.flatten = flatten
+        self.fuse_threshold = fuse_threshold
+        self.stage_costs: Dict[str, float] = {} if stage_costs is None else stage_costs
+        self.final_stage = FinalStage(profiler_handler, sinks)
+        self.stages = containerize_stages(stages, names, options)
         self.stages.append(self.final_stage)
+        self.latency_budget = latency_budget
+        self.priority = priority
+        self.queue_size = queue_size
+        self.priority_max_wait = priority_max_wait
+        self.admission: List[AdmissionPolicy] = [] if admission is None else admission
+        self.admitted = 0
+        self.rejected = {policy.name: 0 for policy in self.admission}
+        self.admission_lock = Lock()
+        # Cleared when the pipeline is drained to stop admitting new data
+        self.accepting = True
         self.block_input = block_input
         self.input_timeout = input_timeout
         self.block_output = block_output
@@ -163,43 +621,414 @@ class ParallelThreadPipeline(PipelineBase):
 
         self.build_pipeline()
         self.run_pipeline()
+        self.watchdog = watchdog
+        if self.watchdog is None and len(self.watched_stages()) > 0:
+            self.watchdog = StageWatchdog()
+        if self.watchdog is not None:
+            self.watchdog.start(self)
         self.results = PipelineData()
+        if wait_ready:
+            self.wait_ready()
 
     def build_pipeline(self):
         """Build the pipeline."""
         # Create the first link
         self.stopper = Event()
         self.starter = Event()
-        # The first stage's input is the output
-        # of the pipeline handler
-        input_queue = Queue(maxsize=1)
-        self.main_output_queue = input_queue
+        # Cleared to pause the stages
+        self.runner = Event()
+        self.runner.set()
+        self.stage_groups: List[List[str]] = []
+        stages = self.fuse_stages(self.stages[:-1]) + [self.final_stage]
+        # The queues between the stages, the first stage's input is the
+        # output of the pipeline handler
+        queues = [self.create_queue() for _ in range(len(stages))]
+        self.stage_queues = list(queues)
+        # The pipeline output keeps only the latest data
+        queues.append(Queue(maxsize=1))
+        self.main_output_queue = queues[0]
+        # Dropped data skips the remaining stages and goes to the final stage
+        drop_queue = queues[-2]
         self.stage_threads: List[StageThread] = []
         self.stage_links: List[StageLinks] = []
+        self.flat_map_stages: List[FlatMapContainer] = []
         # Create the stage threars one by one along with the links
-        for _, stage in enumerate(self.stages):
-            output_queue = Queue(maxsize=1)
-            links = StageLinks(
-                input_queue=input_queue,
-                output_queue=output_queue,
-                stopper=self.stopper,
-                starter=self.starter,
-            )
-            self.stage_threads.append(StageThread(stage, links, stage.name))
-            self.stage_links.append(links)
-            input_queue = output_queue
+        for i, stage in enumerate(stages):
+            input_queue, output_queue = queues[i], queues[i + 1]
+            stage_drop_queue = drop_queue if stage is not self.final_stage else None
+            self.build_stage(stage, input_queue, output_queue, stage_drop_queue)
         # Replace output of the last stage to avoid blocking
         self.stage_threads[-1].all_out = False
         self.stage_threads[-1].replace_output = True
         # The last stage's output is the input of the pipeline handler
-        self.main_input_queue = input_queue
+        self.main_input_queue = queues[-1]
+        if self.fuse_threshold is not None:
+            LOGGER.info(f"Stage groups of the pipeline threads: {self.stage_groups}")
+
+    def build_stage(
+        self,
+        stage: Stage,
+        input_queue: StageQueueProtocol,
+        output_queue: StageQueueProtocol,
+        drop_queue: Optional[StageQueueProtocol] = None,
+    ) -> None:
+        """Create the threads of a stage"""
+        if isinstance(stage, BranchContainer):
+            self.build_branches(stage, input_queue, output_queue, drop_queue)
+        elif self.is_flattened(stage):
+            self.build_child_pipeline(
+                stage, input_queue, output_queue, drop_queue  # type: ignore
+            )
+        else:
+            self.add_stage_thread(stage, input_queue, output_queue, drop_queue)
+
+    def is_flattened(self, stage: Stage) -> bool:
+        """Whether the stage is a child pipeline whose threads join this pipeline"""
+        return (
+            self.flatten
+            and isinstance(stage, PipelineContainer)
+            and isinstance(stage.stage, ParallelThreadPipeline)
+        )
+
+    def build_child_pipeline(
+        self,
+        stage: PipelineContainer,
+        input_queue: StageQueueProtocol,
+        output_queue: StageQueueProtocol,
+        drop_queue: Optional[StageQueueProtocol] = None,
+    ) -> None:
+        """Create the threads of the stages of a child parallel pipeline, between
+        an entry thread and an exit thread that runs its final stage. The data
+        dropped in the child pipeline goes to the exit thread first."""
+        child = stage.stage
+        assert isinstance(child, ParallelThreadPipeline)
+        child.release_stages()
+        child_stages = self.fuse_stages(
+            child.stages[:-1], f"{stage.name}{_PROFILE_LEVEL_SEPARATOR}"
+        )
+        queues = [self.create_queue() for _ in range(len(child_stages) + 1)]
+        self.stage_queues.extend(queues)
+        self.add_stage_thread(PipelineEntry(stage), input_queue, queues[0], drop_queue)
+        for i, child_stage in enumerate(child_stages):
+            self.build_stage(child_stage, queues[i], queues[i + 1], queues[-1])
+        self.add_stage_thread(
+            PipelineExit(stage, child.final_stage), queues[-1], output_queue, drop_queue
+        )
+
+    def fuse_stages(self, stages: List[Stage], prefix: str = "") -> List[Stage]:
+        """Group the consecutive cheap plain stages into fused stages, and record
+        the names of the stages run by each thread
+
+        Args:
+            stages (List[Stage]): the stages, without the final stage
+            prefix (str, optional): prefix of the stage names in `stage_costs`.
+                Defaults to "".
+
+        Returns:
+            List[Stage]: the stages to be run by separate threads
+        """
+        costs = [self.get_stage_cost(stage, prefix) for stage in stages]
+        out: List[Stage] = []
+        for group in group_by_cost(costs, self.fuse_threshold):
+            members = [stages[i] for i in group]
+            if len(members) > 1:
+                out.append(FusedStage(members))  # type: ignore
+            else:
+                out.append(members[0])
+            if not self.is_flattened(members[0]):
+                self.stage_groups.append([prefix + stage.name for stage in members])
+        return out
+
+    def get_stage_cost(self, stage: Stage, prefix: str = "") -> Optional[float]:
+        """Get the cost of a stage that can be fused, None if it cannot be fused"""
+        if type(stage) is not StageContainer or stage.options.has_placement:
+            return None
+        if stage.options.time_budget is not None:
+            return None
+        if stage.options.cost is not None:
+            return stage.options.cost
+        return self.stage_costs.get(prefix + stage.name)
+
+    def release_stages(self) -> None:
+        """Stop the threads without cleaning up the stages, so that the stages can
+        be run by another pipeline"""
+        if self.watchdog is not None:
+            self.watchdog.stop()
+        for stage_thread in self.stage_threads:
+            stage_thread.owns_stage = False
+            stage_thread.cleanup_wait = 0
+        self.stopper.set()
+        for stage_thread in self.stage_threads:
+            stage_thread.join()
+
+    def add_stage_thread(
+        self,
+        stage: Stage,
+        input_queue: StageQueueProtocol,
+        output_queue: StageQueueProtocol,
+        drop_queue: Optional[StageQueueProtocol] = None,
+    ) -> None:
+        """Create the thread of a stage along with its links"""
+        links = StageLinks(
+            input_queue=input_queue,
+            output_queue=output_queue,
+            stopper=self.stopper,
+            starter=self.starter,
+            runner=self.runner,
+        )
+        if isinstance(stage, FlatMapContainer):
+            stage_thread = FlatMapThread(stage, links, stage.name, drop_queue)
+            self.flat_map_stages.append(stage)
+        else:
+            stage_thread = StageThread(stage, links, stage.name, drop_queue=drop_queue)
+        stage_thread.deadline = self.get_stage_deadline(stage)
+        stage_thread.warmup_samples = self.warmup_samples
+        if isinstance(stage, StageContainer):
+            stage_thread.placement_options = stage.options
+            if type(stage_thread) is StageThread:
+                stage_thread.time_budget = stage.options.time_budget
+        self.stage_threads.append(stage_thread)
+        self.stage_links.append(links)
+
+    def watched_stages(self) -> List[StageThread]:
+        """Get the stage threads watched by the watchdog"""
+        return [
+            stage_thread
+            for stage_thread in self.stage_threads
+            if stage_thread.time_budget is not None
+        ]
+
+    def release_stalled(self, stage_thread: StageThread, drop: bool) -> bool:
+        """Release the data of a stalled stage thread. The thread is replaced by
+        a new one that sends the released data first, so the caller is not
+        blocked by a full output queue, then runs the stage for the next data.
+
+        Args:
+            stage_thread (StageThread): the stalled thread
+            drop (bool): whether to drop the data, otherwise it is sent to the next
+                stage as it is
+
+        Returns:
+            bool: True if the data is released, False if the thread is idle
+        """
+        data = stage_thread.abandon()
+        if data is None:
+            return False
+        if drop:
+            data.drop(stage_thread.name, _STALLED_DROP_REASON)
+        replacement = stage_thread.clone()
+        replacement.pending = data
+        stage_thread.owns_stage = False
+        # The stalled call may never return, so the stages must not wait for it
+        # when they are replaced
+        if stage_thread.ident is not None:
+            for container in iter_containers([stage_thread.stage]):
+                container.release_thread(stage_thread.ident)
+        self.stage_threads[self.stage_threads.index(stage_thread)] = replacement
+        replacement.start()
+        return True
+
+    def set_latency_budget(self, latency_budget: Optional[float]) -> None:
+        """Change the latency budget of the running pipeline
+
+        Args:
+            latency_budget (Optional[float]): the new latency budget in seconds,
+                None to only use the stage deadlines
+        """
+        self.latency_budget = latency_budget
+        for stage_thread in self.stage_threads:
+            if isinstance(stage_thread, (BranchForkThread, BranchJoinThread)):
+                continue
+            stage_thread.deadline = self.get_stage_deadline(stage_thread.stage)
+
+    def create_queue(self) -> StageQueueProtocol:
+        """Create the input queue of a stage"""
+        if self.priority:
+            return PriorityStageQueue(self.queue_size, self.priority_max_wait)
+        return Queue(maxsize=self.queue_size)
+
+    def get_deadline(self, options: StageOptions) -> Optional[float]:
+        """Get the deadline of a stage, the tighter one between the stage
+        deadline and the pipeline latency budget"""
+        deadlines = [
+            deadline
+            for deadline in [options.deadline, self.latency_budget]
+            if deadline is not None
+        ]
+        return min(deadlines) if len(deadlines) > 0 else None
+
+    def get_stage_deadline(self, stage: StageCallable) -> Optional[float]:
+        """Get the deadline of the stage run by a thread, the tightest one among
+        the fused stages"""
+        if isinstance(stage, BranchTail):
+            return self.get_stage_deadline(stage.stage)
+        if isinstance(stage, StageContainer):
+            return self.get_deadline(stage.options)
+        if isinstance(stage, FusedStage):
+            deadlines = [self.get_deadline(s.options) for s in stage.stages]
+            valid = [deadline for deadline in deadlines if deadline is not None]
+            return min(valid) if len(valid) > 0 else None
+        return None
+
+    def build_branches(
+        self,
+        stage: BranchContainer,
+        input_queue: StageQueueProtocol,
+        output_queue: StageQueueProtocol,
+        drop_queue: Optional[StageQueueProtocol] = None,
+    ) -> None:
+        """Create the threads of a branches stage. Each stage of the branches
+        lives in its own thread, between a fork thread and a join thread. Data
+        dropped in a branch still goes to the join thread, which drops the
+        whole data. The deadline of the branches stage applies to each stage of
+        the branches."""
+        branch_inputs: Dict[str, StageQueueProtocol] = {}
+        branch_outputs: Dict[str, StageQueueProtocol] = {}
+        for branch_name, branch_stages in stage.branch_stages.items():
+            branch_queue = Queue(maxsize=1)
+            branch_inputs[branch_name] = branch_queue
+            for branch_stage in branch_stages:
+                container = (
+                    branch_stage.stage
+                    if isinstance(branch_stage, BranchTail)
+                    else branch_stage
+                )
+                if isinstance(container, StageContainer):
+                    container.options = replace(
+                        container.options, deadline=stage.options.deadline
+                    )
+                branch_output = Queue(maxsize=1)
+                self.add_stage_thread(branch_stage, branch_queue, branch_output)
+                branch_queue = branch_output
+            branch_outputs[branch_name] = branch_queue
+        # Queue of data waiting for its branches to finish, the fork
+        # thread is limited by the branch queues instead of this queue
+        pending_queue = Queue()
+        fork_links = StageLinks(
+            input_queue=input_queue,
+            output_queue=pending_queue,
+            stopper=self.stopper,
+            starter=self.starter,
+            runner=self.runner,
+        )
+        join_links = StageLinks(
+            input_queue=pending_queue,
+            output_queue=output_queue,
+            stopper=self.stopper,
+            starter=self.starter,
+            runner=self.runner,
+        )
+        self.stage_threads.append(
+            BranchForkThread(stage, fork_links, branch_inputs, f"{stage.name}_Fork")
+        )
+        self.stage_links.append(fork_links)
+        join_thread = BranchJoinThread(
+            stage, join_links, branch_outputs, f"{stage.name}_Join"
+        )
+        join_thread.drop_queue = drop_queue
+        self.stage_threads.append(join_thread)
+        self.stage_links.append(join_links)
 
     def run_pipeline(self):
-        """Run the pipeline."""
-        for stage, link in zip(self.stage_threads, self.stage_links):
+        """Run the pipeline. All threads are started at once, so that the
+        stages are set up concurrently."""
+        for stage in self.stage_threads:
             stage.start()
+        for link in self.stage_links:
             link.starter.wait()
 
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all stages are set up and warmed up
+
+        Args:
+            timeout (Optional[float], optional): Waiting timeout in seconds. If None,
+                wait forever. Defaults to None.
+
+        Raises:
+            PipelineInitiationError: raised if a stage failed to get ready, in which
+                case the pipeline has been stopped.
+
+        Returns:
+            bool: True if the pipeline is ready, False if the timeout is reached
+        """
+        end = None if timeout is None else time.perf_counter() + timeout
+        for stage_thread in self.stage_threads:
+            remaining = None if end is None else max(0.0, end - time.perf_counter())
+            if not stage_thread.ready.wait(remaining):
+                return False
+        for stage_thread in self.stage_threads:
+            if stage_thread.setup_error is not None:
+                raise PipelineInitiationError(
+                    f"Stage {stage_thread.name} failed to get ready"
+                ) from stage_thread.setup_error
+        if self.ready_time is None:
+            self.ready_time = (
+                max(
+                    stage_thread.ready_at or self.start_time
+                    for stage_thread in self.stage_threads
+                )
+                - self.start_time
+            )
+        return True
+
+    def pause(self) -> None:
+        """Pause the stages. Each stage finishes the data it is processing and
+        then waits, while the forwarded data waits in the queues."""
+        self.runner.clear()
+
+    def resume(self) -> None:
+        """Resume the paused stages"""
+        self.runner.set()
+
+    @property
+    def is_paused(self) -> bool:
+        """True if the stages are paused"""
+        return not self.runner.is_set()
+
+    def reconfigure(
+        self,
+        queue_size: Optional[int] = None,
+        block_input: Optional[bool] = None,
+        input_timeout: Optional[float] = None,
+        block_output: Optional[bool] = None,
+        output_timeout: Optional[float] = None,
+        stage_output_timeout: Optional[float] = None,
+    ) -> None:
+        """Change the settings of the running pipeline without restarting its
+        threads. The settings that are None are not changed.
+
+        Args:
+            queue_size (Optional[int], optional): Size of the queues between
+                the stages. Data already in a queue is kept even if the queue is
+                shrunk. Defaults to None.
+            block_input (Optional[bool], optional): Whether the `forward` method
+                is in blocking mode. Defaults to None.
+            input_timeout (Optional[float], optional): Blocking timeout for the
+                `forward` method in seconds. Defaults to None.
+            block_output (Optional[bool], optional): Whether the `get_results`
+                method is in blocking mode. Defaults to None.
+            output_timeout (Optional[float], optional): Blocking timeout for the
+                `get_results` method in seconds. Defaults to None.
+            stage_output_timeout (Optional[float], optional): Time in seconds a
+                stage waits for the next stage to accept its output before the
+                output is discarded. Defaults to None.
+        """
+        if queue_size is not None:
+            self.queue_size = queue_size
+            for queue in self.stage_queues:
+                resize_queue(queue, queue_size)  # type: ignore
+        if block_input is not None:
+            self.block_input = block_input
+        if input_timeout is not None:
+            self.input_timeout = input_timeout
+        if block_output is not None:
+            self.block_output = block_output
+        if output_timeout is not None:
+            self.output_timeout = output_timeout
+        if stage_output_timeout is not None:
+            for stage_thread in self.stage_threads:
+                stage_thread.send_output_timeout = stage_output_timeout
+
     def forward(self, data_input: PipelineData) -> bool:
         """Send data to be processed by pipeline
 
@@ -215,14 +1044,117 @@ class ParallelThreadPipeline(PipelineBase):
         """
         if self.stopper.is_set():
             raise PipelineTerminated("The pipeline has been terminated")
+        if not self.accepting or not self.admit(data_input):
+            return False
         stat = send_output(
             data_input,
             self.main_output_queue,
             block=self.block_input,
             timeout=self.input_timeout,
         )
+        if stat:
+            with self.admission_lock:
+                self.admitted += 1
+        else:
+            for policy in self.admission:
+                policy.cancel(data_input)
         return stat
 
+    def admit(self, data: PipelineData) -> bool:
+        """Check the data against the admission policies and count the rejection.
+        If a policy rejects the data, the admission by the previous ones is
+        canceled."""
+        if len(self.admission) == 0:
+            return True
+        load = self.load()
+        for i, policy in enumerate(self.admission):
+            if not policy.admit(data, load):
+                with self.admission_lock:
+                    self.rejected[policy.name] = self.rejected.get(policy.name, 0) + 1
+                for admitted_by in self.admission[:i]:
+                    admitted_by.cancel(data)
+                return False
+        return True
+
+    def load(self) -> PipelineLoad:
+        """Get the current load of the pipeline
+
+        Returns:
+            PipelineLoad: the pipeline load
+        """
+        return PipelineLoad(
+            in_flight=self.count_in_flight(),
+            queue_depth=sum(link.input_queue.qsize() for link in self.stage_links),
+            latency=self.final_stage.recent_latency.percentile(50),
+        )
+
+    def count_in_flight(self) -> int:
+        """Count the data inside the pipeline, i.e. the admitted data and the
+        extra outputs of the flat-map stages that have not left the pipeline.
+        The data that a stage could not send to the next one is not counted."""
+        extra_outputs = sum(stage.extra_outputs for stage in self.flat_map_stages)
+        lost = sum(stage_thread.lost for stage_thread in self.stage_threads)
+        return self.admitted + extra_outputs - lost - self.final_stage.finished
+
+    def is_broken(self) -> bool:
+        """Check whether the pipeline is stopped or one of its stage threads
+        has died, so the data inside it may never leave it"""
+        if self.stopper.is_set():
+            return True
+        return not all(stage_thread.is_alive() for stage_thread in self.stage_threads)
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Stop admitting new data and wait until the data inside the pipeline
+        has left it. The paused stages are resumed. The waiting ends early if the
+        pipeline is stopped or a stage thread has died.
+
+        Args:
+            timeout (Optional[float], optional): Waiting timeout in seconds. If None,
+                wait until the pipeline is empty or broken. Defaults to None.
+
+        Returns:
+            bool: True if the pipeline is empty, False if the timeout is reached or
+            the pipeline is broken
+        """
+        self.accepting = False
+        self.resume()
+        end = None if timeout is None else time.perf_counter() + timeout
+        with self.final_stage.finished_condition:
+            while self.count_in_flight() > 0:
+                if self.is_broken():
+                    LOGGER.warning(
+                        f"Pipeline is stopped with {self.count_in_flight()} data"
+                        " inside it, stop draining"
+                    )
+                    return False
+                wait = _DRAIN_POLL_PERIOD
+                if end is not None:
+                    wait = min(wait, end - time.perf_counter())
+                    if wait <= 0:
+                        return False
+                # Dead threads do not notify, so the state is polled
+                self.final_stage.finished_condition.wait(wait)
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        load = self.load()
+        stats.update(
+            {
+                "admitted": self.admitted,
+                "rejected": dict(self.rejected),
+                "in_flight": load.in_flight,
+                "queue_depth": load.queue_depth,
+                "placement": {
+                    stage_thread.name: dict(stage_thread.placement)
+                    for stage_thread in self.stage_threads
+                },
+            }
+        )
+        if self.watchdog is not None:
+            stats["stalls"] = self.watchdog.stall_counts()
+        return stats
+
     def get_results(self) -> PipelineData:
         try:
             ret = self.main_input_queue.get(
@@ -233,10 +1165,30 @@ class ParallelThreadPipeline(PipelineBase):
         else:
             return ret
 
-    def cleanup(self) -> None:
+    def cleanup(self, drain: bool = False, timeout: Optional[float] = 10.0) -> None:
+        """Stop the pipeline and cleanup the stages
+
+        Args:
+            drain (bool, optional): Whether to let the data inside the pipeline
+                finish first, see `drain`. Otherwise, the data is discarded.
+                Defaults to False.
+            timeout (Optional[float], optional): Timeout of the draining in
+                seconds. If None, wait until the pipeline is empty. Defaults to 10.0.
+        """
+        if drain:
+            self.drain(timeout)
+        if self.watchdog is not None:
+            self.watchdog.stop()
+        # An empty pipeline has nothing to be discarded, so there is no need
+        # to wait for the stages to settle
+        is_empty = self.count_in_flight() <= 0
+        for proc in self.stage_threads:
+            if is_empty:
+                proc.cleanup_wait = 0
         self.stopper.set()
         for proc in self.stage_threads:
             proc.join()
         while not self.main_input_queue.empty():
             self.main_input_queue.get()
-        time.sleep(1)
+        if not is_empty:
+            time.sleep(1)
@@ -1,18 +1,66 @@
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 from pystream.data.pipeline_data import (
     InputGeneratorRequest,
     PipelineData,
     _request_generator,
 )
+from pystream.data.stage_data import StageOptions
 from pystream.pipeline import SerialPipeline
 from pystream.pipeline import ParallelThreadPipeline
 from pystream.pipeline.pipeline_base import PipelineBase
+from pystream.pipeline.utils.admission import AdmissionPolicy
 from pystream.pipeline.utils.automation import PipelineAutomation
+from pystream.pipeline.utils.autotune import (
+    TuningConstraints,
+    TuningObjective,
+    TuningReport,
+    TuningResult,
+    benchmark,
+    candidate_configs,
+    fusable_costs,
+    measure_stage_costs,
+    select_best,
+)
+from pystream.pipeline.utils.controller import LatencyController
+from pystream.pipeline.utils.general import containerize_stages
+from pystream.pipeline.utils.prefetch import InputSourceType, create_input_source
 from pystream.pipeline.utils.profiler import ProfilerHandler
+from pystream.pipeline.utils.sink import ResultSink
+from pystream.pipeline.utils.watchdog import StageWatchdog
+from pystream.stage.branch import BranchStageSpec, Branches
+from pystream.stage.container import (
+    collect_ready_times,
+    collect_stage_stats,
+    find_stage,
+    get_stage_name,
+)
+from pystream.stage.filter import Filter
+from pystream.stage.flat_map import FlatMap
+from pystream.stage.gate import ChangeGate
 from pystream.stage.stage import Stage, StageCallable
-from pystream.utils.errors import PipelineUndefined
-from pystream.utils.general import _PIPELINE_NAME_IN_PROFILE
+from pystream.utils.errors import (
+    InputExhausted,
+    InvalidStageName,
+    PipelineInitiationError,
+    PipelineUndefined,
+)
+from pystream.utils.general import (
+    _DEADLINE_DROP_REASON,
+    _PIPELINE_NAME_IN_PROFILE,
+    _PROFILE_LEVEL_SEPARATOR,
+)
 from pystream.utils.logger import LOGGER
 
 
@@ -20,31 +68,42 @@ class Pipeline:
     """The pipeline constructor
 
     Args:
-        input_generator (Optional[Callable[[], Any]], optional): Function that will be
-            used to generate input data if you want the pipeline to run autonomously.
-            If None, the input needs to be given by invoking "forward" method.
-            Defaults to None.
+        input_generator (Optional[InputSourceType], optional): Function that takes no
+            argument, or an iterable (e.g. a generator), that will be used to generate
+            input data if you want the pipeline to run autonomously. If None, the input
+            needs to be given by invoking "forward" method. Defaults to None.
         use_profiler (bool, optional): Whether to implement profiler to the pipeline.
             Defaults to False.
+        input_prefetch (int, optional): Number of input data that are generated in
+            advance by a background thread, so that the input generation is taken out
+            of the critical path. If 0, the input data is generated when it is
+            requested. Defaults to 0.
     """
 
     def __init__(
         self,
-        input_generator: Optional[Callable[[], Any]] = None,
+        input_generator: Optional[InputSourceType] = None,
         use_profiler: bool = False,
+        input_prefetch: int = 0,
     ) -> None:
         self.stages_sequence: List[StageCallable] = []
         self.stage_names: List[Optional[str]] = []
+        self.stage_options: List[StageOptions] = []
         self.pipeline: Optional[PipelineBase] = None
 
-        self._input_generator: Callable[[], Any] = lambda: None
-        if input_generator is not None:
-            self._input_generator = input_generator
+        if input_generator is None:
+            input_generator = lambda: None
+        self._input_source = create_input_source(input_generator, input_prefetch)
 
         self.profiler = ProfilerHandler() if use_profiler else None
-        self._automation = None
+        self._automation: Optional[PipelineAutomation] = None
+        self._controller: Optional[LatencyController] = None
+        self._paused = False
+        self._sinks: List[ResultSink] = []
 
-    def add(self, stage: StageCallable, name: Optional[str] = None) -> None:
+    def add(
+        self, stage: StageCallable, name: Optional[str] = None, **options: Any
+    ) -> None:
         """Add a stage into the pipeline
 
         The stage is in type of StageCallable, which is Union[Callable[[T], T], Stage].
@@ -60,21 +119,224 @@ class Pipeline:
         Args:
             stage (StageCallable): the stage to be added
             name (Optional[str]): the stage name. If None default stage name will be given,
-                i.e. Stage_i where i is the stage sequence number. Defaults to None.
+                i.e. Stage_i where i is the stage sequence number. The stage keeps the
+                name when the pipeline is rebuilt. Defaults to None.
+            **options: options of the stage, see below.
+
+        Stage options:
+            deadline (Optional[float]): maximum age of the data in seconds (counted from
+                `forward`) at which this stage must finish processing it. In parallel
+                mode, data that cannot meet it is dropped before this stage, see also
+                `latency_budget` of `parallelize`. Defaults to None.
+            cost (Optional[float]): expected processing time of this stage in seconds,
+                used to fuse cheap stages into one thread in parallel mode, see `fuse`
+                of `parallelize`. If None, the profiles are used. Defaults to None.
+            cpus (Optional[List[int]]): CPUs that the thread of this stage runs on in
+                parallel mode. Defaults to None.
+            nice (Optional[int]): niceness of the thread of this stage in parallel
+                mode. Lowering it usually requires privileges. Defaults to None.
+            blas_threads (Optional[int]): maximum thread count of the BLAS and OpenMP
+                runtimes that this stage calls into in parallel mode. OpenMP and MKL
+                are limited per thread, but OpenBLAS is limited for the whole process.
+                Defaults to None.
+            time_budget (Optional[float]): maximum time in seconds for this stage to
+                process one data. In parallel mode, the data that exceeds it is
+                handled by the watchdog, see `watchdog` of `parallelize`.
+                Defaults to None.
+
+            The effective placement of each thread is reported in `stats`. Stages
+            with `cpus`, `nice`, `blas_threads` or `time_budget` are not fused.
+
+        Raises:
+            InvalidStageName: raised if the stage name is invalid.
         """
         self.stages_sequence.append(stage)
-        self.stage_names.append(name)
+        # The name is fixed here, so that the profiles and the measured costs keep
+        # matching the stage across serialize, parallelize and autotune
+        self.stage_names.append(get_stage_name(name, stage))
+        self.stage_options.append(StageOptions(**options))
+
+    def add_branches(
+        self,
+        branches: Dict[str, Union[BranchStageSpec, List[BranchStageSpec]]],
+        join: Callable[[Dict[str, Any]], Any],
+        name: Optional[str] = None,
+    ) -> None:
+        """Add branches that process the same data independently, followed by
+        a join function that merges their outputs.
+
+        In parallel mode, each stage of each branch lives in its own thread,
+        so the branches run concurrently and are pipelined across data. The join
+        function always receives the branch outputs of the same data. Note that all
+        branches receive the same input object, so the branch stages should not
+        modify it inplace.
+
+        Example::
+
+            pipeline.add_branches(
+                {"lidar": [filter_points, build_grid], "camera": detect_objects},
+                join=fuse,
+                name="Fusion",
+            )
+
+        Args:
+            branches (Dict[str, Union[BranchStageSpec, List[BranchStageSpec]]]): The
+                branches, where the key is the branch name and the value is the stage
+                or the list of stages of the branch. A stage can be given together with
+                its name as a tuple of (stage, name).
+            join (Callable[[Dict[str, Any]], Any]): Function that takes a dictionary of
+                the branch outputs, keyed by branch name, and returns the merged data.
+            name (Optional[str]): the name of the branches stage. If None default stage
+                name will be given. Defaults to None.
+        """
+        self.add(Branches(branches, join), name)
+
+    def add_filter(
+        self, predicate: Callable[[Any], bool], name: Optional[str] = None
+    ) -> None:
+        """Add a stage that drops the data that does not satisfy a predicate. The
+        dropped data skips the remaining stages and does not come out of the
+        pipeline. Any stage can also drop the data by returning `pystream.DROP`.
+
+        The number of dropped data can be read from the "MainPipeline" entry of
+        the "stats" method.
+
+        Args:
+            predicate (Callable[[Any], bool]): function that returns True if
+                the data should be kept
+            name (Optional[str]): the name of the filter stage. If None default stage
+                name will be given. Defaults to None.
+        """
+        self.add(Filter(predicate), name)
+
+    def add_flat_map(
+        self,
+        stage: Union[Callable[[Any], Iterable[Any]], Stage],
+        name: Optional[str] = None,
+    ) -> None:
+        """Add a stage that produces zero or more outputs from each input data. Each
+        output goes through the remaining stages as a separate data, e.g. tiles of
+        a big frame that are processed in a pipelined way.
+
+        Example::
+
+            pipeline.add_flat_map(lambda frame: split_into_tiles(frame, 4), "Tiling")
+            pipeline.add(detect_objects)
+
+        The stage can also aggregate several data by producing no output until it
+        is ready, see `pystream.functional.func_accumulate`. Data without output is
+        counted as "absorbed" in the "MainPipeline" entry of the "stats" method.
+        The latency of each output is counted from the start of the input data that
+        produces it. Flat-map stages cannot be used inside branches.
+
+        Args:
+            stage (Union[Callable[[Any], Iterable[Any]], Stage]): function or stage
+                that takes the input data and returns an iterable (e.g. a list or
+                a generator) of the output data
+            name (Optional[str]): the stage name. If None default stage name will be
+                given. Defaults to None.
+        """
+        self.add(FlatMap(stage), name)
+
+    def add_change_gate(
+        self,
+        method: Literal["hash", "similarity"] = "hash",
+        threshold: float = 0.0,
+        step: int = 4,
+        key: Optional[Callable[[Any], Any]] = None,
+        name: Optional[str] = None,
+    ) -> None:
+        """Add a gate that compares each data with the last data that went through
+        the rest of the pipeline. If it has not changed, the remaining stages are
+        skipped and the output of that last data is reused instead. The output object
+        is shared between both data, so do not modify it inplace afterwards.
+
+        If the last data has not finished yet, which happens in parallel mode, the new
+        data still skips the remaining stages and takes the output of the last data
+        when it leaves the pipeline, or is dropped as well if the last data is
+        dropped. It is dropped as well if the last data never leaves the pipeline.
+        A later stage with a time budget turns this off, and a later flat-map stage
+        is not allowed. The number of checked and skipped data can be read from the
+        gate entry of the "stats" method.
+
+        Args:
+            method (Literal["hash", "similarity"], optional): "hash" skips data with
+                exactly the same content. "similarity" skips NumPy array data whose
+                downsampled view has mean absolute difference of at most `threshold`.
+                Defaults to "hash".
+            threshold (float, optional): Maximum mean absolute difference of unchanged
+                data for "similarity" method. Defaults to 0.0.
+            step (int, optional): Downsampling step applied to the first two axes of
+                the array for "similarity" method. Defaults to 4.
+            key (Optional[Callable[[Any], Any]], optional): Function that extracts the
+                part of the data to be compared. If None, the whole data is compared.
+                Defaults to None.
+            name (Optional[str]): the name of the gate stage. If None default stage
+                name will be given. Defaults to None.
+        """
+        self.add(ChangeGate(method, threshold, step, key), name)
+
+    def add_sink(
+        self,
+        callback: Callable[[Any], None],
+        batch_size: Optional[int] = None,
+        batch_period: Optional[float] = None,
+        threaded: bool = False,
+        queue_size: int = 100,
+    ) -> None:
+        """Add a consumer that is called for every data finished by the pipeline.
+        Unlike `get_results`, no result is missed even in parallel mode.
+
+        By default, the callback is invoked in the thread of the last stage (or in the
+        thread that calls `forward` in serial mode), so a slow callback slows down the
+        pipeline. Set `threaded` to invoke it in a dedicated thread instead.
+
+        Args:
+            callback (Callable[[Any], None]): function to be called with the result.
+                If batching is used, it is called with a list of results instead.
+            batch_size (Optional[int], optional): If given, deliver the results in
+                batches of this size. Defaults to None.
+            batch_period (Optional[float], optional): If given, deliver the results in
+                batches, where a batch is delivered at the latest this many seconds after
+                its first item. For non-threaded sinks, this is only checked when a new
+                result arrives. Defaults to None.
+            threaded (bool, optional): Whether to invoke the callback in a dedicated
+                thread. Defaults to False.
+            queue_size (int, optional): Size of the queue of the threaded sink. The
+                pipeline waits when the queue is full. Defaults to 100.
+        """
+        sink = ResultSink(
+            callback,
+            batch_size=batch_size,
+            batch_period=batch_period,
+            threaded=threaded,
+            queue_size=queue_size,
+        )
+        if self.pipeline is not None:
+            sink.start()
+        self._sinks.append(sink)
 
-    def serialize(self) -> "Pipeline":
+    def serialize(self, warmup_samples: Optional[List[Any]] = None) -> "Pipeline":
         """Turn the pipeline into serial pipeline. All stages will
         be run in sequential and blocking mode.
 
+        Args:
+            warmup_samples (Optional[List[Any]], optional): Samples of the input
+                data. After each stage is set up (see `Stage.setup`), its `warmup`
+                method is invoked with each sample. Defaults to None.
+
         Returns:
             Pipeline: this pipeline itself
         """
         self.pipeline = SerialPipeline(
-            self.stages_sequence, self.stage_names, profiler_handler=self.profiler
+            self.stages_sequence,
+            self.stage_names,
+            profiler_handler=self.profiler,
+            sinks=self._sinks,
+            options=self.stage_options,
+            warmup_samples=warmup_samples,
         )
+        self._start_io()
         return self
 
     def parallelize(
@@ -83,6 +345,18 @@ class Pipeline:
         input_timeout: float = 10,
         block_output: bool = False,
         output_timeout: float = 10,
+        latency_budget: Optional[float] = None,
+        priority: bool = False,
+        queue_size: int = 1,
+        priority_max_wait: Optional[float] = 1.0,
+        admission: Optional[List[AdmissionPolicy]] = None,
+        warmup_samples: Optional[List[Any]] = None,
+        wait_ready: bool = True,
+        flatten: bool = False,
+        fuse: bool = False,
+        fuse_threshold: float = 0.001,
+        stage_costs: Optional[Dict[str, float]] = None,
+        watchdog: Optional[StageWatchdog] = None,
     ) -> "Pipeline":
         """Turn the pipeline into independent stage pipeline. Each stage
         will live in different thread and work asynchronously. However,
@@ -99,10 +373,65 @@ class Pipeline:
                 stage. Defaults to False.
             output_timeout (float, optional): Blocking timeout for the `get_results`
                 method in seconds. Defaults to 10.
+            latency_budget (Optional[float], optional): Maximum age of the data in
+                seconds, counted from `forward`. Before each stage, data that cannot
+                finish the stage within this age, based on its current age and the
+                average processing time of the stage, is dropped. If None, data is
+                only dropped by the stage deadlines. Defaults to None.
+            priority (bool, optional): Whether to use priority queues between the
+                stages, so that data with higher priority (see `forward`) overtakes
+                the others waiting in the queue at each stage. Defaults to False.
+            queue_size (int, optional): Size of the queues between the stages. Data
+                can only overtake each other if this is larger than 1. Defaults to 1.
+            priority_max_wait (Optional[float], optional): Waiting time in seconds
+                after which the oldest data in a priority queue is served first
+                regardless of its priority, which protects low priority data from
+                starvation. If None, there is no protection. Defaults to 1.0.
+            admission (Optional[List[AdmissionPolicy]], optional): Policies that
+                decide whether a new data is admitted into the pipeline, e.g.
+                `TokenBucket`, `MaxInFlight` and `EarlyDrop` from
+                `pystream.pipeline.utils.admission`. Rejected data is not processed
+                and `forward` returns False for it. Defaults to None.
+            warmup_samples (Optional[List[Any]], optional): Samples of the input
+                data. After each stage is set up (see `Stage.setup`), its `warmup`
+                method is invoked with each sample. Defaults to None.
+            wait_ready (bool, optional): Whether to wait until all stages are set
+                up and warmed up before returning. The stages get ready concurrently,
+                each in its own thread. If False, see `wait_ready` and `is_ready`.
+                Defaults to True.
+            flatten (bool, optional): Whether to run the stages of the parallelized
+                child pipelines (see `as_stage`) directly in this pipeline, so that
+                the data streams through them instead of waiting for each result of
+                the child pipeline. The child pipelines can no longer be used on
+                their own. Defaults to False.
+            fuse (bool, optional): Whether to run consecutive cheap stages in one
+                thread, serially, to save the handoff between threads. The cost of
+                a stage is its `cost` option (see `add`), or else its latency in the
+                profiles so far, e.g. from a serialized run. Stages with unknown
+                cost are not fused. See `get_stage_groups` for the result.
+                Defaults to False.
+            fuse_threshold (float, optional): Maximum total cost in seconds of the
+                stages fused into one thread. Defaults to 0.001.
+            stage_costs (Optional[Dict[str, float]], optional): Processing time of
+                the stages in seconds used for the fusion instead of the profiles,
+                keyed by stage name, e.g. `TuningReport.stage_costs` of `autotune`.
+                Defaults to None.
+            watchdog (Optional[StageWatchdog], optional): Watchdog that detects the
+                stages exceeding their `time_budget` option (see `add`), and reports,
+                drops or bypasses the stalled data, see
+                `pystream.pipeline.utils.watchdog.StageWatchdog`. If None and a stage
+                has a time budget, the stalls are only reported. The number of
+                stalls of each stage is reported in `stats`. Defaults to None.
+
+        Raises:
+            PipelineInitiationError: raised if a stage failed to get ready while
+                waiting for it.
 
         Returns:
             Pipeline: this pipeline itself
         """
+        if fuse and stage_costs is None:
+            stage_costs = self._measured_stage_costs()
         self.pipeline = ParallelThreadPipeline(
             self.stages_sequence,
             self.stage_names,
@@ -111,15 +440,218 @@ class Pipeline:
             block_output=block_output,
             output_timeout=output_timeout,
             profiler_handler=self.profiler,
+            sinks=self._sinks,
+            options=self.stage_options,
+            latency_budget=latency_budget,
+            priority=priority,
+            queue_size=queue_size,
+            priority_max_wait=priority_max_wait,
+            admission=admission,
+            warmup_samples=warmup_samples,
+            wait_ready=wait_ready,
+            flatten=flatten,
+            fuse_threshold=fuse_threshold if fuse else None,
+            stage_costs=stage_costs,
+            watchdog=watchdog,
         )
+        self._start_io()
         return self
 
-    def forward(self, data: Any = _request_generator) -> bool:
+    def get_stage_groups(self) -> List[List[str]]:
+        """Get the stages run together by each thread of the pipeline, see the
+        `fuse` option of `parallelize`
+
+        Raises:
+            PipelineUndefined: raised if method `serialize` or
+                `parallelize` has not been invoked.
+
+        Returns:
+            List[List[str]]: the names of the stages run by each thread, in the
+            pipeline order. In serial mode, all stages are in one group.
+        """
+        if self.pipeline is None:
+            raise PipelineUndefined("Pipeline has not been defined")
+        if isinstance(self.pipeline, ParallelThreadPipeline):
+            return [list(group) for group in self.pipeline.stage_groups]
+        return [[stage.name for stage in self.pipeline.stages[:-1]]]
+
+    def autotune(
+        self,
+        sample_inputs: List[Any],
+        objective: TuningObjective = "throughput",
+        constraints: Optional[TuningConstraints] = None,
+        queue_sizes: Sequence[int] = (1, 2, 4),
+        apply: bool = True,
+        timeout: float = 60.0,
+    ) -> TuningReport:
+        """Find the best configuration of the pipeline for the given input data.
+        The processing time of each stage is measured in serial mode first. Then,
+        the serial mode and the parallel mode with each distinct grouping of the
+        fused stages (see `fuse` of `parallelize`) and each queue size are
+        benchmarked with the input data.
+
+        The stages are set up once for all configurations and cleaned up before
+        the best configuration is applied, which sets them up again. They are reset
+        before each benchmark (see `Stage.reset`), so stages that keep state across
+        data, e.g. caches and change gates, must implement it, otherwise the later
+        configurations benefit from the state left by the earlier ones. Disk caches
+        keep their files, so the stages they wrap only run for new input data. The
+        results are not sent to the sinks.
+
+        Args:
+            sample_inputs (List[Any]): The input data used for the benchmarks.
+                Each configuration processes a deep copy of all of them.
+            objective (TuningObjective, optional): Either "throughput" to maximize
+                the number of completed data per second, or "latency" to minimize
+                the mean end-to-end latency. Defaults to "throughput".
+            constraints (Optional[TuningConstraints], optional): Requirements that
+                the chosen configuration must meet. Defaults to None.
+            queue_sizes (Sequence[int], optional): The queue sizes to be tried in
+                parallel mode. Defaults to (1, 2, 4).
+            apply (bool, optional): Whether to build the pipeline with the best
+                configuration, with the other settings left as default. Otherwise,
+                the pipeline is left unbuilt. Defaults to True.
+            timeout (float, optional): Timeout in seconds for the data to finish in
+                each configuration. Configurations that exceed it are not chosen.
+                Defaults to 60.0.
+
+        Raises:
+            PipelineInitiationError: raised if the pipeline has already been built.
+            ValueError: raised if the objective is unknown.
+
+        Returns:
+            TuningReport: the results of all tried configurations and the best one
+        """
+        if self.pipeline is not None:
+            raise PipelineInitiationError(
+                "Cannot autotune a pipeline that has been built, invoke `cleanup` first"
+            )
+        if objective not in ("throughput", "latency"):
+            raise ValueError(f"Unknown tuning objective: {objective}")
+        if constraints is None:
+            constraints = TuningConstraints()
+        # The stages are prepared by the first pipeline and reused by the others
+        stages = containerize_stages(
+            self.stages_sequence, self.stage_names, self.stage_options
+        )
+        serial = SerialPipeline(stages, self.stage_names, options=self.stage_options)
+        report = TuningReport(objective, measure_stage_costs(serial, sample_inputs))
+        costs = fusable_costs(serial, report.stage_costs)
+        for config in candidate_configs(costs, queue_sizes):
+            pipeline: PipelineBase
+            if config.mode == "serial":
+                pipeline = SerialPipeline(
+                    stages, self.stage_names, options=self.stage_options
+                )
+            else:
+                pipeline = ParallelThreadPipeline(
+                    stages,
+                    self.stage_names,
+                    options=self.stage_options,
+                    queue_size=config.queue_size,
+                    fuse_threshold=config.fuse_threshold,
+                    stage_costs=report.stage_costs,
+                )
+            throughput, latency, finished = benchmark(pipeline, sample_inputs, timeout)
+            if isinstance(pipeline, ParallelThreadPipeline):
+                threads = len(pipeline.stage_threads)
+                stage_groups = [list(group) for group in pipeline.stage_groups]
+                pipeline.release_stages()
+            else:
+                threads = 1
+                stage_groups = [[stage.name for stage in pipeline.stages[:-1]]]
+            feasible = finished and constraints.allows(throughput, latency, threads)
+            report.results.append(
+                TuningResult(
+                    config, throughput, latency, threads, stage_groups, feasible
+                )
+            )
+        for stage in stages:
+            stage.cleanup()
+        report.best = select_best(report.results, objective)
+        if report.best is None:
+            LOGGER.warning("No pipeline configuration meets the tuning constraints")
+            return report
+        LOGGER.info(f"Best pipeline configuration: {report.best.config}")
+        if apply and report.best.config.mode == "serial":
+            self.serialize()
+        elif apply:
+            threshold = report.best.config.fuse_threshold
+            self.parallelize(
+                queue_size=report.best.config.queue_size,
+                fuse=threshold is not None,
+                fuse_threshold=threshold if threshold is not None else 0.001,
+                stage_costs=report.stage_costs,
+            )
+        return report
+
+    def _measured_stage_costs(self) -> Dict[str, float]:
+        """Get the latency of the stages in the profiles, keyed by stage name
+        without the main pipeline name"""
+        if self.profiler is None:
+            return {}
+        latency, _ = self.profiler.summarize()
+        prefix = f"{_PIPELINE_NAME_IN_PROFILE}{_PROFILE_LEVEL_SEPARATOR}"
+        return {
+            name[len(prefix) :]: value
+            for name, value in latency.items()
+            if name.startswith(prefix)
+        }
+
+    @property
+    def is_ready(self) -> bool:
+        """True if the pipeline has been built and all of its stages are set up
+        and warmed up"""
+        return self.pipeline is not None and self.pipeline.wait_ready(timeout=0)
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all stages are set up and warmed up
+
+        Args:
+            timeout (Optional[float], optional): Waiting timeout in seconds. If None,
+                wait forever. Defaults to None.
+
+        Raises:
+            PipelineUndefined: raised if method `serialize` or
+                `parallelize` has not been invoked.
+            PipelineInitiationError: raised if a stage failed to get ready.
+
+        Returns:
+            bool: True if the pipeline is ready, False if the timeout is reached
+        """
+        if self.pipeline is None:
+            raise PipelineUndefined("Pipeline has not been defined")
+        return self.pipeline.wait_ready(timeout)
+
+    def ready_times(self) -> Dict[str, Optional[float]]:
+        """Get the time taken by each stage to be set up and warmed up
+
+        Raises:
+            PipelineUndefined: raised if method `serialize` or
+                `parallelize` has not been invoked.
+
+        Returns:
+            Dict[str, Optional[float]]: the time in seconds, keyed by stage name in
+            the same format as the profiles. The "MainPipeline" entry is the time
+            until the whole pipeline is ready. None if not ready yet.
+        """
+        if self.pipeline is None:
+            raise PipelineUndefined("Pipeline has not been defined")
+        out = {_PIPELINE_NAME_IN_PROFILE: self.pipeline.ready_time}
+        prefix = f"{_PIPELINE_NAME_IN_PROFILE}{_PROFILE_LEVEL_SEPARATOR}"
+        for name, ready_time in collect_ready_times(self.pipeline.stages).items():
+            out[f"{prefix}{name}"] = ready_time
+        return out
+
+    def forward(self, data: Any = _request_generator, priority: int = 0) -> bool:
         """Forward data into the pipeline
 
         Args:
             data (Any): the data. If data none, data generated
                 from the input generator will be pushed instead.
+            priority (int, optional): priority of the data. If the pipeline is
+                parallelized with `priority=True`, data with higher priority
+                overtakes the others at each stage. Defaults to 0.
 
         Raises:
             PipelineUndefined: raised if method `serialize` and
@@ -127,31 +659,200 @@ class Pipeline:
 
         Returns:
             bool: True if the data has been forwarded successfully,
-            False otherwise.
+            False otherwise, including when the input generator
+            has been exhausted (see `input_exhausted`).
         """
         if self.pipeline is None:
             raise PipelineUndefined("Pipeline has not been defined")
-        pipeline_data = self._generate_pipeline_data(data)
+        try:
+            pipeline_data = self._generate_pipeline_data(data)
+        except InputExhausted:
+            return False
+        pipeline_data.priority = priority
         return self._push_pipeline_data(pipeline_data)
 
-    def start_loop(self, period: float = 0.01) -> None:
+    @property
+    def input_exhausted(self) -> bool:
+        """True if the input generator is an iterable that has no more data"""
+        return self._input_source.exhausted
+
+    def start_loop(
+        self, period: float = 0.01, controller: Optional[LatencyController] = None
+    ) -> None:
         """Start the pipeline in autonomous mode. Data generated
         from input generator will be pushed into the pipeline at each
-        defined period of time.
+        defined period of time. The loop stops by itself when the
+        input generator has been exhausted.
 
         Args:
             period (float, optional): Period to push the data.
                 Defaults to 0.01.
+            controller (Optional[LatencyController], optional): Controller that
+                adjusts the period and the latency budget to hold a latency target,
+                starting from the given period. It requires the profiler to be
+                activated. Defaults to None.
+
+        Raises:
+            PipelineInitiationError: raised if a controller is given but the
+                profiler is not activated.
         """
+        if controller is not None and self.profiler is None:
+            raise PipelineInitiationError("Latency controller requires the profiler")
         self._automation = PipelineAutomation(pipeline=self, period=period)
+        if self._paused:
+            self._automation.pause()
         self._automation.start()
+        if controller is not None:
+            self._controller = controller
+            controller.start(self, self.profiler)
 
     def stop_loop(self) -> None:
         """Stop the autonomous operation of the pipeline"""
+        if self._controller is not None:
+            self._controller.stop()
+            self._controller = None
         if self._automation is None:
             return
         self._automation.stop()
 
+    @property
+    def loop_period(self) -> float:
+        """Period of the autonomous loop, can be changed while it is running.
+        It is 0 if the loop has not been started."""
+        if self._automation is None:
+            return 0.0
+        return self._automation.period
+
+    @loop_period.setter
+    def loop_period(self, period: float) -> None:
+        if self._automation is not None:
+            self._automation.period = period
+
+    def set_latency_budget(self, latency_budget: Optional[float]) -> None:
+        """Change the latency budget of a running parallel pipeline, see
+        `parallelize`. Do nothing in serial mode.
+
+        Args:
+            latency_budget (Optional[float]): the new latency budget in seconds,
+                None to only use the stage deadlines
+        """
+        if isinstance(self.pipeline, ParallelThreadPipeline):
+            self.pipeline.set_latency_budget(latency_budget)
+
+    def count_expired(self) -> int:
+        """Get the number of data dropped for missing its deadline, see
+        `parallelize`
+
+        Returns:
+            int: the number of data, 0 if the pipeline is not defined
+        """
+        if self.pipeline is None:
+            return 0
+        return self.pipeline.final_stage.drop_reasons.get(_DEADLINE_DROP_REASON, 0)
+
+    def pause(self) -> None:
+        """Pause the pipeline without stopping its threads. The autonomous loop
+        stops pushing data, and in parallel mode each stage finishes the data
+        it is processing and then waits. In serial mode, the data given to
+        `forward` is still processed.
+
+        Raises:
+            PipelineUndefined: raised if method `serialize` or
+                `parallelize` has not been invoked.
+        """
+        if self.pipeline is None:
+            raise PipelineUndefined("Pipeline has not been defined")
+        if self._automation is not None:
+            self._automation.pause()
+        if isinstance(self.pipeline, ParallelThreadPipeline):
+            self.pipeline.pause()
+        self._paused = True
+
+    def resume(self) -> None:
+        """Resume the paused pipeline
+
+        Raises:
+            PipelineUndefined: raised if method `serialize` or
+                `parallelize` has not been invoked.
+        """
+        if self.pipeline is None:
+            raise PipelineUndefined("Pipeline has not been defined")
+        if isinstance(self.pipeline, ParallelThreadPipeline):
+            self.pipeline.resume()
+        if self._automation is not None:
+            self._automation.resume()
+        self._paused = False
+
+    @property
+    def is_paused(self) -> bool:
+        """True if the pipeline is paused"""
+        return self._paused
+
+    def reconfigure(self, **settings: Any) -> None:
+        """Change the settings of a running parallel pipeline in place, without
+        restarting its threads, e.g. to switch between operating profiles. Do
+        nothing in serial mode.
+
+        Args:
+            **settings: the settings to be changed, see below.
+
+        Settings:
+            queue_size (int): size of the queues between the stages.
+            block_input (bool): whether `forward` is in blocking mode.
+            input_timeout (float): blocking timeout of `forward` in seconds.
+            block_output (bool): whether `get_results` is in blocking mode.
+            output_timeout (float): blocking timeout of `get_results` in seconds.
+            stage_output_timeout (float): time in seconds a stage waits for the
+                next stage to accept its output before the output is discarded.
+
+        Raises:
+            PipelineUndefined: raised if method `serialize` or
+                `parallelize` has not been invoked.
+        """
+        if self.pipeline is None:
+            raise PipelineUndefined("Pipeline has not been defined")
+        if isinstance(self.pipeline, ParallelThreadPipeline):
+            self.pipeline.reconfigure(**settings)
+
+    def replace_stage(
+        self,
+        name: str,
+        stage: StageCallable,
+        warmup_samples: Optional[List[Any]] = None,
+    ) -> None:
+        """Replace a stage of the running pipeline, e.g. to roll out a new model
+        version without restarting the pipeline. The new stage is set up and
+        warmed up first, then it processes the data from the next one on under
+        the same name. The old stage is cleaned up after it finishes the data
+        it is processing. This method blocks until then, but not for the calls
+        abandoned by the watchdog.
+
+        Args:
+            name (str): the stage name, in the same format as the profiles without
+                the "MainPipeline" prefix, e.g. "Stage_1" or "Branches__Left__Stage_1"
+            stage (StageCallable): the new stage
+            warmup_samples (Optional[List[Any]], optional): Samples given to the
+                `warmup` method of the new stage. Defaults to None.
+
+        Raises:
+            PipelineUndefined: raised if method `serialize` or
+                `parallelize` has not been invoked.
+            InvalidStageName: raised if there is no stage with the given name.
+            PipelineInitiationError: raised if the stage or the new stage is not
+                a plain stage, e.g. branches or a flat-map stage.
+        """
+        if self.pipeline is None:
+            raise PipelineUndefined("Pipeline has not been defined")
+        container = find_stage(self.pipeline.stages, name)
+        if container is None:
+            raise InvalidStageName(f"Stage {name} is not found")
+        old_stage = container.stage
+        container.replace(stage, warmup_samples)
+        # Keep the new stage if the pipeline is rebuilt
+        for i, sequence_stage in enumerate(self.stages_sequence):
+            if sequence_stage is old_stage:
+                self.stages_sequence[i] = stage
+
     def get_results(self) -> Any:
         """Get latest results from the pipeline
 
@@ -183,12 +884,54 @@ class Pipeline:
             raise PipelineUndefined("Pipeline has not been defined")
         return self.pipeline
 
-    def cleanup(self) -> None:
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Stop pushing and admitting new data, then wait until the data inside
+        the pipeline has finished all stages and its results are delivered. The
+        autonomous loop is stopped and the paused pipeline is resumed. After that,
+        the pipeline does not accept new data.
+
+        Args:
+            timeout (Optional[float], optional): Waiting timeout in seconds. If None,
+                wait until the pipeline is empty, or until it is broken, i.e. it is
+                stopped or a stage thread has died. Defaults to None.
+
+        Raises:
+            PipelineUndefined: raised if method `serialize` or
+                `parallelize` has not been invoked.
+
+        Returns:
+            bool: True if the pipeline is empty, False if the timeout is reached or
+            the pipeline is broken
+        """
+        if self.pipeline is None:
+            raise PipelineUndefined("Pipeline has not been defined")
+        self.stop_loop()
+        self._paused = False
+        return self.pipeline.drain(timeout)
+
+    def cleanup(self, drain: bool = False, timeout: Optional[float] = 10.0) -> None:
         """Stop and cleanup the pipeline. Do nothing if the pipeline has not
-        been initialized"""
+        been initialized
+
+        Args:
+            drain (bool, optional): Whether to let the data inside the pipeline
+                finish and deliver its results first, see `drain`. Otherwise, the
+                data inside the pipeline is discarded. Defaults to False.
+            timeout (Optional[float], optional): Timeout of the draining in
+                seconds. If None, wait until the pipeline is empty. Defaults to 10.0.
+        """
+        if drain and self.pipeline is not None:
+            self.drain(timeout)
+        if self._controller is not None:
+            self._controller.stop()
+            self._controller = None
+        self._input_source.stop()
         if self.pipeline is not None:
             self.pipeline.cleanup()
             self.pipeline = None
+        self._paused = False
+        for sink in self._sinks:
+            sink.close()
 
     def get_profiles(self) -> Tuple[Dict[str, float], Dict[str, float]]:
         """Get profiles data
@@ -203,10 +946,39 @@ class Pipeline:
             return {}, {}
         return self.profiler.summarize()
 
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get runtime statistics reported by the pipeline and its stages, e.g.
+        cache hit counts. Only stages that report statistics are included.
+
+        Raises:
+            PipelineUndefined: raised if method `serialize` or
+                `parallelize` has not been invoked.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: the statistics, keyed by stage name in the
+            same format as the profiles, e.g. "MainPipeline__Stage_1".
+        """
+        if self.pipeline is None:
+            raise PipelineUndefined("Pipeline has not been defined")
+        out = {}
+        pipeline_stats = self.pipeline.stats()
+        if len(pipeline_stats) > 0:
+            out[_PIPELINE_NAME_IN_PROFILE] = pipeline_stats
+        prefix = f"{_PIPELINE_NAME_IN_PROFILE}{_PROFILE_LEVEL_SEPARATOR}"
+        for name, stage_stats in collect_stage_stats(self.pipeline.stages).items():
+            out[f"{prefix}{name}"] = stage_stats
+        return out
+
+    def _start_io(self) -> None:
+        """Start the input source and the result sinks"""
+        self._input_source.start()
+        for sink in self._sinks:
+            sink.start()
+
     def _generate_pipeline_data(self, data: Any = _request_generator) -> PipelineData:
         """Handle whether to use input generator or given user data"""
         if isinstance(data, InputGeneratorRequest):
-            return PipelineData(data=self._input_generator())
+            return PipelineData(data=self._input_source.get())
         else:
             return PipelineData(data=data)
 
@@ -1,5 +1,5 @@
 from abc import abstractmethod
-from typing import final, List, Optional
+from typing import Any, Dict, final, List, Optional
 
 from pystream.stage.final_stage import FinalStage
 from pystream.stage.stage import Stage
@@ -9,6 +9,9 @@ from pystream.data.pipeline_data import PipelineData
 class PipelineBase(Stage):
     final_stage: FinalStage
     stages: List[Stage]
+    # Time in seconds from building the pipeline until all of its stages are
+    # set up and warmed up, None if the pipeline is not ready yet
+    ready_time: Optional[float] = None
 
     @final
     def __call__(self, data: PipelineData) -> PipelineData:
@@ -43,3 +46,37 @@ class PipelineBase(Stage):
             PipelineData: the obtained data
         """
         pass
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all stages are set up and warmed up
+
+        Args:
+            timeout (Optional[float], optional): Waiting timeout in seconds. If None,
+                wait forever. Defaults to None.
+
+        Returns:
+            bool: True if the pipeline is ready, False if the timeout is reached
+        """
+        return self.ready_time is not None
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Stop admitting new data and wait until the data inside the pipeline
+        has left it
+
+        Args:
+            timeout (Optional[float], optional): Waiting timeout in seconds. If None,
+                wait until the pipeline is empty. Defaults to None.
+
+        Returns:
+            bool: True if the pipeline is empty, False if the timeout is reached
+        """
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistics of the data that come out of the pipeline, i.e. the number
+        of completed and dropped data
+
+        Returns:
+            Dict[str, Any]: the statistics
+        """
+        return self.final_stage.stats()
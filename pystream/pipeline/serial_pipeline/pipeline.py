@@ -1,10 +1,13 @@
-from typing import List, Optional
+import time
+from typing import Any, List, Optional
 
 from pystream.data.pipeline_data import PipelineData
+from pystream.data.stage_data import StageOptions
 from pystream.pipeline.pipeline_base import PipelineBase
 from pystream.pipeline.utils.profiler import ProfilerHandler
 from pystream.pipeline.utils.general import containerize_stages
-from pystream.stage.final_stage import FinalStage
+from pystream.stage.container import FlatMapContainer
+from pystream.stage.final_stage import FinalStage, SinkProtocol
 from pystream.stage.stage import Stage, StageCallable
 
 
@@ -14,6 +17,9 @@ class SerialPipeline(PipelineBase):
         stages: List[StageCallable],
         names: List[Optional[str]],
         profiler_handler: Optional[ProfilerHandler] = None,
+        sinks: Optional[List[SinkProtocol]] = None,
+        options: Optional[List[StageOptions]] = None,
+        warmup_samples: Optional[List[Any]] = None,
     ) -> None:
         """The class that will handle the serial pipeline.
 
@@ -24,18 +30,40 @@ class SerialPipeline(PipelineBase):
                 default stage name will be given.
             profiler_handler (Optional[ProfilerHandler]): Handler for the profiler.
                 If None, no profiling attempt will be done.
+            sinks (Optional[List[SinkProtocol]]): Consumers that receive every
+                finished data. Defaults to None.
+            options (Optional[List[StageOptions]]): Options of each stage. If None,
+                the default options are used. Defaults to None.
+            warmup_samples (Optional[List[Any]]): Samples of the input data that
+                are given to the `warmup` method of each stage after it is set up.
+                Defaults to None.
         """
-        self.final_stage = FinalStage(profiler_handler)
-        self.stages = containerize_stages(stages, names)
+        start = time.perf_counter()
+        self.final_stage = FinalStage(profiler_handler, sinks)
+        self.stages = containerize_stages(stages, names, options)
+        for stage in self.stages:
+            stage.prepare(warmup_samples)
         self.stages.append(self.final_stage)
         self.results = PipelineData()
+        self.ready_time = time.perf_counter() - start
 
     def forward(self, data: PipelineData) -> bool:
-        for stage in self.stages:
-            data = stage(data)
-        self.results = data
+        self._process(data, 0)
         return True
 
+    def _process(self, data: PipelineData, start: int) -> None:
+        """Run the data through the stages starting from the given index"""
+        for i in range(start, len(self.stages)):
+            stage = self.stages[i]
+            if isinstance(stage, FlatMapContainer):
+                for output in list(stage.iterate(data)):
+                    self._process(output, i + 1)
+                return
+            data = stage(data)
+        # Data dropped inside a child pipeline is passed to the parent
+        if not (data.is_dropped and data.profile.is_finished):
+            self.results = data
+
     def get_results(self) -> PipelineData:
         ret = self.results
         self.results = PipelineData()
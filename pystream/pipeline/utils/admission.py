@@ -0,0 +1,173 @@
+import random
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from threading import Lock
+from typing import Optional
+
+from pystream.data.pipeline_data import PipelineData
+
+
+@dataclass
+class PipelineLoad:
+    """Snapshot of the pipeline load when a data is about to be admitted."""
+
+    # Number of data that has been admitted but has not finished yet
+    in_flight: int
+    # Number of data waiting in the queues between the stages
+    queue_depth: int
+    # Median end-to-end latency of the recently finished data in seconds,
+    # NaN if no data has finished yet
+    latency: float
+
+
+class AdmissionPolicy(ABC):
+    """Base class of the policies that decide whether a new data is admitted
+    into the pipeline. The rejected data is not processed, and `forward`
+    returns False for it."""
+
+    @abstractmethod
+    def admit(self, data: PipelineData, load: PipelineLoad) -> bool:
+        """Decide whether to admit the data
+
+        Args:
+            data (PipelineData): the data to be admitted
+            load (PipelineLoad): the current load of the pipeline
+
+        Returns:
+            bool: True if the data is admitted
+        """
+        pass
+
+    def cancel(self, data: PipelineData) -> None:
+        """Undo the admission of a data that did not enter the pipeline after
+        all, i.e. it was rejected by a later policy or it could not be sent to
+        the first stage. Does nothing by default.
+
+        Args:
+            data (PipelineData): the admitted data
+        """
+        pass
+
+    @property
+    def name(self) -> str:
+        """Name of the policy in the rejection counters"""
+        return type(self).__name__
+
+
+class TokenBucket(AdmissionPolicy):
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        """Limit the input rate. Each admitted data takes a token from a bucket
+        that is refilled at a constant rate. The token is given back if the data
+        does not enter the pipeline after all.
+
+        Args:
+            rate (float): the number of tokens added per second
+            burst (int, optional): the bucket capacity, i.e. the number of data
+                that can be admitted at once after an idle period. Defaults to 1.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last_update = time.perf_counter()
+        self.lock = Lock()
+
+    def admit(self, data: PipelineData, load: PipelineLoad) -> bool:
+        with self.lock:
+            now = time.perf_counter()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.last_update) * self.rate
+            )
+            self.last_update = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+    def cancel(self, data: PipelineData) -> None:
+        with self.lock:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+
+class MaxInFlight(AdmissionPolicy):
+    def __init__(self, limit: int) -> None:
+        """Limit the number of data inside the pipeline
+
+        Args:
+            limit (int): the maximum number of data in flight
+        """
+        self.limit = limit
+
+    def admit(self, data: PipelineData, load: PipelineLoad) -> bool:
+        return load.in_flight < self.limit
+
+
+class EarlyDrop(AdmissionPolicy):
+    def __init__(
+        self,
+        min_depth: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        min_latency: Optional[float] = None,
+        max_latency: Optional[float] = None,
+        max_probability: float = 1.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        """Reject data randomly before the pipeline is saturated. The rejection
+        probability rises linearly from 0 to `max_probability` as the queue depth
+        goes from `min_depth` to `max_depth`, or as the observed latency goes from
+        `min_latency` to `max_latency`, whichever is higher. Above the maximum,
+        the data is always rejected.
+
+        Args:
+            min_depth (Optional[int], optional): Queue depth at which the rejection
+                starts. Defaults to None.
+            max_depth (Optional[int], optional): Queue depth at which all data is
+                rejected. Required if `min_depth` is given. Defaults to None.
+            min_latency (Optional[float], optional): Latency in seconds at which the
+                rejection starts. Defaults to None.
+            max_latency (Optional[float], optional): Latency in seconds at which all
+                data is rejected. Required if `min_latency` is given.
+                Defaults to None.
+            max_probability (float, optional): Rejection probability just below the
+                maximum depth or latency. Defaults to 1.0.
+            seed (Optional[int], optional): Seed of the random generator.
+                Defaults to None.
+        """
+        if (min_depth is None) != (max_depth is None):
+            raise ValueError("min_depth and max_depth must be given together")
+        if (min_latency is None) != (max_latency is None):
+            raise ValueError("min_latency and max_latency must be given together")
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.min_latency = min_latency
+        self.max_latency = max_latency
+        self.max_probability = max_probability
+        self.random = random.Random(seed)
+
+    def admit(self, data: PipelineData, load: PipelineLoad) -> bool:
+        return self.random.random() >= self.rejection_probability(load)
+
+    def rejection_probability(self, load: PipelineLoad) -> float:
+        """Get the rejection probability under the given load"""
+        pressure = 0.0
+        if self.min_depth is not None and self.max_depth is not None:
+            pressure = max(
+                pressure,
+                self._pressure(load.queue_depth, self.min_depth, self.max_depth),
+            )
+        if self.min_latency is not None and self.max_latency is not None:
+            if load.latency == load.latency:  # not NaN
+                pressure = max(
+                    pressure,
+                    self._pressure(load.latency, self.min_latency, self.max_latency),
+                )
+        if pressure >= 1:
+            return 1.0
+        return pressure * self.max_probability
+
+    def _pressure(self, value: float, low: float, high: float) -> float:
+        if value < low:
+            return 0.0
+        if value >= high:
+            return 1.0
+        return (value - low) / (high - low)
@@ -5,7 +5,8 @@ from threading import Event, Thread
 
 from pystream.data.pipeline_data import PipelineData, _request_generator
 from pystream.pipeline.pipeline import _request_generator
-from pystream.utils.errors import PipelineUndefined
+from pystream.utils.errors import InputExhausted, PipelineUndefined
+from pystream.utils.logger import LOGGER
 
 
 class InterfacePipelineProtocol(Protocol):
@@ -21,10 +22,21 @@ class PipelineAutomation(Thread):
         self.pipeline = pipeline
         self._loop_period = period
         self._loop_is_start = Event()
+        self._loop_is_running = Event()
+        self._loop_is_running.set()
         self._loop_thread = Thread(
             target=self._loop_handler, name="PyStream-Automation", daemon=True
         )
 
+    @property
+    def period(self) -> float:
+        """Period to push the data, can be changed while the loop is running"""
+        return self._loop_period
+
+    @period.setter
+    def period(self, period: float) -> None:
+        self._loop_period = period
+
     def start(self):
         if self.pipeline is None:
             raise PipelineUndefined("Pipeline has not been defined")
@@ -33,15 +45,31 @@ class PipelineAutomation(Thread):
 
     def stop(self):
         self._loop_is_start.clear()
+        self._loop_is_running.set()
         self._loop_thread.join()
 
+    def pause(self) -> None:
+        """Stop pushing data until the loop is resumed"""
+        self._loop_is_running.clear()
+
+    def resume(self) -> None:
+        """Resume pushing data after the loop is paused"""
+        self._loop_is_running.set()
+
     def _loop_handler(self) -> None:
         """Function to be run by the input generator thread"""
         self._loop_is_start.wait()
-        check_period = max(0.001, self._loop_period / 15)
         while self._loop_is_start.is_set():
+            if not self._loop_is_running.wait(timeout=1):
+                continue
+            check_period = max(0.001, self._loop_period / 15)
             last_update = time.time()
-            data = self.pipeline._generate_pipeline_data()
+            try:
+                data = self.pipeline._generate_pipeline_data()
+            except InputExhausted:
+                LOGGER.info("Input generator exhausted, stopping the loop")
+                self._loop_is_start.clear()
+                break
             self.pipeline._push_pipeline_data(data)
             while time.time() - last_update < self._loop_period:
                 time.sleep(check_period)
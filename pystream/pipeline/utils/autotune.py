@@ -0,0 +1,215 @@
+import copy
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Literal, Optional, Sequence, Tuple
+
+from pystream.data.pipeline_data import PipelineData
+from pystream.pipeline.parallel_thread_pipeline.pipeline import group_by_cost
+from pystream.pipeline.pipeline_base import PipelineBase
+from pystream.pipeline.serial_pipeline.pipeline import SerialPipeline
+from pystream.stage.container import StageContainer
+from pystream.utils.general import _PIPELINE_NAME_IN_PROFILE
+
+
+TuningObjective = Literal["throughput", "latency"]
+
+
+@dataclass
+class TuningConfig:
+    """A configuration of the pipeline tried by the auto-tuner."""
+
+    # "serial" or "parallel"
+    mode: str = "parallel"
+    # Size of the queues between the stages in parallel mode
+    queue_size: int = 1
+    # Maximum total cost in seconds of the stages fused into one thread in parallel
+    # mode, None if the stages are not fused
+    fuse_threshold: Optional[float] = None
+
+
+@dataclass
+class TuningConstraints:
+    """Requirements that the configuration chosen by the auto-tuner must meet."""
+
+    # Maximum mean end-to-end latency in seconds
+    max_latency: Optional[float] = None
+    # Minimum throughput in data/second
+    min_throughput: Optional[float] = None
+    # Maximum number of stage threads, a serial pipeline counts as one thread
+    max_threads: Optional[int] = None
+
+    def allows(self, throughput: float, latency: float, threads: int) -> bool:
+        """Check whether a benchmark result meets the constraints"""
+        if self.max_latency is not None and not latency <= self.max_latency:
+            return False
+        if self.min_throughput is not None and throughput < self.min_throughput:
+            return False
+        if self.max_threads is not None and threads > self.max_threads:
+            return False
+        return True
+
+
+@dataclass
+class TuningResult:
+    """Benchmark result of a configuration."""
+
+    config: TuningConfig
+    # Number of completed data per second
+    throughput: float
+    # Mean end-to-end latency in seconds
+    latency: float
+    # Number of stage threads, a serial pipeline counts as one thread
+    threads: int
+    # Names of the stages run by each thread
+    stage_groups: List[List[str]]
+    # Whether all data finished in time and the constraints are met
+    feasible: bool = True
+
+
+@dataclass
+class TuningReport:
+    """Report of the auto-tuner, i.e. what it tried and what it chose."""
+
+    objective: str
+    # Mean processing time of each stage in seconds, measured in serial mode
+    stage_costs: Dict[str, float] = field(default_factory=dict)
+    # Results of all tried configurations
+    results: List[TuningResult] = field(default_factory=list)
+    # The best feasible result, None if no configuration is feasible
+    best: Optional[TuningResult] = None
+
+
+def measure_stage_costs(
+    pipeline: SerialPipeline, samples: Sequence[Any]
+) -> Dict[str, float]:
+    """Measure the mean processing time of each stage of a serial pipeline
+
+    Args:
+        pipeline (SerialPipeline): the pipeline
+        samples (Sequence[Any]): the input data
+
+    Returns:
+        Dict[str, float]: the processing time in seconds keyed by stage name
+    """
+    totals: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    for sample in samples:
+        data = PipelineData(data=copy.deepcopy(sample))
+        data.profile.tick_start(_PIPELINE_NAME_IN_PROFILE)
+        pipeline.forward(data)
+        results = pipeline.get_results()
+        for name, profile in results.profile.data.substage.items():
+            if profile.started is None or profile.ended is None:
+                continue
+            totals[name] = totals.get(name, 0.0) + profile.ended - profile.started
+            counts[name] = counts.get(name, 0) + 1
+    return {name: totals[name] / counts[name] for name in totals}
+
+
+def fusable_costs(
+    pipeline: SerialPipeline, stage_costs: Dict[str, float]
+) -> List[Optional[float]]:
+    """Get the cost of each stage of a pipeline, None for the stages that
+    cannot be fused"""
+    costs: List[Optional[float]] = []
+    for stage in pipeline.stages[:-1]:
+        if type(stage) is not StageContainer or stage.options.has_placement:
+            costs.append(None)
+        elif stage.options.time_budget is not None:
+            costs.append(None)
+        elif stage.options.cost is not None:
+            costs.append(stage.options.cost)
+        else:
+            costs.append(stage_costs.get(stage.name))
+    return costs
+
+
+def candidate_configs(
+    costs: List[Optional[float]], queue_sizes: Sequence[int]
+) -> List[TuningConfig]:
+    """Get the configurations to be tried. Each distinct grouping of the fusable
+    stages is tried with each queue size.
+
+    Args:
+        costs (List[Optional[float]]): cost of each stage, None if it cannot be
+            fused
+        queue_sizes (Sequence[int]): the queue sizes to be tried
+
+    Returns:
+        List[TuningConfig]: the configurations, starting with the serial one
+    """
+    thresholds: List[Optional[float]] = [None]
+    groupings = [group_by_cost(costs, None)]
+    run_costs = set()
+    for start in range(len(costs)):
+        total = 0.0
+        for cost in costs[start:]:
+            if cost is None:
+                break
+            total += cost
+            run_costs.add(total)
+    for threshold in sorted(run_costs):
+        grouping = group_by_cost(costs, threshold)
+        if grouping not in groupings:
+            groupings.append(grouping)
+            thresholds.append(threshold)
+    configs = [TuningConfig(mode="serial")]
+    for threshold in thresholds:
+        for queue_size in queue_sizes:
+            configs.append(
+                TuningConfig(
+                    mode="parallel", queue_size=queue_size, fuse_threshold=threshold
+                )
+            )
+    return configs
+
+
+def benchmark(
+    pipeline: PipelineBase, samples: Sequence[Any], timeout: Optional[float] = None
+) -> Tuple[float, float, bool]:
+    """Run the input data through a pipeline and measure its performance. The
+    stages are reset first, so that the state left by a previous benchmark, e.g.
+    cached outputs, does not favor this one.
+
+    Args:
+        pipeline (PipelineBase): the pipeline, which is drained afterwards
+        samples (Sequence[Any]): the input data
+        timeout (Optional[float], optional): Timeout in seconds to wait for the
+            data to finish. If None, wait forever. Defaults to None.
+
+    Returns:
+        Tuple[float, float, bool]: the throughput in data/second, the mean latency
+        in seconds, and whether all data finished in time
+    """
+    for stage in pipeline.stages:
+        stage.reset()
+    inputs = [copy.deepcopy(sample) for sample in samples]
+    start = time.perf_counter()
+    for value in inputs:
+        data = PipelineData(data=value)
+        data.profile.tick_start(_PIPELINE_NAME_IN_PROFILE)
+        pipeline.forward(data)
+    finished = pipeline.drain(timeout)
+    elapsed = time.perf_counter() - start
+    stats = pipeline.stats()
+    windows = [w for w in stats["latency_by_priority"].values() if "mean" in w]
+    count = sum(window["count"] for window in windows)
+    if count > 0:
+        latency = sum(window["mean"] * window["count"] for window in windows) / count
+    else:
+        latency = float("nan")
+    throughput = stats["completed"] / elapsed if elapsed > 0 else float("nan")
+    return throughput, latency, finished
+
+
+def select_best(
+    results: List[TuningResult], objective: TuningObjective
+) -> Optional[TuningResult]:
+    """Select the best feasible result for the objective, None if there is no
+    feasible result"""
+    feasible = [result for result in results if result.feasible]
+    if len(feasible) == 0:
+        return None
+    if objective == "throughput":
+        return max(feasible, key=lambda result: result.throughput)
+    return min(feasible, key=lambda result: result.latency)
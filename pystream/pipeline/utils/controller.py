@@ -0,0 +1,221 @@
+import time
+from collections import deque
+from dataclasses import dataclass
+from threading import Event, Thread
+from typing import Deque, List, Optional, Protocol
+
+from pystream.utils.logger import LOGGER
+
+
+class ControlledPipelineProtocol(Protocol):
+    loop_period: float
+
+    def set_latency_budget(self, latency_budget: Optional[float]) -> None:
+        ...
+
+    def count_expired(self) -> int:
+        ...
+
+
+class LatencyMonitorProtocol(Protocol):
+    num_records: int
+
+    def live_latency(self, q: float = 99, last: Optional[int] = None) -> float:
+        ...
+
+
+@dataclass
+class ControllerDecision:
+    """A decision made by the latency controller."""
+
+    # Time of the decision, from time.time()
+    time: float
+    # The observed latency percentile in seconds
+    latency: float
+    # One of "slow_down", "speed_up", "hold" and "relax"
+    action: str
+    # The input period after the decision
+    period: float
+    # The latency budget of the pipeline after the decision
+    latency_budget: Optional[float]
+
+
+class LatencyController:
+    def __init__(
+        self,
+        target: float,
+        percentile: float = 99,
+        interval: float = 1.0,
+        min_period: float = 0.0,
+        max_period: float = 1.0,
+        period_step: float = 0.001,
+        backoff: float = 1.5,
+        headroom: float = 0.8,
+        min_samples: int = 20,
+        drop_late: bool = True,
+        history: int = 1000,
+    ) -> None:
+        """Feedback controller that holds a latency percentile of the pipeline
+        below a target while pushing as much data as possible. It adjusts the
+        period of the autonomous loop with additive-increase/multiplicative-decrease
+        of the input rate, and the latency budget used to drop stale data.
+
+        Every `interval` seconds, the latency percentile of the data finished since
+        the last decision is compared with the target. The data dropped for missing
+        its deadline counts as data above the target:
+
+        - Above the target, the period is multiplied by `backoff` and the latency
+          budget is set to the target, so stale data is dropped.
+        - Below `headroom` times the target, the period is reduced by `period_step`
+          and the latency budget is removed.
+        - If all data was dropped for missing its deadline, the budget is too
+          tight to be met, so it is removed and the period is multiplied by
+          `backoff` ("relax").
+        - Otherwise, nothing is changed.
+
+        Args:
+            target (float): the latency target in seconds
+            percentile (float, optional): the controlled latency percentile.
+                Defaults to 99.
+            interval (float, optional): time between decisions in seconds.
+                Defaults to 1.0.
+            min_period (float, optional): the minimum input period. Defaults to 0.0.
+            max_period (float, optional): the maximum input period. Defaults to 1.0.
+            period_step (float, optional): the period reduction when the latency is
+                low. Defaults to 0.001.
+            backoff (float, optional): the period multiplier when the latency is
+                too high. Defaults to 1.5.
+            headroom (float, optional): the fraction of the target below which the
+                input rate is increased. Defaults to 0.8.
+            min_samples (int, optional): the minimum number of finished data for a
+                decision, including the data dropped for missing its deadline.
+                Defaults to 20.
+            drop_late (bool, optional): whether to set the latency budget of the
+                pipeline when the latency is too high. Defaults to True.
+            history (int, optional): the number of decisions kept in `decisions`.
+                Defaults to 1000.
+        """
+        self.target = target
+        self.percentile = percentile
+        self.interval = interval
+        self.min_period = min_period
+        self.max_period = max_period
+        self.period_step = period_step
+        self.backoff = backoff
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.drop_late = drop_late
+        self.decisions: Deque[ControllerDecision] = deque(maxlen=history)
+
+        self.latency_budget: Optional[float] = None
+        self._pipeline: Optional[ControlledPipelineProtocol] = None
+        self._monitor: Optional[LatencyMonitorProtocol] = None
+        self._last_records = 0
+        self._last_expired = 0
+        self._stopper = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(
+        self, pipeline: ControlledPipelineProtocol, monitor: LatencyMonitorProtocol
+    ) -> None:
+        """Start controlling the pipeline in a background thread
+
+        Args:
+            pipeline (ControlledPipelineProtocol): the controlled pipeline
+            monitor (LatencyMonitorProtocol): source of the live latency, i.e. the
+                profiler of the pipeline
+        """
+        self._pipeline = pipeline
+        self._monitor = monitor
+        self._last_records = monitor.num_records
+        self._last_expired = pipeline.count_expired()
+        self._stopper.clear()
+        self._thread = Thread(
+            target=self._control_loop, name="PyStream-Controller", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop controlling the pipeline"""
+        self._stopper.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _control_loop(self) -> None:
+        while not self._stopper.wait(self.interval):
+            self.step()
+
+    def step(self) -> Optional[ControllerDecision]:
+        """Make one decision based on the data finished since the last decision
+
+        Returns:
+            Optional[ControllerDecision]: the decision, None if there is not
+            enough data
+        """
+        pipeline, monitor = self._pipeline, self._monitor
+        if pipeline is None or monitor is None:
+            return None
+        num_records = monitor.num_records
+        num_expired = pipeline.count_expired()
+        num_completed = num_records - self._last_records
+        num_late = num_expired - self._last_expired
+        if num_completed + num_late < self.min_samples:
+            return None
+        self._last_records = num_records
+        self._last_expired = num_expired
+
+        period = pipeline.loop_period
+        if num_completed == 0:
+            action = "relax"
+            latency = float("inf")
+            period = self._backed_off(period)
+            self.latency_budget = None
+        else:
+            latency = monitor.live_latency(self.percentile, num_completed)
+            # The percentile is above the target if the late data outnumbers the
+            # data allowed above it
+            allowed = (1 - self.percentile / 100) * (num_completed + num_late)
+            if latency > self.target or num_late > allowed:
+                action = "slow_down"
+                period = self._backed_off(period)
+                if self.drop_late:
+                    self.latency_budget = self.target
+            elif latency < self.headroom * self.target:
+                action = "speed_up"
+                period = max(self.min_period, period - self.period_step)
+                self.latency_budget = None
+            else:
+                action = "hold"
+        if period != pipeline.loop_period:
+            pipeline.loop_period = period
+        pipeline.set_latency_budget(self.latency_budget)
+
+        decision = ControllerDecision(
+            time=time.time(),
+            latency=latency,
+            action=action,
+            period=period,
+            latency_budget=self.latency_budget,
+        )
+        self.decisions.append(decision)
+        LOGGER.info(
+            f"Latency controller: p{self.percentile:g}={latency:.4f}s "
+            f"target={self.target:.4f}s action={action} period={period:.4f}s "
+            f"latency_budget={self.latency_budget}"
+        )
+        return decision
+
+    def _backed_off(self, period: float) -> float:
+        """Get the period after backing off the input rate"""
+        return min(
+            self.max_period, max(period * self.backoff, period + self.period_step)
+        )
+
+    def get_decisions(self) -> List[ControllerDecision]:
+        """Get the recorded decisions, from the oldest one
+
+        Returns:
+            List[ControllerDecision]: the decisions
+        """
+        return list(self.decisions)
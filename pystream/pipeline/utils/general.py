@@ -1,15 +1,54 @@
 from typing import List, Optional
 
-from pystream.pipeline.pipeline_base import PipelineBase
-from pystream.stage.container import PipelineContainer, StageContainer
+from pystream.data.stage_data import StageOptions
+from pystream.stage.container import (
+    FlatMapContainer,
+    GateContainer,
+    StageContainer,
+    containerize_stage,
+)
 from pystream.stage.stage import Stage, StageCallable
+from pystream.utils.errors import PipelineInitiationError
 
 
 def containerize_stages(
-    stages: List[StageCallable], names: List[Optional[str]]
+    stages: List[StageCallable],
+    names: List[Optional[str]],
+    options: Optional[List[StageOptions]] = None,
 ) -> List[Stage]:
+    if options is None:
+        options = [StageOptions() for _ in stages]
     containers = [
-        PipelineContainer if isinstance(stage, PipelineBase) else StageContainer
-        for stage in stages
+        containerize_stage(stage, name, stage_options)
+        for stage, name, stage_options in zip(stages, names, options)
     ]
-    return [Cont(stage, name) for Cont, stage, name in zip(containers, stages, names)]
+    check_change_gates(containers)
+    return containers
+
+
+def check_change_gates(stages: List[Stage]) -> None:
+    """Check that the outputs of the data forwarded by each change gate can be
+    reused, i.e. each output is produced by the forwarded data object itself. A
+    gate cannot be followed by a flat-map stage, and it only reuses the outputs
+    of finished data if a later stage may be abandoned by the watchdog.
+
+    Args:
+        stages (List[Stage]): the stages of a pipeline
+
+    Raises:
+        PipelineInitiationError: if a gate is followed by a flat-map stage
+    """
+    for i, gate in enumerate(stages):
+        if not isinstance(gate, GateContainer):
+            continue
+        following = stages[i + 1 :]
+        for stage in following:
+            if isinstance(stage, FlatMapContainer):
+                raise PipelineInitiationError(
+                    f"Change gate {gate.name} cannot be followed by flat-map stage"
+                    f" {stage.name}, whose outputs cannot be reused"
+                )
+        gate.stage.reuse_in_flight = not any(
+            isinstance(stage, StageContainer) and stage.options.time_budget is not None
+            for stage in following
+        )
@@ -0,0 +1,160 @@
+from queue import Full, Queue
+from threading import Event, Thread
+from typing import Any, Callable, Iterable, Optional, Union
+
+from pystream.utils.errors import InputExhausted
+from pystream.utils.logger import LOGGER
+
+
+InputSourceType = Union[Callable[[], Any], Iterable[Any]]
+
+
+class _EndOfStream:
+    pass
+
+
+_end_of_stream = _EndOfStream()
+
+
+class _SourceError:
+    def __init__(self, error: Exception) -> None:
+        self.error = error
+
+
+class InputSource:
+    def __init__(self, source: InputSourceType) -> None:
+        """Synchronous reader of the pipeline input source. Each item
+        is generated when it is requested.
+
+        Args:
+            source (InputSourceType): a function that takes no argument and
+                returns the input data, or an iterable (e.g. a generator) that
+                yields the input data.
+        """
+        if callable(source):
+            self._next_item: Callable[[], Any] = source
+        else:
+            self._iterator = iter(source)
+            self._next_item = self._next_from_iterator
+        self.exhausted = False
+
+    def _next_from_iterator(self) -> Any:
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise InputExhausted("The input source has been exhausted")
+
+    def get(self) -> Any:
+        """Get the next input data
+
+        Raises:
+            InputExhausted: raised if the source has no more data
+
+        Returns:
+            Any: the input data
+        """
+        if self.exhausted:
+            raise InputExhausted("The input source has been exhausted")
+        try:
+            return self._next_item()
+        except InputExhausted:
+            self.exhausted = True
+            raise
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+class PrefetchInputSource(InputSource):
+    def __init__(self, source: InputSourceType, size: int = 1) -> None:
+        """Reader of the pipeline input source that generates the data
+        in a background thread, so that a number of items are always ready
+        when they are requested.
+
+        Args:
+            source (InputSourceType): a function that takes no argument and
+                returns the input data, or an iterable (e.g. a generator) that
+                yields the input data.
+            size (int, optional): number of items kept ready. Defaults to 1.
+        """
+        super().__init__(source)
+        self._queue: Queue = Queue(maxsize=max(1, size))
+        self._stopper = Event()
+        self._thread: Optional[Thread] = None
+        self._pending: Any = None
+        self._has_pending = False
+
+    def start(self) -> None:
+        """Start the prefetch thread, do nothing if it is already running"""
+        self._stopper.clear()
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = Thread(
+            target=self._prefetch_loop, name="PyStream-Prefetch", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the prefetch thread. Items that have been prefetched are kept
+        and the source can be resumed by calling `start` again."""
+        self._stopper.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def get(self) -> Any:
+        if self.exhausted:
+            raise InputExhausted("The input source has been exhausted")
+        self.start()
+        item = self._queue.get()
+        if isinstance(item, _EndOfStream):
+            self.exhausted = True
+            raise InputExhausted("The input source has been exhausted")
+        if isinstance(item, _SourceError):
+            self.exhausted = True
+            raise item.error
+        return item
+
+    def _prefetch_loop(self) -> None:
+        """Function to be run by the prefetch thread"""
+        while not self._stopper.is_set():
+            if self._has_pending:
+                item = self._pending
+            else:
+                try:
+                    item = self._next_item()
+                except InputExhausted:
+                    item = _end_of_stream
+                except Exception as e:
+                    LOGGER.error(f"Input source raised an exception: {e!r}")
+                    item = _SourceError(e)
+            # Keep the item if the thread is stopped before it can be queued
+            self._pending, self._has_pending = item, True
+            while not self._stopper.is_set():
+                try:
+                    self._queue.put(item, timeout=0.1)
+                except Full:
+                    continue
+                self._pending, self._has_pending = None, False
+                break
+            if isinstance(item, (_EndOfStream, _SourceError)):
+                return
+
+
+def create_input_source(source: InputSourceType, prefetch: int = 0) -> InputSource:
+    """Create the reader of the pipeline input source
+
+    Args:
+        source (InputSourceType): the input generator function or iterable
+        prefetch (int, optional): number of items to be prefetched in
+            a background thread. If 0, the items are generated synchronously
+            when requested. Defaults to 0.
+
+    Returns:
+        InputSource: the input source reader
+    """
+    if prefetch > 0:
+        return PrefetchInputSource(source, size=prefetch)
+    return InputSource(source)
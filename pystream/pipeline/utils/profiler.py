@@ -1,17 +1,49 @@
 import os
 import sqlite3
-from typing import Dict, List, Literal, Tuple
+from typing import Dict, List, Literal, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
-from pystream.data.profiler_data import ProfileData, TimeProfileData
+from pystream.data.profiler_data import LatencyWindow, ProfileData, TimeProfileData
 from pystream.utils.errors import ProfilingError
 from pystream.utils.general import (
     _PIPELINE_NAME_IN_PROFILE,
     get_profiler_db_folder,
 )
 
+_PROFILER_DB_FILENAME = "last_profiles.sqlite"
+
+
+def read_latency_records(db_path: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """Read the latency records of each stage from a profiler database
+
+    Args:
+        db_path (Optional[str], optional): path to the SQLite DB. If None, the DB
+            of the last profiled pipeline is used. Defaults to None.
+
+    Raises:
+        ProfilingError: raised if the DB does not exist.
+
+    Returns:
+        Dict[str, np.ndarray]: the latency records in seconds, keyed by stage name
+        in the same format as the profiles
+    """
+    if db_path is None:
+        db_path = os.path.join(get_profiler_db_folder(), _PROFILER_DB_FILENAME)
+    if not os.path.isfile(db_path):
+        raise ProfilingError(f"Profiler database is not found: {db_path}")
+    conn = sqlite3.connect(db_path)
+    try:
+        table_df = pd.read_sql_query("SELECT * FROM Latency", conn, dtype=float)
+    finally:
+        conn.close()
+    out = {}
+    for col in table_df.columns[1:]:
+        records = table_df[col].to_numpy()
+        out[col] = records[~np.isnan(records)]
+    return out
+
 
 class ProfileDBHandler:
     _CREATE_TABLE_QUERY = """
@@ -75,7 +107,7 @@ class ProfileDBHandler:
 
         names = [f'"{name}"' for name in names]
         columns = ",".join(names)
-        values = ",".join([str(v) for v in data])
+        values = ",".join(["NULL" if np.isnan(v) else str(v) for v in data])
         cur = conn.cursor()
         cur.execute(self._PUT_DATA_QUERY.format(table_name, columns, values))
 
@@ -114,19 +146,22 @@ class ProfileDBHandler:
 
 
 class ProfilerHandler:
-    def __init__(self, max_history: int = 100000) -> None:
+    def __init__(self, max_history: int = 100000, live_window: int = 1000) -> None:
         """Handler of pipeline profiler
 
         Args:
             max_history (int, optional): The maximum history to be saved.
                 Defaults to 100000.
+            live_window (int, optional): The number of the latest end-to-end latency
+                records kept in memory for `live_latency`. Defaults to 1000.
         """
         self.max_history = max_history
+        self.recent_latency = LatencyWindow(size=live_window)
 
-        self.previous_end_data = np.array([])
+        self.previous_end_data: Dict[str, float] = {}
         self.is_first = True
 
-        self.db_filename = "last_profiles.sqlite"
+        self.db_filename = _PROFILER_DB_FILENAME
         os.makedirs(get_profiler_db_folder(), exist_ok=True)
 
         db_path = os.path.join(get_profiler_db_folder(), self.db_filename)
@@ -141,13 +176,14 @@ class ProfilerHandler:
             data (ProfileData): the pipeline profile data
         """
         name_data, start_data, end_data = self.get_flatten_data(data.data)
+        self.recent_latency.add(end_data[0] - start_data[0])
         if self.is_first:
-            self.previous_end_data = end_data.copy()
+            self.previous_end_data = dict(zip(name_data, end_data))
             self.is_first = False
             return
 
         latency = self._calculate_latency(start_data, end_data)
-        throughput = self._calculate_throughput(end_data)
+        throughput = self._calculate_throughput(name_data, end_data)
         self.db_handler.put_data(name_data, latency, throughput)
 
     def get_flatten_data(
@@ -171,12 +207,48 @@ class ProfilerHandler:
     ) -> np.ndarray:
         return np.subtract(end_time, start_time)
 
-    def _calculate_throughput(self, end_data: np.ndarray) -> np.ndarray:
-        throughput = np.subtract(end_data, self.previous_end_data)
-        throughput = np.divide(1, throughput)
-        self.previous_end_data = end_data.copy()
+    def _calculate_throughput(
+        self, name_data: List[str], end_data: np.ndarray
+    ) -> np.ndarray:
+        # Stages may be skipped by some data, so compare each stage with
+        # the last data that went through it. The outputs of a flat-map stage
+        # share the runs of the stages before it, which are not counted again.
+        previous_end = np.array(
+            [self.previous_end_data.get(name, np.nan) for name in name_data]
+        )
+        interval = np.subtract(end_data, previous_end)
+        throughput = np.full(len(interval), np.nan)
+        np.divide(1, interval, out=throughput, where=interval > 0)
+        self.previous_end_data.update(zip(name_data, end_data))
         return throughput
 
+    def live_latency(self, q: float = 99, last: Optional[int] = None) -> float:
+        """Get a percentile of the latest end-to-end latency of the pipeline
+
+        Args:
+            q (float, optional): the percentile, between 0 and 100. Defaults to 99.
+            last (Optional[int], optional): If given, only use this many latest
+                records. Defaults to None.
+
+        Returns:
+            float: the latency percentile in seconds, NaN if there is no record
+        """
+        return self.recent_latency.percentile(q, last)
+
+    @property
+    def num_records(self) -> int:
+        """Number of the processed profile data"""
+        return self.recent_latency.count
+
+    def latency_records(self) -> Dict[str, np.ndarray]:
+        """Get all latency records of each stage
+
+        Returns:
+            Dict[str, np.ndarray]: the latency records in seconds, keyed by stage
+            name
+        """
+        return read_latency_records(self.db_handler.db_path)
+
     def summarize(self) -> Tuple[Dict[str, float], Dict[str, float]]:
         """Get the average latency and throughput
 
@@ -0,0 +1,60 @@
+import heapq
+import itertools
+import time
+from queue import Queue
+from typing import List, Optional, Tuple
+
+from pystream.data.pipeline_data import PipelineData
+
+
+_QueueEntry = Tuple[int, int, float, PipelineData]
+
+
+class PriorityStageQueue(Queue):
+    def __init__(self, maxsize: int = 0, max_wait: Optional[float] = 1.0) -> None:
+        """Queue between stages that serves data with higher priority first.
+        Data with the same priority is served in FIFO order.
+
+        Args:
+            maxsize (int, optional): Maximum number of data in the queue. If 0,
+                the queue size is unlimited. Defaults to 0.
+            max_wait (Optional[float], optional): To avoid starvation of data with
+                low priority, the oldest data is served first regardless of its
+                priority once it has waited for this many seconds. If None, low
+                priority data may wait forever. Defaults to 1.0.
+        """
+        self.max_wait = max_wait
+        super().__init__(maxsize)
+
+    def _init(self, maxsize: int) -> None:
+        self.queue: List[_QueueEntry] = []
+        self._counter = itertools.count()
+
+    def _qsize(self) -> int:
+        return len(self.queue)
+
+    def _put(self, item: PipelineData) -> None:
+        entry = (-item.priority, next(self._counter), time.perf_counter(), item)
+        heapq.heappush(self.queue, entry)
+
+    def _get(self) -> PipelineData:
+        if self.max_wait is not None:
+            oldest = min(self.queue, key=lambda entry: entry[1])
+            if time.perf_counter() - oldest[2] > self.max_wait:
+                self.queue.remove(oldest)
+                heapq.heapify(self.queue)
+                return oldest[3]
+        return heapq.heappop(self.queue)[3]
+
+
+def resize_queue(queue: Queue, maxsize: int) -> None:
+    """Change the maximum size of a queue that may be in use. Data already in
+    the queue is kept even if it exceeds the new size.
+
+    Args:
+        queue (Queue): the queue
+        maxsize (int): the new maximum size, 0 for unlimited size
+    """
+    with queue.mutex:
+        queue.maxsize = maxsize
+        queue.not_full.notify_all()
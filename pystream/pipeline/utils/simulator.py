@@ -0,0 +1,425 @@
+import heapq
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from pystream.pipeline.parallel_thread_pipeline.pipeline import ParallelThreadPipeline
+from pystream.pipeline.pipeline_base import PipelineBase
+from pystream.pipeline.utils.autotune import benchmark
+from pystream.pipeline.utils.profiler import read_latency_records
+from pystream.utils.general import _PIPELINE_NAME_IN_PROFILE, _PROFILE_LEVEL_SEPARATOR
+
+
+# Index of the input source among the senders blocked by a full queue
+_SOURCE = -1
+
+
+@dataclass
+class SimulatedUnit:
+    """A group of stages run serially by the same workers, e.g. a stage thread."""
+
+    # Names of the stages in the same format as the profiles, without the main
+    # pipeline name
+    stages: List[str]
+    # Number of workers that take the data from the same input queue
+    replicas: int = 1
+
+    @property
+    def name(self) -> str:
+        return "+".join(self.stages)
+
+
+@dataclass
+class SimulatedLayout:
+    """Arrangement of the stages to be simulated."""
+
+    units: List[SimulatedUnit]
+    # Size of the input queue of each unit. If 0, the data is only handed over to
+    # a free worker.
+    queue_size: int = 1
+    # Whether the input waits if the first queue is full, otherwise the data is
+    # rejected
+    block_input: bool = True
+    # Whether the input waits until each data has finished, like a serial pipeline
+    synchronous: bool = False
+
+    @classmethod
+    def serial(cls, stages: List[str]) -> "SimulatedLayout":
+        """Layout of a serial pipeline
+
+        Args:
+            stages (List[str]): the stage names
+
+        Returns:
+            SimulatedLayout: the layout
+        """
+        return cls([SimulatedUnit(list(stages))], queue_size=0, synchronous=True)
+
+    @classmethod
+    def parallel(
+        cls,
+        stage_groups: List[List[str]],
+        queue_size: int = 1,
+        replicas: Optional[Dict[str, int]] = None,
+        block_input: bool = True,
+    ) -> "SimulatedLayout":
+        """Layout of a parallel pipeline
+
+        Args:
+            stage_groups (List[List[str]]): the stages run by each thread, e.g.
+                from `Pipeline.get_stage_groups`
+            queue_size (int, optional): size of the queues between the threads.
+                Defaults to 1.
+            replicas (Optional[Dict[str, int]], optional): number of workers of
+                the groups keyed by group name, i.e. the stage names joined by "+".
+                Defaults to None.
+            block_input (bool, optional): whether the input waits if the first queue
+                is full, otherwise the data is rejected. Defaults to True.
+
+        Returns:
+            SimulatedLayout: the layout
+        """
+        replicas = {} if replicas is None else replicas
+        units = [SimulatedUnit(list(group)) for group in stage_groups]
+        for unit in units:
+            unit.replicas = replicas.get(unit.name, 1)
+        return cls(units, queue_size=queue_size, block_input=block_input)
+
+    @classmethod
+    def of(cls, pipeline: PipelineBase) -> "SimulatedLayout":
+        """Layout of a built pipeline
+
+        Args:
+            pipeline (PipelineBase): the pipeline, serial or parallel
+
+        Returns:
+            SimulatedLayout: the layout
+        """
+        if isinstance(pipeline, ParallelThreadPipeline):
+            return cls.parallel(
+                pipeline.stage_groups,
+                queue_size=pipeline.queue_size,
+                block_input=pipeline.block_input,
+            )
+        return cls.serial([stage.name for stage in pipeline.stages[:-1]])
+
+
+@dataclass
+class SimulationResult:
+    """Predicted performance of a layout."""
+
+    # Number of completed data per second
+    throughput: float
+    # End-to-end latency in seconds: "mean", "p50", "p95", "p99" and "max"
+    latency: Dict[str, float]
+    # Mean and maximum number of data waiting in the input queue of each unit,
+    # keyed by unit name
+    queue_occupancy: Dict[str, Dict[str, float]]
+    # Fraction of the time the workers of each unit are processing data
+    utilization: Dict[str, float]
+    # Number of completed data
+    completed: int
+    # Number of data rejected because the first queue is full
+    rejected: int
+
+
+@dataclass
+class SimulationValidation:
+    """Comparison between the prediction and a real run."""
+
+    predicted: SimulationResult
+    # Measured throughput in data/second
+    throughput: float
+    # Measured mean end-to-end latency in seconds
+    latency: float
+
+    @property
+    def throughput_error(self) -> float:
+        """Relative error of the predicted throughput"""
+        return (self.predicted.throughput - self.throughput) / self.throughput
+
+    @property
+    def latency_error(self) -> float:
+        """Relative error of the predicted mean latency"""
+        return (self.predicted.latency["mean"] - self.latency) / self.latency
+
+
+class _UnitState:
+    def __init__(self, unit: SimulatedUnit) -> None:
+        self.unit = unit
+        self.idle = unit.replicas
+        # Creation time of the data waiting in the input queue
+        self.queue: Deque[float] = deque()
+        # Senders holding a data because the queue is full
+        self.blocked: Deque[Tuple[int, float]] = deque()
+        self.busy_time = 0.0
+        self.queue_area = 0.0
+        self.max_queue = 0
+
+
+class PipelineSimulator:
+    def __init__(
+        self, stage_latency: Dict[str, Sequence[float]], seed: Optional[int] = None
+    ) -> None:
+        """Discrete-event simulator of the pipeline. The processing time of each
+        stage is drawn from its recorded latency, so the stages are not run.
+
+        Args:
+            stage_latency (Dict[str, Sequence[float]]): the latency records of
+                each stage in seconds, keyed by stage name with or without the main
+                pipeline name, e.g. from `ProfilerHandler.latency_records`
+            seed (Optional[int], optional): seed of the random generator.
+                Defaults to None.
+        """
+        prefix = f"{_PIPELINE_NAME_IN_PROFILE}{_PROFILE_LEVEL_SEPARATOR}"
+        self.stage_latency: Dict[str, np.ndarray] = {}
+        for name, records in stage_latency.items():
+            if name == _PIPELINE_NAME_IN_PROFILE:
+                continue
+            if name.startswith(prefix):
+                name = name[len(prefix) :]
+            self.stage_latency[name] = np.asarray(records, dtype=float)
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_profiler_db(
+        cls, db_path: Optional[str] = None, seed: Optional[int] = None
+    ) -> "PipelineSimulator":
+        """Create a simulator from the latency records in a profiler database
+
+        Args:
+            db_path (Optional[str], optional): path to the SQLite DB. If None, the
+                DB of the last profiled pipeline is used. Defaults to None.
+            seed (Optional[int], optional): seed of the random generator.
+                Defaults to None.
+
+        Returns:
+            PipelineSimulator: the simulator
+        """
+        return cls(read_latency_records(db_path), seed=seed)
+
+    def run(
+        self,
+        layout: SimulatedLayout,
+        num_data: int = 1000,
+        input_rate: Optional[float] = None,
+        poisson: bool = False,
+    ) -> SimulationResult:
+        """Simulate the pipeline
+
+        Args:
+            layout (SimulatedLayout): the arrangement of the stages
+            num_data (int, optional): number of input data. Defaults to 1000.
+            input_rate (Optional[float], optional): input data per second. If None,
+                the data is sent as fast as the pipeline accepts it.
+                Defaults to None.
+            poisson (bool, optional): whether the input arrives randomly at the
+                given rate instead of periodically. Defaults to False.
+
+        Raises:
+            ValueError: raised if a stage has no latency record, or if the input
+                rate is unlimited while the input does not block.
+
+        Returns:
+            SimulationResult: the predicted performance
+        """
+        for unit in layout.units:
+            for name in unit.stages:
+                if len(self.stage_latency.get(name, [])) == 0:
+                    raise ValueError(f"No latency records of stage {name}")
+        if input_rate is None and not (layout.block_input or layout.synchronous):
+            raise ValueError("Input rate must be given if the input does not block")
+        return _Simulation(self, layout, num_data, input_rate, poisson).run()
+
+    def validate(
+        self,
+        pipeline: PipelineBase,
+        samples: Sequence[Any],
+        timeout: Optional[float] = None,
+    ) -> SimulationValidation:
+        """Compare the prediction with a real run of a built pipeline. The input
+        data is sent as fast as the pipeline accepts it, and the pipeline is
+        drained afterwards.
+
+        Args:
+            pipeline (PipelineBase): the pipeline, e.g. `Pipeline.as_stage()`
+            samples (Sequence[Any]): the input data
+            timeout (Optional[float], optional): Timeout in seconds for the data to
+                finish. If None, wait forever. Defaults to None.
+
+        Returns:
+            SimulationValidation: the predicted and the measured performance
+        """
+        predicted = self.run(SimulatedLayout.of(pipeline), num_data=len(samples))
+        throughput, latency, _ = benchmark(pipeline, samples, timeout)
+        return SimulationValidation(predicted, throughput, latency)
+
+    def draw(self, name: str) -> float:
+        """Draw a processing time of a stage from its latency records"""
+        records = self.stage_latency[name]
+        return float(records[self.rng.integers(len(records))])
+
+
+class _Simulation:
+    def __init__(
+        self,
+        simulator: PipelineSimulator,
+        layout: SimulatedLayout,
+        num_data: int,
+        input_rate: Optional[float],
+        poisson: bool,
+    ) -> None:
+        self.simulator = simulator
+        self.layout = layout
+        self.num_data = num_data
+        self.input_rate = input_rate
+        self.poisson = poisson
+        self.units = [_UnitState(unit) for unit in layout.units]
+        self.events: List[Tuple[float, int, int, float]] = []
+        self.event_count = 0
+        self.now = 0.0
+        self.sent = 0
+        self.next_input = 0.0
+        self.rejected = 0
+        self.latency: List[float] = []
+        self.last_completion = 0.0
+
+    def run(self) -> SimulationResult:
+        self.schedule(0.0, _SOURCE, 0.0)
+        while len(self.events) > 0:
+            time, _, index, created = heapq.heappop(self.events)
+            for state in self.units:
+                state.queue_area += len(state.queue) * (time - self.now)
+            self.now = time
+            if index == _SOURCE:
+                self.on_input()
+            else:
+                self.on_finish(index, created)
+        return self.summarize()
+
+    def schedule(self, time: float, index: int, created: float) -> None:
+        heapq.heappush(self.events, (time, self.event_count, index, created))
+        self.event_count += 1
+
+    def schedule_input(self) -> None:
+        """Schedule the next input once the source is free to send it"""
+        if self.sent >= self.num_data:
+            return
+        if self.input_rate is not None and self.sent > 0:
+            interval = 1 / self.input_rate
+            if self.poisson:
+                interval = self.simulator.rng.exponential(interval)
+            self.next_input += interval
+        self.schedule(max(self.now, self.next_input), _SOURCE, 0.0)
+
+    def on_input(self) -> None:
+        self.sent += 1
+        if self.offer(0, self.now):
+            if not self.layout.synchronous:
+                self.schedule_input()
+        elif self.layout.block_input:
+            self.units[0].blocked.append((_SOURCE, self.now))
+        else:
+            self.rejected += 1
+            self.schedule_input()
+
+    def on_finish(self, index: int, created: float) -> None:
+        if index == len(self.units) - 1:
+            self.latency.append(self.now - created)
+            self.last_completion = self.now
+            if self.layout.synchronous:
+                self.schedule_input()
+            self.free(index)
+        elif self.offer(index + 1, created):
+            self.free(index)
+        else:
+            self.units[index + 1].blocked.append((index, created))
+
+    def offer(self, index: int, created: float) -> bool:
+        """Hand over a data to a unit, False if its queue is full"""
+        state = self.units[index]
+        if state.idle > 0:
+            self.start(index, created)
+            return True
+        if len(state.queue) < self.layout.queue_size:
+            state.queue.append(created)
+            state.max_queue = max(state.max_queue, len(state.queue))
+            return True
+        return False
+
+    def start(self, index: int, created: float) -> None:
+        state = self.units[index]
+        state.idle -= 1
+        duration = sum(self.simulator.draw(name) for name in state.unit.stages)
+        state.busy_time += duration
+        self.schedule(self.now + duration, index, created)
+
+    def free(self, index: int) -> None:
+        """Let a worker of a unit take the next data"""
+        state = self.units[index]
+        state.idle += 1
+        while state.idle > 0:
+            if len(state.queue) > 0:
+                self.start(index, state.queue.popleft())
+                self.admit(index)
+            elif len(state.blocked) > 0:
+                sender, created = state.blocked.popleft()
+                self.start(index, created)
+                self.resume(sender)
+            else:
+                break
+
+    def admit(self, index: int) -> None:
+        """Move a blocked data into the queue of a unit if there is space"""
+        state = self.units[index]
+        if len(state.blocked) > 0 and len(state.queue) < self.layout.queue_size:
+            sender, created = state.blocked.popleft()
+            state.queue.append(created)
+            state.max_queue = max(state.max_queue, len(state.queue))
+            self.resume(sender)
+
+    def resume(self, sender: int) -> None:
+        if sender == _SOURCE:
+            self.schedule_input()
+        else:
+            self.free(sender)
+
+    def summarize(self) -> SimulationResult:
+        duration = self.now
+        latency = np.array(self.latency)
+        if len(latency) > 0:
+            latency_summary = {
+                "mean": float(np.mean(latency)),
+                "p50": float(np.percentile(latency, 50)),
+                "p95": float(np.percentile(latency, 95)),
+                "p99": float(np.percentile(latency, 99)),
+                "max": float(np.max(latency)),
+            }
+        else:
+            latency_summary = {
+                key: float("nan") for key in ["mean", "p50", "p95", "p99", "max"]
+            }
+        occupancy = {}
+        utilization = {}
+        for state in self.units:
+            name = state.unit.name
+            occupancy[name] = {
+                "mean": state.queue_area / duration if duration > 0 else 0.0,
+                "max": float(state.max_queue),
+            }
+            capacity = state.unit.replicas * duration
+            utilization[name] = state.busy_time / capacity if capacity > 0 else 0.0
+        if self.last_completion > 0:
+            throughput = len(self.latency) / self.last_completion
+        else:
+            throughput = float("nan")
+        return SimulationResult(
+            throughput=throughput,
+            latency=latency_summary,
+            queue_occupancy=occupancy,
+            utilization=utilization,
+            completed=len(self.latency),
+            rejected=self.rejected,
+        )
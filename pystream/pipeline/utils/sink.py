@@ -0,0 +1,135 @@
+import time
+from queue import Empty, Queue
+from threading import Lock, Thread
+from typing import Any, Callable, List, Optional
+
+from pystream.utils.logger import LOGGER
+
+
+class _StopSink:
+    pass
+
+
+_stop_sink = _StopSink()
+
+
+class ResultSink:
+    def __init__(
+        self,
+        callback: Callable[[Any], None],
+        batch_size: Optional[int] = None,
+        batch_period: Optional[float] = None,
+        threaded: bool = False,
+        queue_size: int = 100,
+    ) -> None:
+        """Consumer of the pipeline results. The callback is invoked for
+        every item that has been finished by the pipeline.
+
+        Args:
+            callback (Callable[[Any], None]): function to be called with the
+                result. If batching is used, it is called with a list of results.
+            batch_size (Optional[int], optional): If given, deliver the results
+                in batches of this size. Defaults to None.
+            batch_period (Optional[float], optional): If given, deliver the
+                results in batches, where a batch is delivered at the latest
+                this many seconds after its first item. Defaults to None.
+            threaded (bool, optional): If True, the callback is invoked in a
+                dedicated thread that reads from a bounded queue. Otherwise, it is
+                invoked in the thread of the pipeline final stage. Defaults to False.
+            queue_size (int, optional): Size of the queue of the threaded sink.
+                The final stage waits when the queue is full. Defaults to 100.
+        """
+        self.callback = callback
+        self.batch_size = batch_size
+        self.batch_period = batch_period
+        self.batched = batch_size is not None or batch_period is not None
+        self.threaded = threaded
+
+        self._batch: List[Any] = []
+        self._batch_started = 0.0
+        self._lock = Lock()
+        self._queue: Queue = Queue(maxsize=queue_size)
+        self._thread: Optional[Thread] = None
+
+    def start(self) -> None:
+        """Start the sink thread if the sink is threaded"""
+        if not self.threaded:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = Thread(target=self._sink_loop, name="PyStream-Sink", daemon=True)
+        self._thread.start()
+
+    def put(self, item: Any) -> None:
+        """Deliver a finished item to the sink
+
+        Args:
+            item (Any): the pipeline output data
+        """
+        if self.threaded:
+            self._queue.put(item)
+            return
+        if not self.batched:
+            self._invoke(item)
+            return
+        with self._lock:
+            self._append(item)
+            if self._batch_ready():
+                self._flush_batch()
+
+    def close(self) -> None:
+        """Deliver all pending results and stop the sink thread"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_stop_sink)
+            self._thread.join()
+        with self._lock:
+            self._flush_batch()
+
+    def _sink_loop(self) -> None:
+        """Function to be run by the sink thread"""
+        while True:
+            timeout = None
+            if self.batch_period is not None and len(self._batch) > 0:
+                elapsed = time.perf_counter() - self._batch_started
+                timeout = max(0.0, self.batch_period - elapsed)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except Empty:
+                with self._lock:
+                    self._flush_batch()
+                continue
+            if isinstance(item, _StopSink):
+                break
+            if not self.batched:
+                self._invoke(item)
+                continue
+            with self._lock:
+                self._append(item)
+                if self._batch_ready():
+                    self._flush_batch()
+
+    def _append(self, item: Any) -> None:
+        if len(self._batch) == 0:
+            self._batch_started = time.perf_counter()
+        self._batch.append(item)
+
+    def _batch_ready(self) -> bool:
+        if self.batch_size is not None and len(self._batch) >= self.batch_size:
+            return True
+        if self.batch_period is not None:
+            elapsed = time.perf_counter() - self._batch_started
+            return elapsed >= self.batch_period
+        return False
+
+    def _flush_batch(self) -> None:
+        if len(self._batch) == 0:
+            return
+        batch = self._batch
+        self._batch = []
+        self._invoke(batch)
+
+    def _invoke(self, payload: Any) -> None:
+        try:
+            self.callback(payload)
+        except Exception:
+            LOGGER.exception("Pipeline result sink raised an exception")
@@ -0,0 +1,167 @@
+import time
+from collections import deque
+from dataclasses import dataclass
+from threading import Event, Thread
+from typing import Callable, Deque, Dict, List, Optional, Protocol
+
+from pystream.utils.logger import LOGGER
+
+
+_STALL_ACTIONS = ("report", "drop", "bypass")
+
+
+class WatchedStageProtocol(Protocol):
+    name: str
+    # Maximum time in seconds to process one data
+    time_budget: Optional[float]
+    # Time from time.perf_counter() at which the current data started to be
+    # processed, None if the stage is idle
+    busy_since: Optional[float]
+
+
+class WatchedPipelineProtocol(Protocol):
+    def watched_stages(self) -> List[WatchedStageProtocol]:
+        ...
+
+    def release_stalled(self, stage: WatchedStageProtocol, drop: bool) -> bool:
+        ...
+
+
+@dataclass
+class StallEvent:
+    """A stage that exceeded its time budget."""
+
+    # Time of the detection, from time.time()
+    time: float
+    # Name of the stalled stage
+    stage: str
+    # Time in seconds the stage has been processing the data when detected
+    elapsed: float
+    # One of "report", "drop" and "bypass"
+    action: str
+
+
+class StageWatchdog:
+    def __init__(
+        self,
+        action: str = "report",
+        interval: float = 0.1,
+        callbacks: Optional[List[Callable[[StallEvent], None]]] = None,
+        history: int = 1000,
+    ) -> None:
+        """Watchdog that detects the stages of a parallel pipeline that exceed
+        their time budget (see the `time_budget` option of `Pipeline.add`), e.g.
+        because they hang in a driver call. Each stalled data is reported once.
+
+        With "drop" or "bypass", the stalled thread is abandoned and a new thread
+        runs the stage for the next data, so the data keeps flowing. The output of
+        the stalled call is discarded when it returns. Note that the stage is then
+        called again while the stalled call is still running.
+
+        Args:
+            action (str, optional): What to do with the stalled data. "report" only
+                reports it, "drop" drops it, and "bypass" sends it to the next stage
+                as it is. Defaults to "report".
+            interval (float, optional): time between checks in seconds.
+                Defaults to 0.1.
+            callbacks (Optional[List[Callable[[StallEvent], None]]], optional):
+                functions invoked with each stall event, in the watchdog thread.
+                Defaults to None.
+            history (int, optional): the number of the latest events kept.
+                Defaults to 1000.
+
+        Raises:
+            ValueError: raised if the action is unknown.
+        """
+        if action not in _STALL_ACTIONS:
+            raise ValueError(f"Unknown stall action: {action}")
+        self.action = action
+        self.interval = interval
+        self.callbacks = [] if callbacks is None else callbacks
+
+        self._events: Deque[StallEvent] = deque(maxlen=history)
+        self._counts: Dict[str, int] = {}
+        # Start time of the data already reported for each stage
+        self._reported: Dict[int, float] = {}
+        self._stopper = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(self, pipeline: WatchedPipelineProtocol) -> None:
+        """Start watching the pipeline in a background thread
+
+        Args:
+            pipeline (WatchedPipelineProtocol): the watched pipeline
+        """
+        self.stop()
+        self._stopper.clear()
+        self._thread = Thread(
+            target=self._watch_loop, args=(pipeline,), name="PyStream-Watchdog"
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop watching the pipeline"""
+        self._stopper.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch_loop(self, pipeline: WatchedPipelineProtocol) -> None:
+        while not self._stopper.wait(self.interval):
+            self.check(pipeline)
+
+    def check(self, pipeline: WatchedPipelineProtocol) -> List[StallEvent]:
+        """Check the stages once and handle the stalled ones
+
+        Args:
+            pipeline (WatchedPipelineProtocol): the watched pipeline
+
+        Returns:
+            List[StallEvent]: the newly detected stalls
+        """
+        now = time.perf_counter()
+        events = []
+        for stage in pipeline.watched_stages():
+            busy_since = stage.busy_since
+            if busy_since is None or stage.time_budget is None:
+                continue
+            elapsed = now - busy_since
+            if elapsed <= stage.time_budget:
+                continue
+            if self._reported.get(id(stage)) == busy_since:
+                continue
+            if self.action != "report":
+                if not pipeline.release_stalled(stage, drop=self.action == "drop"):
+                    continue
+            self._reported[id(stage)] = busy_since
+            events.append(StallEvent(time.time(), stage.name, elapsed, self.action))
+        for event in events:
+            self._record(event)
+        return events
+
+    def _record(self, event: StallEvent) -> None:
+        LOGGER.warning(
+            f"Stage {event.stage} has been processing a data for {event.elapsed:.3f}"
+            f" s, exceeding its time budget ({event.action})"
+        )
+        self._events.append(event)
+        self._counts[event.stage] = self._counts.get(event.stage, 0) + 1
+        for callback in self.callbacks:
+            callback(event)
+
+    def get_events(self) -> List[StallEvent]:
+        """Get the latest stall events
+
+        Returns:
+            List[StallEvent]: the events, the oldest first
+        """
+        return list(self._events)
+
+    def stall_counts(self) -> Dict[str, int]:
+        """Get the number of stalls of each stage
+
+        Returns:
+            Dict[str, int]: the number of stalls keyed by stage name
+        """
+        return dict(self._counts)
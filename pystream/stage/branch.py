@@ -0,0 +1,65 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from pystream.stage.stage import Stage, StageCallable
+
+
+BranchStageSpec = Union[StageCallable, Tuple[StageCallable, str]]
+
+
+class Branches(Stage):
+    """Definition of branches that process the same data independently and
+    are merged by a join function afterwards.
+
+    Args:
+        branches (Dict[str, Union[BranchStageSpec, List[BranchStageSpec]]]): The
+            branches, where the key is the branch name and the value is the stage
+            or the list of stages of the branch. A stage can be given together with
+            its name as a tuple of (stage, name).
+        join (Callable[[Dict[str, Any]], Any]): Function that takes a dictionary of
+            the branch outputs, keyed by branch name, and returns the merged data.
+    """
+
+    def __init__(
+        self,
+        branches: Dict[str, Union[BranchStageSpec, List[BranchStageSpec]]],
+        join: Callable[[Dict[str, Any]], Any],
+    ) -> None:
+        self.branches: Dict[str, List[Tuple[StageCallable, Optional[str]]]] = {}
+        for branch_name, specs in branches.items():
+            if not isinstance(specs, list):
+                specs = [specs]
+            self.branches[branch_name] = [
+                spec if isinstance(spec, tuple) else (spec, None) for spec in specs
+            ]
+        self.join = join
+
+    def __call__(self, data: Any) -> Any:
+        outputs = {}
+        for branch_name, stages in self.branches.items():
+            branch_data = data
+            for stage, _ in stages:
+                branch_data = stage(branch_data)
+            outputs[branch_name] = branch_data
+        return self.join(outputs)
+
+    def setup(self) -> None:
+        for stages in self.branches.values():
+            for stage, _ in stages:
+                if isinstance(stage, Stage):
+                    stage.setup()
+        if isinstance(self.join, Stage):
+            self.join.setup()
+
+    def warmup(self, sample: Any) -> None:
+        for stages in self.branches.values():
+            for stage, _ in stages:
+                if isinstance(stage, Stage):
+                    stage.warmup(sample)
+
+    def cleanup(self) -> None:
+        for stages in self.branches.values():
+            for stage, _ in stages:
+                if isinstance(stage, Stage):
+                    stage.cleanup()
+        if isinstance(self.join, Stage):
+            self.join.cleanup()
@@ -1,15 +1,33 @@
-from typing import Optional
+from contextlib import contextmanager
+from threading import Condition, get_ident
+import time
+from typing import Any, Dict, Iterator, List, Optional
 
-from pystream.data.pipeline_data import PipelineData
+from pystream.data.buffer_pool import borrowing_for
+from pystream.data.pipeline_data import DropRequest, PipelineData
+from pystream.data.profiler_data import find_time_data
+from pystream.data.stage_data import StageOptions
 from pystream.pipeline.pipeline_base import PipelineBase
+from pystream.stage.branch import Branches
 from pystream.stage.final_stage import FinalStage
+from pystream.stage.flat_map import FlatMap
+from pystream.stage.gate import ChangeGate
 from pystream.stage.stage import Stage, StageCallable
 from pystream.utils.errors import InvalidStageName, PipelineInitiationError
-from pystream.utils.general import _FINAL_STAGE_NAME, _PIPELINE_NAME_IN_PROFILE
+from pystream.utils.general import (
+    _ABSORBED_DROP_REASON,
+    _FINAL_STAGE_NAME,
+    _JOIN_STAGE_NAME,
+    _PIPELINE_NAME_IN_PROFILE,
+    _PROFILE_LEVEL_SEPARATOR,
+)
 
 
 _STAGE_COUNTER = 0
 
+# Returned by an exhausted iterator of flat-map outputs
+_NO_OUTPUT = object()
+
 
 def get_default_stage_name() -> str:
     global _STAGE_COUNTER
@@ -46,19 +64,142 @@ class StageContainer(Stage):
     def __init__(self, stage: StageCallable, name: Optional[str] = None) -> None:
         self._name = get_stage_name(name, stage)
         self.stage = stage
+        self.options = StageOptions()
+        # Time in seconds taken to set up and warm up the stage, None if the
+        # stage has not been prepared
+        self.ready_time: Optional[float] = None
+        # ID of the stage object called by each thread, used to replace the stage
+        self._stage_users: Dict[int, int] = {}
+        self._stage_condition = Condition()
         if isinstance(stage, Stage):
             stage.name = self._name
 
     def __call__(self, data: PipelineData) -> PipelineData:
+        if data.bypass or data.is_dropped:
+            return data
         data.profile.tick_start(self.name)
-        data.data = self.stage(data.data)
+        with self._use_stage() as stage, borrowing_for(data):
+            output = stage(data.data)
+        if isinstance(output, DropRequest):
+            data.drop(self.name, output.reason)
+        else:
+            data.data = output
         data.profile.tick_end()
         return data
 
+    def prepare(self, warmup_samples: Optional[List[Any]] = None) -> None:
+        """Set up the stage and warm it up with each sample, then record the
+        time taken. Do nothing if the stage has been prepared.
+
+        Args:
+            warmup_samples (Optional[List[Any]], optional): the warm-up samples.
+                Defaults to None.
+        """
+        if self.ready_time is not None:
+            return
+        start = time.perf_counter()
+        self.setup()
+        for sample in warmup_samples or []:
+            self.warmup(sample)
+        self.ready_time = time.perf_counter() - start
+
+    @contextmanager
+    def _use_stage(self) -> Iterator[StageCallable]:
+        """Get the current stage and count it as running until the context ends"""
+        thread_id = get_ident()
+        with self._stage_condition:
+            stage = self.stage
+            self._stage_users[thread_id] = id(stage)
+        try:
+            yield stage
+        finally:
+            with self._stage_condition:
+                self._stage_users.pop(thread_id, None)
+                self._stage_condition.notify_all()
+
+    def release_thread(self, thread_id: int) -> None:
+        """Stop counting the stage call of a thread as running, so replacing the
+        stage does not wait for it, e.g. the call of a thread abandoned by the
+        watchdog that may never return
+
+        Args:
+            thread_id (int): the identifier of the thread
+        """
+        with self._stage_condition:
+            if self._stage_users.pop(thread_id, None) is not None:
+                self._stage_condition.notify_all()
+
+    def replace(
+        self, stage: StageCallable, warmup_samples: Optional[List[Any]] = None
+    ) -> None:
+        """Replace the stage while the pipeline is running. The new stage is set
+        up and warmed up first, then it takes over from the next data. The old
+        stage is cleaned up after it finishes the data it is processing, except
+        the calls released by `release_thread`.
+
+        Args:
+            stage (StageCallable): the new stage, it gets the name of this stage
+            warmup_samples (Optional[List[Any]], optional): the warm-up samples
+                of the new stage. Defaults to None.
+
+        Raises:
+            PipelineInitiationError: raised if this stage or the new stage is
+                not a plain stage, e.g. branches or a flat-map stage.
+        """
+        if type(self) is not StageContainer or isinstance(
+            stage, (PipelineBase, Branches, ChangeGate, FlatMap)
+        ):
+            raise PipelineInitiationError(
+                f"Stage {self.name} cannot be replaced, only plain stages can"
+            )
+        if isinstance(stage, Stage):
+            stage.name = self.name
+        start = time.perf_counter()
+        if isinstance(stage, Stage):
+            stage.setup()
+            for sample in warmup_samples or []:
+                stage.warmup(sample)
+        with self._stage_condition:
+            old_stage = self.stage
+            self.stage = stage
+            self.ready_time = time.perf_counter() - start
+            self._stage_condition.wait_for(
+                lambda: id(old_stage) not in self._stage_users.values()
+            )
+        if isinstance(old_stage, Stage):
+            old_stage.cleanup()
+
+    def setup(self) -> None:
+        if isinstance(self.stage, Stage):
+            self.stage.setup()
+
+    def warmup(self, sample: Any) -> None:
+        if isinstance(self.stage, Stage):
+            self.stage.warmup(sample)
+
     def cleanup(self) -> None:
         if isinstance(self.stage, Stage):
             self.stage.cleanup()
 
+    def reset(self) -> None:
+        if isinstance(self.stage, Stage):
+            self.stage.reset()
+
+    def stats(self) -> Dict[str, Any]:
+        if isinstance(self.stage, Stage):
+            return self.stage.stats()
+        return {}
+
+    def substage_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Statistics of the stages inside this stage, keyed by their
+        names relative to this stage"""
+        return {}
+
+    def substage_ready_times(self) -> Dict[str, Optional[float]]:
+        """Time to ready of the stages inside this stage, keyed by their
+        names relative to this stage"""
+        return {}
+
     @property
     def name(self) -> str:
         if isinstance(self.stage, Stage):
@@ -83,7 +224,543 @@ class PipelineContainer(StageContainer):
         super().__init__(stage, name)
 
     def __call__(self, data: PipelineData) -> PipelineData:
+        if data.bypass or data.is_dropped:
+            return data
+        # The profile level is closed by the final stage of the child pipeline
+        data = self.enter(data)
+        data = self.stage(data)
+        return self.exit(data)
+
+    def enter(self, data: PipelineData) -> PipelineData:
+        """Start the profile level of the child pipeline"""
+        data.profile.tick_start(self.name)
+        return data
+
+    def exit(self, data: PipelineData) -> PipelineData:
+        """Mark the data dropped in the child pipeline with the path of the stage
+        that dropped it"""
+        if data.is_dropped:
+            data.dropped_by = f"{self.name}{_PROFILE_LEVEL_SEPARATOR}{data.dropped_by}"
+        return data
+
+    def prepare(self, warmup_samples: Optional[List[Any]] = None) -> None:
+        # The child pipeline prepares its own stages when it is built
+        if self.ready_time is not None or not isinstance(self.stage, PipelineBase):
+            return
+        start = time.perf_counter()
+        self.stage.wait_ready()
+        self.ready_time = time.perf_counter() - start
+
+    def reset(self) -> None:
+        if isinstance(self.stage, PipelineBase):
+            for stage in self.stage.stages:
+                stage.reset()
+
+    def substage_stats(self) -> Dict[str, Dict[str, Any]]:
+        if not isinstance(self.stage, PipelineBase):
+            return {}
+        return collect_stage_stats(self.stage.stages)
+
+    def substage_ready_times(self) -> Dict[str, Optional[float]]:
+        if not isinstance(self.stage, PipelineBase):
+            return {}
+        return collect_ready_times(self.stage.stages)
+
+
+class PipelineEntry(Stage):
+    def __init__(self, stage: PipelineContainer) -> None:
+        """Stage that starts a child pipeline whose stages are run directly by
+        the parent pipeline.
+
+        Args:
+            stage (PipelineContainer): the child pipeline
+        """
+        self.stage = stage
+
+    def __call__(self, data: PipelineData) -> PipelineData:
+        if data.bypass or data.is_dropped:
+            return data
+        return self.stage.enter(data)
+
+    def cleanup(self) -> None:
+        pass
+
+    @property
+    def name(self) -> str:
+        return f"{self.stage.name}_Entry"
+
+
+class PipelineExit(Stage):
+    def __init__(self, stage: PipelineContainer, final_stage: FinalStage) -> None:
+        """Stage that finishes a child pipeline whose stages are run directly by
+        the parent pipeline. It runs the final stage of the child pipeline, which
+        closes the profile level and counts the data.
+
+        Args:
+            stage (PipelineContainer): the child pipeline
+            final_stage (FinalStage): the final stage of the child pipeline
+        """
+        self.stage = stage
+        self.final_stage = final_stage
+
+    def __call__(self, data: PipelineData) -> PipelineData:
+        # Bypassed data has skipped the child pipeline
+        if data.bypass:
+            return data
+        data = self.final_stage(data)
+        return self.stage.exit(data)
+
+    def cleanup(self) -> None:
+        pass
+
+    @property
+    def name(self) -> str:
+        return f"{self.stage.name}_Exit"
+
+
+class FusedStage(Stage):
+    def __init__(self, stages: List[StageContainer]) -> None:
+        """Consecutive stages that are run serially by one thread of a parallel
+        pipeline. Each stage still profiles the data by itself.
+
+        Args:
+            stages (List[StageContainer]): the stages
+        """
+        self.stages = stages
+
+    def __call__(self, data: PipelineData) -> PipelineData:
+        for stage in self.stages:
+            data = stage(data)
+        return data
+
+    def prepare(self, warmup_samples: Optional[List[Any]] = None) -> None:
+        for stage in self.stages:
+            stage.prepare(warmup_samples)
+
+    def cleanup(self) -> None:
+        for stage in self.stages:
+            stage.cleanup()
+
+    def reset(self) -> None:
+        for stage in self.stages:
+            stage.reset()
+
+    @property
+    def name(self) -> str:
+        return "+".join(stage.name for stage in self.stages)
+
+
+class GateContainer(StageContainer):
+    def __init__(self, stage: StageCallable, name: Optional[str] = None) -> None:
+        if not isinstance(stage, ChangeGate):
+            raise PipelineInitiationError(
+                "Bug: GateContainer is used for non-gate stage"
+            )
+        super().__init__(stage, name)
+
+    def __call__(self, data: PipelineData) -> PipelineData:
+        if data.bypass or data.is_dropped:
+            return data
+        data.profile.tick_start(self.name)
+        data = self.stage(data)
+        data.profile.tick_end()
+        return data
+
+
+class FlatMapContainer(StageContainer):
+    def __init__(self, stage: StageCallable, name: Optional[str] = None) -> None:
+        if not isinstance(stage, FlatMap):
+            raise PipelineInitiationError(
+                "Bug: FlatMapContainer is used for non-flat-map stage"
+            )
+        super().__init__(stage, name)
+        # Number of outputs beyond one output per input
+        self.extra_outputs = 0
+
+    def __call__(self, data: PipelineData) -> PipelineData:
+        raise PipelineInitiationError(
+            f"Flat-map stage {self.name} can only be run by a pipeline"
+        )
+
+    def iterate(self, data: PipelineData) -> Iterator[PipelineData]:
+        """Process the data and yield the output data one by one. Each output
+        carries a copy of the input profile, so its latency is counted from the
+        start of the input data. If there is no output, the input data is dropped
+        as absorbed and yielded instead.
+
+        The buffers borrowed for the input data go with the last output, except
+        the buffers referenced by the other outputs, which are detached from their
+        pools.
+
+        Args:
+            data (PipelineData): the input data
+
+        Yields:
+            PipelineData: the output data
+        """
+        if data.bypass or data.is_dropped:
+            yield data
+            return
         data.profile.tick_start(self.name)
+        outputs = self._expand(data)
+        output = next(outputs, _NO_OUTPUT)
+        if output is _NO_OUTPUT:
+            data.profile.tick_end()
+            data.drop(self.name, _ABSORBED_DROP_REASON)
+            yield data
+            return
+        while output is not _NO_OUTPUT:
+            profile = data.profile.copy()
+            profile.tick_end()
+            next_output = next(outputs, _NO_OUTPUT)
+            result = PipelineData(data=output, profile=profile, priority=data.priority)
+            if next_output is _NO_OUTPUT:
+                result.buffers, data.buffers = data.buffers, []
+            else:
+                self.extra_outputs += 1
+                data.detach_buffers(output)
+            yield result
+            output = next_output
+
+    def _expand(self, data: PipelineData) -> Iterator[Any]:
+        """Run the stage on the input data, the buffers borrowed while producing
+        each output belong to the input data"""
+        with borrowing_for(data):
+            outputs = iter(self.stage(data.data))
+        while True:
+            with borrowing_for(data):
+                output = next(outputs, _NO_OUTPUT)
+            if output is _NO_OUTPUT:
+                return
+            yield output
+
+
+class BranchTail(Stage):
+    def __init__(self, stage: StageContainer) -> None:
+        """Wrapper of the last stage of a branch, which closes the
+        branch level of the profile after the stage is executed.
+
+        Args:
+            stage (StageContainer): the last stage of the branch
+        """
+        self.stage = stage
+
+    def __call__(self, data: PipelineData) -> PipelineData:
         data = self.stage(data)
         data.profile.tick_end()
         return data
+
+    def prepare(self, warmup_samples: Optional[List[Any]] = None) -> None:
+        self.stage.prepare(warmup_samples)
+
+    def cleanup(self) -> None:
+        self.stage.cleanup()
+
+    def reset(self) -> None:
+        self.stage.reset()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.stage.stats()
+
+    @property
+    def ready_time(self) -> Optional[float]:
+        return self.stage.ready_time
+
+    @property
+    def name(self) -> str:
+        return self.stage.name
+
+
+class BranchContainer(StageContainer):
+    def __init__(self, stage: StageCallable, name: Optional[str] = None) -> None:
+        if not isinstance(stage, Branches):
+            raise PipelineInitiationError(
+                "Bug: BranchContainer is used for non-branches stage"
+            )
+        super().__init__(stage, name)
+        self.join_function = stage.join
+        self.branch_stages: Dict[str, List[Stage]] = {}
+        for branch_name, specs in stage.branches.items():
+            check_invalid_stage_name(branch_name)
+            if branch_name == _JOIN_STAGE_NAME:
+                raise InvalidStageName(f"Branch name cannot be {_JOIN_STAGE_NAME}")
+            if len(specs) == 0:
+                raise PipelineInitiationError(f"Branch {branch_name} has no stage")
+            if any(isinstance(spec[0], ChangeGate) for spec in specs):
+                raise PipelineInitiationError("Change gate cannot be used in a branch")
+            if any(isinstance(spec[0], FlatMap) for spec in specs):
+                raise PipelineInitiationError("Flat-map cannot be used in a branch")
+            containers: List[Stage] = [
+                containerize_stage(branch_stage, branch_stage_name)
+                for branch_stage, branch_stage_name in specs
+            ]
+            # Keep the default names when the branches are containerized again
+            stage.branches[branch_name] = [
+                (spec[0], container.name) for spec, container in zip(specs, containers)
+            ]
+            containers[-1] = BranchTail(containers[-1])  # type: ignore
+            self.branch_stages[branch_name] = containers
+
+    def __call__(self, data: PipelineData) -> PipelineData:
+        if data.bypass or data.is_dropped:
+            return data
+        forks = self.fork(data)
+        outputs = {}
+        for branch_name, branch_data in forks.items():
+            for stage in self.branch_stages[branch_name]:
+                branch_data = stage(branch_data)
+            outputs[branch_name] = branch_data
+        return self.join(data, outputs)
+
+    def fork(self, data: PipelineData) -> Dict[str, PipelineData]:
+        """Start the branches stage and create the input data of each branch.
+        All branches receive the same data object. The branch data keeps the
+        start time of the input data, so that the deadlines are enforced.
+
+        Args:
+            data (PipelineData): the input data
+
+        Returns:
+            Dict[str, PipelineData]: the input data of each branch
+        """
+        data.profile.tick_start(self.name)
+        forks = {}
+        for branch_name in self.branch_stages:
+            branch_data = PipelineData(data=data.data, priority=data.priority)
+            branch_data.profile.data.started = data.profile.data.started
+            branch_data.profile.tick_start(branch_name)
+            forks[branch_name] = branch_data
+        return forks
+
+    def join(
+        self, data: PipelineData, outputs: Dict[str, PipelineData]
+    ) -> PipelineData:
+        """Merge the branch outputs and finish the branches stage
+
+        Args:
+            data (PipelineData): the input data of the branches stage
+            outputs (Dict[str, PipelineData]): the output data of each branch
+
+        Returns:
+            PipelineData: the merged data
+        """
+        time_data = find_time_data(data.profile.data, data.profile.current_stages)
+        results = {}
+        for branch_name, branch_data in outputs.items():
+            time_data.substage[branch_name] = branch_data.profile.data.substage[
+                branch_name
+            ]
+            results[branch_name] = branch_data.data
+            data.buffers.extend(branch_data.buffers)
+            if branch_data.is_dropped and not data.is_dropped:
+                # Dropping the data in one branch drops the whole data
+                data.drop(
+                    _PROFILE_LEVEL_SEPARATOR.join(
+                        [self.name, branch_name, str(branch_data.dropped_by)]
+                    ),
+                    str(branch_data.drop_reason),
+                )
+        if data.is_dropped:
+            data.profile.tick_end()
+            return data
+        data.profile.tick_start(_JOIN_STAGE_NAME)
+        data.data = self.join_function(results)
+        data.profile.tick_end()
+        data.profile.tick_end()
+        return data
+
+    def prepare(self, warmup_samples: Optional[List[Any]] = None) -> None:
+        """Prepare the stages of each branch, then set up the join function.
+        The time to ready of this stage is the setup time of the join function."""
+        for stages in self.branch_stages.values():
+            for stage in stages:
+                stage.prepare(warmup_samples)  # type: ignore
+        self.prepare_join()
+
+    def prepare_join(self) -> None:
+        """Set up the join function and record the time taken. Do nothing if
+        the join function has been set up."""
+        if self.ready_time is not None:
+            return
+        start = time.perf_counter()
+        if isinstance(self.join_function, Stage):
+            self.join_function.setup()
+        self.ready_time = time.perf_counter() - start
+
+    def cleanup(self) -> None:
+        for stages in self.branch_stages.values():
+            for stage in stages:
+                stage.cleanup()
+        self.cleanup_join()
+
+    def reset(self) -> None:
+        for stages in self.branch_stages.values():
+            for stage in stages:
+                stage.reset()
+        if isinstance(self.join_function, Stage):
+            self.join_function.reset()
+
+    def cleanup_join(self) -> None:
+        if isinstance(self.join_function, Stage):
+            self.join_function.cleanup()
+
+    def substage_stats(self) -> Dict[str, Dict[str, Any]]:
+        out = {}
+        for branch_name, stages in self.branch_stages.items():
+            for name, stats in collect_stage_stats(stages).items():
+                out[f"{branch_name}{_PROFILE_LEVEL_SEPARATOR}{name}"] = stats
+        return out
+
+    def substage_ready_times(self) -> Dict[str, Optional[float]]:
+        out = {}
+        for branch_name, stages in self.branch_stages.items():
+            for name, ready_time in collect_ready_times(stages).items():
+                out[f"{branch_name}{_PROFILE_LEVEL_SEPARATOR}{name}"] = ready_time
+        return out
+
+
+def containerize_stage(
+    stage: StageCallable,
+    name: Optional[str] = None,
+    options: Optional[StageOptions] = None,
+) -> StageContainer:
+    """Wrap a stage into the suitable container. A stage that is already a
+    container is reused as it is, e.g. to run prepared stages in another
+    pipeline without setting them up again.
+
+    Args:
+        stage (StageCallable): the stage
+        name (Optional[str], optional): the stage name. Defaults to None.
+        options (Optional[StageOptions], optional): the stage options. If None,
+            the default options are used. Defaults to None.
+
+    Returns:
+        StageContainer: the stage container
+    """
+    container: StageContainer
+    if isinstance(stage, StageContainer):
+        container = stage
+    elif isinstance(stage, PipelineBase):
+        container = PipelineContainer(stage, name)
+    elif isinstance(stage, Branches):
+        container = BranchContainer(stage, name)
+    elif isinstance(stage, ChangeGate):
+        container = GateContainer(stage, name)
+    elif isinstance(stage, FlatMap):
+        container = FlatMapContainer(stage, name)
+    else:
+        container = StageContainer(stage, name)
+    if options is not None:
+        container.options = options
+    return container
+
+
+def collect_stage_stats(stages: List[Stage]) -> Dict[str, Dict[str, Any]]:
+    """Collect the statistics of the stages and their substages, keyed by
+    their names in the same format as the profiles. Stages without statistics
+    and the final stage are skipped.
+
+    Args:
+        stages (List[Stage]): the stages of a pipeline
+
+    Returns:
+        Dict[str, Dict[str, Any]]: the statistics of each stage
+    """
+    out = {}
+    for stage in stages:
+        if isinstance(stage, FinalStage):
+            continue
+        stats = stage.stats()
+        if len(stats) > 0:
+            out[stage.name] = stats
+        if isinstance(stage, StageContainer):
+            for name, sub_stats in stage.substage_stats().items():
+                out[f"{stage.name}{_PROFILE_LEVEL_SEPARATOR}{name}"] = sub_stats
+    return out
+
+
+def collect_ready_times(stages: List[Stage]) -> Dict[str, Optional[float]]:
+    """Collect the time to ready of the stages and their substages, keyed by
+    their names in the same format as the profiles. The final stage is skipped.
+
+    Args:
+        stages (List[Stage]): the stages of a pipeline
+
+    Returns:
+        Dict[str, Optional[float]]: the time in seconds taken to set up and warm
+        up each stage, None if the stage is not ready yet
+    """
+    out: Dict[str, Optional[float]] = {}
+    for stage in stages:
+        if isinstance(stage, FinalStage):
+            continue
+        if isinstance(stage, (StageContainer, BranchTail)):
+            out[stage.name] = stage.ready_time
+        if isinstance(stage, StageContainer):
+            for name, ready_time in stage.substage_ready_times().items():
+                out[f"{stage.name}{_PROFILE_LEVEL_SEPARATOR}{name}"] = ready_time
+    return out
+
+
+def find_stage(stages: List[Stage], name: str) -> Optional[StageContainer]:
+    """Find a stage by its name, in the same format as the profiles relative to
+    the given stages, e.g. "Branches__Left__Stage_1" for a stage in a branch
+
+    Args:
+        stages (List[Stage]): the stages of a pipeline
+        name (str): the stage name
+
+    Returns:
+        Optional[StageContainer]: the stage, None if it is not found
+    """
+    for stage in stages:
+        if isinstance(stage, BranchTail):
+            stage = stage.stage
+        if not isinstance(stage, StageContainer):
+            continue
+        if stage.name == name:
+            return stage
+        prefix = f"{stage.name}{_PROFILE_LEVEL_SEPARATOR}"
+        if not name.startswith(prefix):
+            continue
+        subname = name[len(prefix) :]
+        if isinstance(stage, PipelineContainer) and isinstance(
+            stage.stage, PipelineBase
+        ):
+            found = find_stage(stage.stage.stages, subname)
+        elif isinstance(stage, BranchContainer):
+            branch_name, _, subname = subname.partition(_PROFILE_LEVEL_SEPARATOR)
+            found = find_stage(stage.branch_stages.get(branch_name, []), subname)
+        else:
+            found = None
+        if found is not None:
+            return found
+    return None
+
+
+def iter_containers(stages: List[Stage]) -> Iterator[StageContainer]:
+    """Iterate over the stage containers of a pipeline, including the ones inside
+    sub-pipelines, branches and fused stages
+
+    Args:
+        stages (List[Stage]): the stages of a pipeline
+
+    Yields:
+        StageContainer: the stage containers
+    """
+    for stage in stages:
+        if isinstance(stage, BranchTail):
+            stage = stage.stage
+        if isinstance(stage, FusedStage):
+            yield from iter_containers(stage.stages)
+            continue
+        if not isinstance(stage, StageContainer):
+            continue
+        yield stage
+        if isinstance(stage, PipelineContainer) and isinstance(
+            stage.stage, PipelineBase
+        ):
+            yield from iter_containers(stage.stage.stages)
+        elif isinstance(stage, BranchContainer):
+            for branch_stages in stage.branch_stages.values():
+                yield from iter_containers(branch_stages)
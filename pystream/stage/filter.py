@@ -0,0 +1,24 @@
+from typing import Any, Callable
+
+from pystream.data.pipeline_data import DROP
+from pystream.stage.stage import Stage
+
+
+class Filter(Stage):
+    """Stage that drops the data that does not satisfy a predicate
+
+    Args:
+        predicate (Callable[[Any], bool]): function that returns True if
+            the data should be kept
+    """
+
+    def __init__(self, predicate: Callable[[Any], bool]) -> None:
+        self.predicate = predicate
+
+    def __call__(self, data: Any) -> Any:
+        if self.predicate(data):
+            return data
+        return DROP
+
+    def cleanup(self) -> None:
+        pass
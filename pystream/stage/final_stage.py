@@ -1,9 +1,14 @@
-from typing import Optional, Protocol
+from threading import Condition
+from typing import Any, Dict, List, Optional, Protocol
 
 from pystream.data.pipeline_data import PipelineData
-from pystream.data.profiler_data import ProfileData
+from pystream.data.profiler_data import LatencyWindow, ProfileData
 from pystream.stage.stage import Stage
-from pystream.utils.general import _FINAL_STAGE_NAME
+from pystream.utils.general import (
+    _ABSORBED_DROP_REASON,
+    _FINAL_STAGE_NAME,
+    _REUSE_LOST_DROP_REASON,
+)
 
 
 class ProfilerHandlerProtocol(Protocol):
@@ -11,21 +16,103 @@ class ProfilerHandlerProtocol(Protocol):
         ...
 
 
+class SinkProtocol(Protocol):
+    def put(self, item: Any) -> None:
+        ...
+
+
 class FinalStage(Stage):
-    def __init__(self, profiler_handler: Optional[ProfilerHandlerProtocol]) -> None:
+    def __init__(
+        self,
+        profiler_handler: Optional[ProfilerHandlerProtocol],
+        sinks: Optional[List[SinkProtocol]] = None,
+    ) -> None:
         self.profiler_handler = profiler_handler
+        self.sinks: List[SinkProtocol] = [] if sinks is None else sinks
         self._name = _FINAL_STAGE_NAME
 
+        self.completed = 0
+        self.dropped = 0
+        self.absorbed = 0
+        self.dropped_by: Dict[str, int] = {}
+        self.drop_reasons: Dict[str, int] = {}
+        self.latency_by_priority: Dict[int, LatencyWindow] = {}
+        # Latency of the most recent data of all priorities
+        self.recent_latency = LatencyWindow(size=100)
+        # Notified each time a data leaves the pipeline
+        self.finished_condition = Condition()
+
     def __call__(self, data: PipelineData) -> PipelineData:
         is_at_main = data.profile.is_at_main
         data.profile.tick_end()
+        if is_at_main and not data.take_reused_output():
+            data.drop(self.name, _REUSE_LOST_DROP_REASON)
+        if data.is_dropped:
+            self._count_drop(data)
+            if is_at_main:
+                data.release_buffers()
+            self._notify_finished()
+            return data
+        if is_at_main:
+            self._record_latency(data)
         if self.profiler_handler is not None and is_at_main:
             self.profiler_handler.process_data(data.profile)
+        if is_at_main:
+            for sink in self.sinks:
+                sink.put(data.data)
+            data.release_buffers()
+        self.completed += 1
+        self._notify_finished()
         return data
 
+    def _notify_finished(self) -> None:
+        with self.finished_condition:
+            self.finished_condition.notify_all()
+
+    def _record_latency(self, data: PipelineData) -> None:
+        time_data = data.profile.data
+        if time_data.started is None or time_data.ended is None:
+            return
+        latency = time_data.ended - time_data.started
+        if data.priority not in self.latency_by_priority:
+            self.latency_by_priority[data.priority] = LatencyWindow()
+        self.latency_by_priority[data.priority].add(latency)
+        self.recent_latency.add(latency)
+
+    def _count_drop(self, data: PipelineData) -> None:
+        # Data absorbed by a flat-map stage is part of other data, not dropped
+        if data.drop_reason == _ABSORBED_DROP_REASON:
+            self.absorbed += 1
+            return
+        self.dropped += 1
+        dropped_by = str(data.dropped_by)
+        self.dropped_by[dropped_by] = self.dropped_by.get(dropped_by, 0) + 1
+        reason = str(data.drop_reason)
+        self.drop_reasons[reason] = self.drop_reasons.get(reason, 0) + 1
+
     def cleanup(self) -> None:
         pass
 
+    @property
+    def finished(self) -> int:
+        """Number of data that has left the pipeline, including the dropped ones"""
+        return self.completed + self.dropped + self.absorbed
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.completed + self.dropped
+        return {
+            "completed": self.completed,
+            "dropped": self.dropped,
+            "absorbed": self.absorbed,
+            "drop_ratio": self.dropped / total if total > 0 else 0.0,
+            "dropped_by": dict(self.dropped_by),
+            "drop_reasons": dict(self.drop_reasons),
+            "latency_by_priority": {
+                priority: window.summary()
+                for priority, window in sorted(self.latency_by_priority.items())
+            },
+        }
+
     @property
     def name(self) -> str:
         return self._name
@@ -0,0 +1,42 @@
+from typing import Any, Callable, Dict, Iterable, Union
+
+from pystream.stage.stage import Stage
+
+
+class FlatMap(Stage):
+    """Stage that produces zero or more outputs from each input data, e.g.
+    splitting a frame into tiles, or accumulating several data into one.
+
+    Args:
+        stage (Union[Callable[[Any], Iterable[Any]], Stage]): function or stage
+            that takes the input data and returns an iterable (e.g. a list or a
+            generator) of the output data. Each output goes through the remaining
+            stages as a separate data.
+    """
+
+    def __init__(self, stage: Union[Callable[[Any], Iterable[Any]], Stage]) -> None:
+        self.stage = stage
+
+    def __call__(self, data: Any) -> Iterable[Any]:
+        return self.stage(data)
+
+    def setup(self) -> None:
+        if isinstance(self.stage, Stage):
+            self.stage.setup()
+
+    def warmup(self, sample: Any) -> None:
+        if isinstance(self.stage, Stage):
+            self.stage.warmup(sample)
+
+    def cleanup(self) -> None:
+        if isinstance(self.stage, Stage):
+            self.stage.cleanup()
+
+    def reset(self) -> None:
+        if isinstance(self.stage, Stage):
+            self.stage.reset()
+
+    def stats(self) -> Dict[str, Any]:
+        if isinstance(self.stage, Stage):
+            return self.stage.stats()
+        return {}
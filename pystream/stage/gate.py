@@ -0,0 +1,111 @@
+from typing import Any, Callable, Dict, Literal, Optional
+
+import numpy as np
+
+from pystream.data.pipeline_data import PipelineData
+from pystream.stage.stage import Stage
+from pystream.utils.hashing import hash_payload
+
+
+class ChangeGate(Stage):
+    """Stage that skips the rest of the pipeline for data that has not changed
+    since the last data that went through the pipeline. For such data, the output
+    of that last data is reused. If that last data is still in the pipeline, its
+    output is taken when the skipped data leaves the pipeline.
+
+    Args:
+        method (Literal["hash", "similarity"], optional): How to compare the data.
+            "hash" compares the content hash of the data. "similarity" compares a
+            downsampled view of NumPy array data, and considers it unchanged if the
+            mean absolute difference is at most `threshold`. Non-array data is
+            compared by hash. Defaults to "hash".
+        threshold (float, optional): Maximum mean absolute difference of unchanged
+            data for "similarity" method. Defaults to 0.0.
+        step (int, optional): Downsampling step applied to the first two axes of the
+            array for "similarity" method. Defaults to 4.
+        key (Optional[Callable[[Any], Any]], optional): Function that extracts the
+            part of the data to be compared, e.g. the image of a frame. By default,
+            the whole data is compared. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        method: Literal["hash", "similarity"] = "hash",
+        threshold: float = 0.0,
+        step: int = 4,
+        key: Optional[Callable[[Any], Any]] = None,
+    ) -> None:
+        self.method = method
+        self.threshold = threshold
+        self.step = step
+        self.key = key
+
+        # Whether to reuse the output of data that is still in the pipeline, which
+        # is turned off when a later stage may give up the data, see
+        # `check_change_gates`
+        self.reuse_in_flight = True
+        self._reference: Any = None
+        self._last_forwarded: Optional[PipelineData] = None
+        self.checked = 0
+        self.skipped = 0
+
+    def __call__(self, data: PipelineData) -> PipelineData:
+        self.checked += 1
+        signature = self._signature(
+            data.data if self.key is None else self.key(data.data)
+        )
+        last = self._last_forwarded
+        if last is not None and self._can_reuse(data, last):
+            if self._is_unchanged(signature):
+                self.skipped += 1
+                if last.profile.is_finished:
+                    data.data = last.data
+                else:
+                    # The output is taken when the data leaves the pipeline, which
+                    # is after the last data since it cannot overtake it
+                    data.reuse = last
+                data.bypass = True
+                return data
+        self._reference = signature
+        self._last_forwarded = data
+        return data
+
+    def _can_reuse(self, data: PipelineData, last: PipelineData) -> bool:
+        """Check whether the output of the last forwarded data can be reused,
+        i.e. it is not dropped, and it has finished or the data can follow it
+        without overtaking it in a priority queue"""
+        if last.is_dropped:
+            return False
+        if last.profile.is_finished:
+            return True
+        return self.reuse_in_flight and data.priority <= last.priority
+
+    def _signature(self, payload: Any) -> Any:
+        if self.method == "similarity" and isinstance(payload, np.ndarray):
+            index = tuple(slice(None, None, self.step) for _ in payload.shape[:2])
+            return payload[index].astype(np.float32)
+        return hash_payload(payload)
+
+    def _is_unchanged(self, signature: Any) -> bool:
+        reference = self._reference
+        if isinstance(signature, np.ndarray):
+            if not isinstance(reference, np.ndarray):
+                return False
+            if signature.shape != reference.shape:
+                return False
+            return float(np.mean(np.abs(signature - reference))) <= self.threshold
+        return signature == reference
+
+    def cleanup(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self._reference = None
+        self._last_forwarded = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "checked": self.checked,
+            "skipped": self.skipped,
+            "skip_ratio": self.skipped / self.checked if self.checked > 0 else 0.0,
+        }
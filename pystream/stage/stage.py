@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Callable, TypeVar, Union
+from typing import Any, Callable, Dict, TypeVar, Union
 
 
 T = TypeVar("T")
@@ -36,5 +36,39 @@ class Stage(ABC):
         during pipeline cleanup step"""
         pass
 
+    def setup(self) -> None:
+        """Setup method for the stage, e.g. loading models or building lookup
+        tables. This method will be invoked once when the pipeline is built, and
+        in parallel mode the stages are set up concurrently. Does nothing by
+        default."""
+        pass
+
+    def warmup(self, sample: Any) -> None:
+        """Warm-up method for the stage, invoked after `setup` with each warm-up
+        sample given to the pipeline, which is the input data of the pipeline.
+        Use it to run the first slow calls (e.g. lazy initialization) before
+        the real data comes. Does nothing by default.
+
+        Args:
+            sample (Any): the warm-up sample
+        """
+        pass
+
+    def reset(self) -> None:
+        """Reset method for the stage, which forgets the state kept from the
+        previous data, e.g. cached outputs, so that the next data is processed
+        as if it were the first. It is invoked between the benchmarks of
+        `Pipeline.autotune`. Does nothing by default."""
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Runtime statistics of the stage, e.g. counters. These are
+        reported by the `stats` method of the pipeline.
+
+        Returns:
+            Dict[str, Any]: the statistics, empty by default
+        """
+        return {}
+
 
 StageCallable = Union[Callable[[T], T], Stage]
@@ -16,3 +16,7 @@ class InvalidStageName(ValueError):
 
 class ProfilingError(ValueError):
     pass
+
+
+class InputExhausted(Exception):
+    pass
@@ -5,6 +5,11 @@ import pystream
 
 _PYSTREAM_DIR = str(Path(pystream.__file__).parent.absolute())
 _FINAL_STAGE_NAME = "FinalStage"
+_JOIN_STAGE_NAME = "Join"
+_ABSORBED_DROP_REASON = "absorbed"
+_DEADLINE_DROP_REASON = "deadline"
+_STALLED_DROP_REASON = "stalled"
+_REUSE_LOST_DROP_REASON = "reuse_lost"
 
 _PIPELINE_NAME_IN_PROFILE = "MainPipeline"
 _PROFILE_LEVEL_SEPARATOR = "__"
@@ -0,0 +1,63 @@
+import hashlib
+import pickle
+from typing import Any
+
+import numpy as np
+
+
+_DIGEST_SIZE = 16
+
+
+def _update_field(hasher: Any, tag: bytes, payload: Any) -> None:
+    """Hash a tagged field prefixed by its length, so that adjacent fields
+    cannot collide"""
+    hasher.update(tag + b"%d:" % memoryview(payload).nbytes)
+    hasher.update(payload)
+
+
+def _update_hash(hasher: Any, data: Any) -> None:
+    if isinstance(data, np.ndarray):
+        _update_field(hasher, b"ndarray", f"{data.dtype.str}{data.shape}".encode())
+        if data.dtype.hasobject:
+            _update_field(hasher, b"objects", pickle.dumps(data.tolist()))
+        else:
+            # Hash the array buffer directly, only non-contiguous arrays are copied
+            buffer = memoryview(np.ascontiguousarray(data)).cast("B")
+            _update_field(hasher, b"buffer", buffer)
+    elif isinstance(data, (bytes, bytearray, memoryview)):
+        _update_field(hasher, b"bytes", data)
+    elif isinstance(data, str):
+        _update_field(hasher, b"str", data.encode())
+    elif isinstance(data, (list, tuple)):
+        hasher.update(f"{type(data).__name__}{len(data)}:".encode())
+        for item in data:
+            _update_hash(hasher, item)
+    elif isinstance(data, dict):
+        # The items are sorted by the hash of their key, so that the hash does
+        # not depend on the insertion order
+        hasher.update(f"dict{len(data)}:".encode())
+        items = [(hash_payload(key), value) for key, value in data.items()]
+        items.sort(key=lambda item: item[0])
+        for key_hash, value in items:
+            hasher.update(bytes.fromhex(key_hash))
+            _update_hash(hasher, value)
+    else:
+        pickled = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        _update_field(hasher, b"pickle", pickled)
+
+
+def hash_payload(data: Any) -> str:
+    """Compute content hash of a payload. NumPy arrays are hashed from their
+    buffer without serialization, lists, tuples and dicts are hashed item by
+    item, and other objects are hashed from their pickled form. Dicts are hashed
+    regardless of their insertion order.
+
+    Args:
+        data (Any): the payload
+
+    Returns:
+        str: hex digest of the payload
+    """
+    hasher = hashlib.blake2b(digest_size=_DIGEST_SIZE)
+    _update_hash(hasher, data)
+    return hasher.hexdigest()
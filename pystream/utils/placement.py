@@ -0,0 +1,131 @@
+import ctypes
+import os
+import re
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pystream.utils.logger import LOGGER
+
+
+# Setter and getter of the thread count of the BLAS and OpenMP runtimes. OpenMP
+# and MKL limit the calling thread only, OpenBLAS limits the whole process.
+_THREAD_LIMIT_SYMBOLS: List[Tuple[str, str]] = [
+    ("omp_set_num_threads", "omp_get_max_threads"),
+    ("MKL_Set_Num_Threads_Local", "MKL_Get_Max_Threads"),
+    ("openblas_set_num_threads", "openblas_get_num_threads"),
+    ("openblas_set_num_threads64_", "openblas_get_num_threads64_"),
+    ("scipy_openblas_set_num_threads", "scipy_openblas_get_num_threads"),
+    ("scipy_openblas_set_num_threads64_", "scipy_openblas_get_num_threads64_"),
+]
+_THREAD_POOL_LIBRARY = re.compile(r"(blas|omp|mkl)", re.IGNORECASE)
+# The affinity and the niceness are set per native thread, which is only
+# addressable by its ID on Linux
+_PER_THREAD_SCHEDULING = sys.platform.startswith("linux")
+
+
+def _loaded_thread_pool_libraries() -> List[str]:
+    """Get the paths of the loaded shared libraries that may run a BLAS or
+    OpenMP thread pool"""
+    try:
+        with open("/proc/self/maps") as maps:
+            paths = {line.split()[-1] for line in maps if ".so" in line}
+    except OSError:
+        return []
+    return sorted(
+        path for path in paths if _THREAD_POOL_LIBRARY.search(os.path.basename(path))
+    )
+
+
+def limit_pool_threads(num_threads: int) -> Dict[str, int]:
+    """Limit the thread count of the loaded BLAS and OpenMP runtimes. OpenMP and
+    MKL only limit the calling thread, while OpenBLAS limits the whole process.
+
+    Args:
+        num_threads (int): the maximum number of threads
+
+    Returns:
+        Dict[str, int]: the thread count of each runtime after the limit, keyed by
+        library file name
+    """
+    out = {}
+    for path in _loaded_thread_pool_libraries():
+        try:
+            library = ctypes.CDLL(path)
+        except OSError:
+            continue
+        for setter, getter in _THREAD_LIMIT_SYMBOLS:
+            if not hasattr(library, setter):
+                continue
+            getattr(library, setter)(ctypes.c_int(num_threads))
+            out[os.path.basename(path)] = int(getattr(library, getter)())
+            break
+    return out
+
+
+def apply_thread_placement(
+    cpus: Optional[Sequence[int]] = None,
+    nice: Optional[int] = None,
+    blas_threads: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Pin the calling thread to the CPUs, set its niceness and limit the thread
+    pools it calls into. The settings that are not supported or not permitted
+    are skipped with a warning.
+
+    Args:
+        cpus (Optional[Sequence[int]], optional): the CPUs to run on. If None, the
+            affinity is unchanged. Defaults to None.
+        nice (Optional[int], optional): the niceness. Lowering it usually requires
+            privileges. If None, the niceness is unchanged. Defaults to None.
+        blas_threads (Optional[int], optional): the thread count of the BLAS and
+            OpenMP runtimes, see `limit_pool_threads`. If None, the thread counts
+            are unchanged. Defaults to None.
+
+    Returns:
+        Dict[str, Any]: the effective placement of the thread, see
+        `get_thread_placement`, and the thread counts of the runtimes, see
+        `limit_pool_threads`, as "blas_threads" (None if not limited)
+    """
+    native_id = threading.get_native_id()
+    if (cpus is not None or nice is not None) and not _PER_THREAD_SCHEDULING:
+        LOGGER.warning("CPU affinity and niceness of a thread are only set on Linux")
+        cpus, nice = None, None
+    if cpus is not None:
+        try:
+            os.sched_setaffinity(native_id, cpus)
+        except (OSError, ValueError) as e:
+            LOGGER.warning(f"Cannot set the CPU affinity to {list(cpus)}: {e!r}")
+    if nice is not None:
+        try:
+            os.setpriority(os.PRIO_PROCESS, native_id, nice)
+        except OSError as e:
+            LOGGER.warning(f"Cannot set the niceness to {nice}: {e!r}")
+    placement = get_thread_placement(native_id)
+    placement["blas_threads"] = (
+        limit_pool_threads(blas_threads) if blas_threads is not None else None
+    )
+    return placement
+
+
+def get_thread_placement(native_id: Optional[int] = None) -> Dict[str, Any]:
+    """Get the placement of a thread
+
+    Args:
+        native_id (Optional[int], optional): the native thread ID. If None, the
+            calling thread is used. Defaults to None.
+
+    Returns:
+        Dict[str, Any]: the native thread ID, the CPUs it may run on and its
+        niceness. The values that cannot be read on this platform are None.
+    """
+    if native_id is None:
+        native_id = threading.get_native_id()
+    placement: Dict[str, Any] = {"native_id": native_id, "cpus": None, "nice": None}
+    if not _PER_THREAD_SCHEDULING:
+        return placement
+    try:
+        placement["cpus"] = sorted(os.sched_getaffinity(native_id))
+        placement["nice"] = os.getpriority(os.PRIO_PROCESS, native_id)
+    except OSError:
+        pass
+    return placement
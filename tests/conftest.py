@@ -22,3 +22,18 @@ class DummyStage(Stage):
 @pytest.fixture
 def dummy_stage():
     return DummyStage
+
+
+class SetupStage(DummyStage):
+    def __init__(self, val=None, wait=0.0, setup_wait=0.3):
+        super().__init__(val, wait)
+        self.setup_wait = setup_wait
+        self.is_setup = False
+        self.warmup_samples = []
+
+    def setup(self) -> None:
+        time.sleep(self.setup_wait)
+        self.is_setup = True
+
+    def warmup(self, sample) -> None:
+        self.warmup_samples.append(sample)
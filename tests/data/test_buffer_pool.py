@@ -0,0 +1,108 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from pystream.data.buffer_pool import BufferPool, borrowing_for
+from pystream.data.pipeline_data import DROP, PipelineData
+from pystream.stage.container import StageContainer
+from pystream.stage.final_stage import FinalStage
+from pystream.utils.general import _PIPELINE_NAME_IN_PROFILE
+
+
+def test_borrow_release():
+    pool = BufferPool()
+    buffer = pool.borrow((4, 4), np.float32)
+    assert buffer.shape == (4, 4)
+    assert buffer.dtype == np.float32
+    assert pool.stats()["in_use_bytes"] == 64
+    pool.release(buffer)
+    assert pool.borrow((4, 4), np.float32) is buffer
+    assert pool.borrow((4, 4), np.float64) is not buffer
+    stats = pool.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["hit_ratio"] == 1 / 3
+    assert stats["footprint_bytes"] == 64 + 128
+    pool.clear()
+    assert pool.stats()["idle_bytes"] == 0
+
+
+def test_max_idle_bytes():
+    pool = BufferPool(max_idle_bytes=100)
+    buffers = [pool.borrow(8) for _ in range(2)]
+    for buffer in buffers:
+        pool.release(buffer)
+    stats = pool.stats()
+    assert stats["idle_bytes"] == 64
+    assert stats["in_use_bytes"] == 0
+
+
+def test_borrowing_for():
+    pool = BufferPool()
+    data = PipelineData()
+    with borrowing_for(data):
+        buffer = pool.borrow(2)
+    pool.borrow(2)
+    assert data.buffers == [(pool, buffer)]
+
+
+def run_through_pipeline(pool, stage):
+    container = StageContainer(stage, "Stage")
+    final_stage = FinalStage(None)
+    data = PipelineData(data=1)
+    data.profile.tick_start(_PIPELINE_NAME_IN_PROFILE)
+    return final_stage(container(data))
+
+
+def test_recycle_in_pipeline():
+    pool = BufferPool()
+
+    def stage(x):
+        temp = pool.borrow(16)
+        temp[:] = x
+        return float(temp.sum())
+
+    for _ in range(3):
+        assert run_through_pipeline(pool, stage).data == 16.0
+    stats = pool.stats()
+    assert stats["hits"] == 2
+    assert stats["in_use_bytes"] == 0
+
+
+def test_recycle_dropped():
+    pool = BufferPool()
+    result = run_through_pipeline(pool, lambda x: pool.borrow(16) is None or DROP)
+    assert result.is_dropped
+    assert pool.stats()["idle_bytes"] == 128
+
+
+def test_output_buffer_detached():
+    pool = BufferPool()
+    result = run_through_pipeline(pool, lambda x: pool.borrow(16))
+    assert isinstance(result.data, np.ndarray)
+    stats = pool.stats()
+    assert stats["in_use_bytes"] == 0
+    assert stats["idle_bytes"] == 0
+
+
+@dataclass
+class Detection:
+    mask: np.ndarray
+
+
+def test_nested_output_buffer_detached():
+    pool = BufferPool()
+    outputs = [
+        lambda x: (pool.borrow(16), 1),
+        lambda x: {"frame": [pool.borrow(16)]},
+        lambda x: Detection(mask=pool.borrow(16)),
+        lambda x: pool.borrow(16)[:4],
+    ]
+    for output in outputs:
+        run_through_pipeline(pool, output)
+        # The buffer is still used by the output, so it is not recycled
+        assert pool.stats()["in_use_bytes"] == 0
+        assert pool.stats()["idle_bytes"] == 0
+    # A buffer that is not in the output is recycled
+    run_through_pipeline(pool, lambda x: (pool.borrow(16) is None, 1))
+    assert pool.stats()["idle_bytes"] == 128
@@ -0,0 +1,218 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+
+import numpy as np
+import pytest
+
+from pystream import Pipeline
+from pystream.functional import cached, disk_cached
+from pystream.functional.cache import CachedStage, DiskCachedStage
+from tests.conftest import DummyStage
+
+
+WAIT = 0.1
+
+
+class CountingStage:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, data):
+        self.calls += 1
+        time.sleep(WAIT)
+        return data * 2
+
+
+def make_array(n):
+    return np.full(1000, n, dtype=np.float64)
+
+
+def fill_disk_cache(directory, values):
+    stage = disk_cached(make_array, directory)
+    return [float(stage(v)[0]) for v in values]
+
+
+class TestCachedStage:
+    @pytest.fixture(autouse=True)
+    def _create_stage(self):
+        self.counter = CountingStage()
+
+    def test_hit_and_miss(self):
+        stage = cached(self.counter)
+        assert isinstance(stage, CachedStage)
+        assert stage(2) == 4
+        assert stage(2) == 4
+        assert stage(3) == 6
+        assert self.counter.calls == 2
+        stats = stage.stats()
+        assert stats["cache_hits"] == 1
+        assert stats["cache_misses"] == 2
+        assert stats["cache_size"] == 2
+        assert stats["cache_saved_time"] == pytest.approx(WAIT, rel=0.5)
+
+    def test_numpy_payload(self):
+        stage = cached(self.counter)
+        stage(np.ones(10))
+        ret = stage(np.ones(10))
+        np.testing.assert_array_equal(ret, np.ones(10) * 2)
+        assert self.counter.calls == 1
+
+    def test_lru_eviction(self):
+        stage = cached(self.counter, maxsize=2)
+        stage(1)
+        stage(2)
+        stage(1)
+        stage(3)  # evicts 2
+        stage(1)
+        assert self.counter.calls == 3
+        stage(2)
+        assert self.counter.calls == 4
+
+    def test_ttl(self):
+        stage = cached(self.counter, ttl=0.2)
+        stage(1)
+        stage(1)
+        assert self.counter.calls == 1
+        time.sleep(0.3)
+        stage(1)
+        assert self.counter.calls == 2
+
+    def test_custom_key(self):
+        stage = cached(self.counter, key=lambda x: x % 2)
+        assert stage(1) == 2
+        assert stage(3) == 2
+        assert self.counter.calls == 1
+
+    def test_concurrent_miss(self):
+        stage = cached(self.counter)
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            results = list(executor.map(stage, [1] * 5))
+        assert results == [2] * 5
+        assert self.counter.calls == 1
+        assert stage.stats()["cache_hits"] == 4
+
+    def test_exception(self):
+        def _failing(x):
+            raise RuntimeError("failed")
+
+        stage = cached(_failing)
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                stage(1)
+        assert stage.stats()["cache_misses"] == 0
+
+    def test_cleanup_and_name(self):
+        dummy = DummyStage(val=1, wait=0)
+        dummy.name = "Dummy"
+        stage = cached(dummy)
+        assert stage.name == "Dummy"
+        stage.cleanup()
+        assert dummy.val is None
+        assert stage.stats()["cache_size"] == 0
+
+    def test_pipeline_stats(self):
+        pipeline = Pipeline()
+        pipeline.add(cached(self.counter), "Cached")
+        pipeline.add(lambda x: x + 1, "Plain")
+        pipeline.serialize()
+        for _ in range(3):
+            pipeline.forward(1)
+        stats = pipeline.stats()
+        assert list(stats.keys()) == ["MainPipeline", "MainPipeline__Cached"]
+        assert stats["MainPipeline"]["completed"] == 3
+        assert stats["MainPipeline__Cached"]["cache_hits"] == 2
+
+
+class TestDiskCachedStage:
+    @pytest.fixture(autouse=True)
+    def _create_stage(self, tmp_path: Path):
+        self.directory = str(tmp_path / "cache")
+        self.counter = CountingStage()
+
+    def test_array_hit_is_memory_mapped(self):
+        stage = disk_cached(self.counter, self.directory)
+        assert isinstance(stage, DiskCachedStage)
+        data = np.arange(10)
+        first = stage(data)
+        second = stage(data.copy())
+        assert self.counter.calls == 1
+        assert isinstance(second, np.memmap)
+        assert not second.flags.writeable
+        np.testing.assert_array_equal(first, second)
+        assert stage.stats()["disk_cache_hits"] == 1
+
+    def test_object_output(self):
+        stage = disk_cached(self.counter, self.directory)
+        assert stage("ab") == "abab"
+        assert stage("ab") == "abab"
+        assert self.counter.calls == 1
+
+    def test_adjacent_fields(self):
+        stage = disk_cached(self.counter, self.directory)
+        assert stage(["abstr", "c"]) == ["abstr", "c", "abstr", "c"]
+        assert stage(["ab", "strc"]) == ["ab", "strc", "ab", "strc"]
+        assert self.counter.calls == 2
+
+    def test_persistence(self):
+        disk_cached(self.counter, self.directory, namespace="Counter")(3)
+        stage = disk_cached(CountingStage(), self.directory, namespace="Counter")
+        assert stage(3) == 6
+        assert stage.stats()["disk_cache_hits"] == 1
+        other = disk_cached(self.counter, self.directory, namespace="Other")
+        other(3)
+        assert other.stats()["disk_cache_misses"] == 1
+
+    def test_default_namespace(self):
+        double = disk_cached(lambda x: x * 2, self.directory)
+        triple = disk_cached(lambda x: x * 3, self.directory)
+        assert double(2) == 4
+        # Lambdas share their name but not their cache entries
+        assert triple(2) == 6
+
+        def scale(factor):
+            return lambda x: x * factor
+
+        assert disk_cached(scale(2), self.directory)(3) == 6
+        assert disk_cached(scale(3), self.directory)(3) == 9
+        repeated = disk_cached(scale(3), self.directory)
+        assert repeated(3) == 9
+        assert repeated.stats()["disk_cache_hits"] == 1
+
+        first = disk_cached(CountingStage(), self.directory)
+        changed = CountingStage()
+        changed.calls = 1
+        assert disk_cached(CountingStage(), self.directory).namespace == first.namespace
+        assert disk_cached(changed, self.directory).namespace != first.namespace
+
+        locked = CountingStage()
+        locked.lock = Lock()
+        with pytest.raises(ValueError):
+            disk_cached(locked, self.directory)
+        assert disk_cached(locked, self.directory, namespace="Locked")(1) == 2
+
+    def test_eviction(self):
+        stage = disk_cached(self.counter, self.directory, max_bytes=20000)
+        for i in range(5):
+            stage(np.full(1000, i, dtype=np.float64))
+            time.sleep(0.01)
+        stats = stage.stats()
+        assert stats["disk_cache_bytes"] <= 20000
+        assert stats["disk_cache_evictions"] > 0
+        # The most recent entry is kept
+        stage(np.full(1000, 4, dtype=np.float64))
+        assert stage.stats()["disk_cache_hits"] == 1
+
+    def test_multi_process(self):
+        with ProcessPoolExecutor(max_workers=3) as executor:
+            jobs = [executor.submit(fill_disk_cache, self.directory, range(5))]
+            jobs += [executor.submit(fill_disk_cache, self.directory, range(5))]
+            results = [job.result() for job in jobs]
+        assert results == [[float(i) for i in range(5)]] * 2
+        files = [f for f in os.listdir(self.directory) if not f.startswith(".tmp")]
+        assert len(files) == 5
+        stage = disk_cached(make_array, self.directory)
+        assert stage(2)[0] == 2
+        assert stage.stats()["disk_cache_hits"] == 1
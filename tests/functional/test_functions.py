@@ -1,9 +1,27 @@
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import time
 
+import numpy as np
 import pytest
 
-from pystream.functional import func_parallel_thread, func_serial
+from pystream import Pipeline
+
+from pystream.functional import (
+    func_accumulate,
+    func_gather_thread,
+    func_map_chunks,
+    func_parallel_process,
+    func_parallel_thread,
+    func_serial,
+)
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+from pystream.functional.functions import (
+    _attach_shared_memory,
+    combine_chunks,
+    split_chunks,
+)
 
 
 FUNCTION_NUM = 5
@@ -19,6 +37,36 @@ def get_dummy_function(val: int):
     return _func
 
 
+def get_dummy_returning_function(val: int):
+    def _func(data: list):
+        time.sleep(FUNCTION_WAIT)
+        return data + [val]
+
+    return _func
+
+
+def sleep_and_sum(data):
+    time.sleep(FUNCTION_WAIT)
+    return np.sum(data)
+
+
+def sleep_and_double(data):
+    time.sleep(FUNCTION_WAIT)
+    return data * 2
+
+
+def sum_values(data):
+    return {key: np.sum(value) for key, value in data.items() if key != "c"}
+
+
+def view_of_input(data):
+    return data[:2]
+
+
+def square_items(chunk):
+    return [item**2 for item in chunk]
+
+
 @pytest.fixture
 def dummy_functions():
     funcs = []
@@ -58,3 +106,158 @@ def test_func_serial(dummy_functions):
     delta_time = time.perf_counter() - start_time
     assert ret == [i for i in range(FUNCTION_NUM)]
     assert delta_time == pytest.approx(FUNCTION_WAIT * FUNCTION_NUM, rel=0.1)
+
+
+def test_func_gather_thread():
+    funcs = [get_dummy_returning_function(i) for i in range(FUNCTION_NUM)]
+    gather_func = func_gather_thread(funcs)
+    data = []
+    start_time = time.perf_counter()
+    ret = gather_func(data)
+    delta_time = time.perf_counter() - start_time
+    assert ret == tuple([i] for i in range(FUNCTION_NUM))
+    assert data == []
+    assert delta_time == pytest.approx(FUNCTION_WAIT, rel=0.1)
+
+
+def test_func_gather_thread_dict():
+    funcs = {f"f{i}": get_dummy_returning_function(i) for i in range(FUNCTION_NUM)}
+    ret = func_gather_thread(funcs)([])
+    assert ret == {f"f{i}": [i] for i in range(FUNCTION_NUM)}
+
+
+class TestFuncParallelProcess:
+    @pytest.fixture(autouse=True)
+    def _create_executor(self):
+        self.executor = ProcessPoolExecutor(max_workers=FUNCTION_NUM)
+        # Start the worker processes before measuring the time
+        list(self.executor.map(abs, range(FUNCTION_NUM)))
+        yield
+        self.executor.shutdown()
+
+    def test_parallel(self):
+        funcs = [sleep_and_sum for _ in range(FUNCTION_NUM)]
+        parallel_func = func_parallel_process(funcs, executor=self.executor)
+        start_time = time.perf_counter()
+        ret = parallel_func(np.arange(10))
+        delta_time = time.perf_counter() - start_time
+        assert ret == tuple(45 for _ in range(FUNCTION_NUM))
+        assert delta_time < FUNCTION_WAIT * 2
+
+    def test_shared_memory(self):
+        data = np.arange(1000, dtype=np.float64)
+        funcs = {
+            "sum": sleep_and_sum,
+            "double": sleep_and_double,
+            "view": view_of_input,
+        }
+        for threshold in [None, 0]:
+            parallel_func = func_parallel_process(
+                funcs, executor=self.executor, shared_memory_threshold=threshold
+            )
+            ret = parallel_func(data)
+            assert ret["sum"] == np.sum(data)
+            np.testing.assert_array_equal(ret["double"], data * 2)
+            np.testing.assert_array_equal(ret["view"], data[:2])
+
+    def test_shared_memory_dict(self):
+        data = {"a": np.ones(100), "b": np.ones(10), "c": "text"}
+        parallel_func = func_parallel_process(
+            [sum_values], executor=self.executor, shared_memory_threshold=100
+        )
+        ret = parallel_func(data)
+        assert ret == ({"a": 100, "b": 10},)
+
+
+def test_attach_shared_memory(monkeypatch):
+    registered = []
+    shm = SharedMemory(create=True, size=16)
+    monkeypatch.setattr(
+        resource_tracker, "register", lambda name, rtype: registered.append(name)
+    )
+    try:
+        attached = _attach_shared_memory(shm.name)
+        # The attached block is not tracked, so a worker does not unlink it
+        assert registered == []
+        attached.close()
+        SharedMemory(name=shm.name).close()
+        assert len(registered) == 1
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_split_and_combine_chunks():
+    data = np.arange(10)
+    chunks = split_chunks(data, 3)
+    assert [len(c) for c in chunks] == [4, 3, 3]
+    assert all(np.shares_memory(c, data) for c in chunks)
+    np.testing.assert_array_equal(combine_chunks(chunks), data)
+
+    data = list(range(10))
+    chunks = split_chunks(data, 4)
+    assert sum(len(c) for c in chunks) == 10
+    assert combine_chunks(chunks) == data
+
+    data = {"points": np.zeros((10, 3)), "ids": np.arange(10)}
+    chunks = split_chunks(data, 2)
+    assert chunks[0]["points"].shape == (5, 3)
+    combined = combine_chunks(chunks)
+    np.testing.assert_array_equal(combined["ids"], data["ids"])
+
+    with pytest.raises(TypeError):
+        split_chunks("text", 2)
+
+
+class TestFuncMapChunks:
+    def test_array(self):
+        def _sleep_and_double(chunk):
+            time.sleep(FUNCTION_WAIT)
+            return chunk * 2
+
+        map_func = func_map_chunks(_sleep_and_double, n_chunks=FUNCTION_NUM)
+        data = np.arange(100)
+        start_time = time.perf_counter()
+        ret = map_func(data)
+        delta_time = time.perf_counter() - start_time
+        np.testing.assert_array_equal(ret, data * 2)
+        assert delta_time == pytest.approx(FUNCTION_WAIT, rel=0.1)
+
+    def test_inplace(self):
+        def _double_inplace(chunk):
+            chunk *= 2
+            return chunk
+
+        data = np.arange(100)
+        ret = func_map_chunks(_double_inplace, n_chunks=4)(data)
+        assert ret is data
+        np.testing.assert_array_equal(ret, np.arange(100) * 2)
+
+    def test_custom_split_and_combine(self):
+        map_func = func_map_chunks(
+            sum,
+            n_chunks=2,
+            split=lambda x, n: [x[: len(x) // n], x[len(x) // n :]],
+            combine=sum,
+        )
+        assert map_func(list(range(10))) == 45
+
+    def test_process_executor(self):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            map_func = func_map_chunks(square_items, n_chunks=2, executor=executor)
+            assert map_func([1, 2, 3]) == [1, 4, 9]
+
+    def test_as_stage(self):
+        pipeline = Pipeline()
+        pipeline.add(func_map_chunks(lambda c: c + 1, n_chunks=3))
+        pipeline.add(func_serial([np.sum]))
+        pipeline.serialize()
+        pipeline.forward(np.zeros(10))
+        assert pipeline.get_results() == 10
+
+
+def test_func_accumulate():
+    accumulate = func_accumulate(3, combine=sum)
+    assert [accumulate(x) for x in range(7)] == [[], [], [3], [], [], [12], []]
+    accumulate.reset()
+    assert [accumulate(x) for x in range(3)] == [[], [], [3]]
@@ -1,20 +1,27 @@
+import os
 from queue import Queue
+import sys
 from threading import Event
 import time
 
 import pytest
 
-from pystream.data.pipeline_data import PipelineData
+from pystream.data.pipeline_data import DROP, PipelineData
+from pystream.data.stage_data import StageOptions
 from pystream.pipeline.parallel_thread_pipeline.pipeline import (
     StageLinks,
     ParallelThreadPipeline,
     StageThread,
     send_output,
 )
+from pystream.pipeline.utils.admission import MaxInFlight, TokenBucket
 from pystream.pipeline.utils.profiler import ProfilerHandler
-from pystream.stage.container import StageContainer
-from pystream.utils.errors import PipelineTerminated
+from pystream.pipeline.utils.watchdog import StageWatchdog
+from pystream.stage.branch import Branches
+from pystream.stage.container import find_stage, StageContainer
+from pystream.utils.errors import PipelineInitiationError, PipelineTerminated
 from pystream.utils.general import _PIPELINE_NAME_IN_PROFILE, _PROFILE_LEVEL_SEPARATOR
+from tests.conftest import DummyStage, SetupStage
 
 
 def test_send_output():
@@ -108,6 +115,31 @@ class TestStageThread:
         assert self.output_queue.qsize() == 1
         assert self.output_queue.get(timeout=1).data == ["hi again", "stage"]
 
+    def test_deadline(self):
+        self.stage_thread.deadline = 0.5
+        self.stage_thread.expected_duration = 0.2
+        data = PipelineData(data=[])
+        assert not self.stage_thread.is_expired(data)
+        data.profile.tick_start(_PIPELINE_NAME_IN_PROFILE)
+        assert not self.stage_thread.is_expired(data)
+        data.profile.data.started -= 0.4
+        assert self.stage_thread.is_expired(data)
+        # The estimate decays when it alone makes the data miss the deadline
+        assert self.stage_thread.expected_duration == pytest.approx(0.18)
+        data.profile.data.started -= 0.2
+        assert self.stage_thread.is_expired(data)
+        assert self.stage_thread.expected_duration == pytest.approx(0.18)
+
+        self.stage_thread.start()
+        self.input_queue.put(data, timeout=1)
+        ret = self.output_queue.get(timeout=1)
+        assert ret.drop_reason == "deadline"
+        assert ret.data == []
+
+        self.stage_thread.expected_duration = 0.2
+        self.stage_thread.update_duration(1.2)
+        assert self.stage_thread.expected_duration == pytest.approx(0.3)
+
     def test_process_cleanup(self):
         self.stage_thread.start()
         time.sleep(0.1)
@@ -177,3 +209,608 @@ class TestParallelThreadPipeline:
         self.pipeline.cleanup()
         with pytest.raises(PipelineTerminated):
             self.pipeline.forward(PipelineData(data=[]))
+
+
+class CopyStage(DummyStage):
+    def __call__(self, data: list) -> list:
+        time.sleep(self.wait)
+        return data + [self.val]
+
+
+def test_drop():
+    pipeline = ParallelThreadPipeline(
+        [lambda x: DROP if x < 0 else x, lambda x: x * 2],
+        ["Filter", "Double"],
+        block_output=True,
+        output_timeout=1,
+    )
+    results = []
+    for value in [1, -1, 2]:
+        pipeline.forward(PipelineData(data=value))
+        results.append(pipeline.get_results().data)
+    assert results == [2, None, 4]
+    assert pipeline.stats()["dropped_by"] == {"Filter": 1}
+    pipeline.cleanup()
+
+
+def test_latency_budget():
+    pipeline = ParallelThreadPipeline(
+        [DummyStage(val=i, wait=0.1) for i in range(2)],
+        ["Stage1", "Stage2"],
+        latency_budget=0.25,
+    )
+    for _ in range(10):
+        data = PipelineData(data=[])
+        data.profile.tick_start(_PIPELINE_NAME_IN_PROFILE)
+        pipeline.forward(data)
+    time.sleep(1)
+    stats = pipeline.stats()
+    pipeline.cleanup()
+    assert stats["completed"] > 0
+    assert stats["dropped"] > 0
+    assert stats["drop_reasons"] == {"deadline": stats["dropped"]}
+    assert stats["completed"] + stats["dropped"] == 10
+
+
+@pytest.mark.parametrize("budget", [True, False])
+def test_branch_deadline(budget):
+    branches = Branches(
+        {
+            "A": [(lambda x: time.sleep(0.2) or x, "Slow"), (lambda x: x, "Late")],
+            "B": (lambda x: x, "Fast"),
+        },
+        join=lambda outputs: outputs["A"] + outputs["B"],
+    )
+    pipeline = ParallelThreadPipeline(
+        [branches],
+        ["Branches"],
+        options=[StageOptions(deadline=None if budget else 0.1)],
+        latency_budget=0.1 if budget else None,
+    )
+    data = PipelineData(data=1)
+    data.profile.tick_start(_PIPELINE_NAME_IN_PROFILE)
+    pipeline.forward(data)
+    assert pipeline.drain(timeout=2)
+    stats = pipeline.stats()
+    pipeline.cleanup()
+    # The branch data keeps the age of the input data
+    assert stats["dropped_by"] == {"Branches__A__Late": 1}
+    assert stats["drop_reasons"] == {"deadline": 1}
+
+
+def spike_on_negative(x):
+    time.sleep(1.0 if x < 0 else 0.01)
+    return x
+
+
+def test_deadline_recovery():
+    pipeline = ParallelThreadPipeline(
+        [spike_on_negative],
+        ["Stage"],
+        queue_size=100,
+        options=[StageOptions(deadline=0.1)],
+    )
+    for value in [1, 2, -1] + list(range(3, 40)):
+        data = PipelineData(data=value)
+        data.profile.tick_start(_PIPELINE_NAME_IN_PROFILE)
+        pipeline.forward(data)
+        time.sleep(0.02)
+    completed_before = pipeline.stats()["completed"]
+    time.sleep(0.3)
+    for value in range(40, 60):
+        data = PipelineData(data=value)
+        data.profile.tick_start(_PIPELINE_NAME_IN_PROFILE)
+        pipeline.forward(data)
+        time.sleep(0.02)
+    assert pipeline.drain(timeout=1)
+    stats = pipeline.stats()
+    pipeline.cleanup()
+    # The data queued behind the spike is dropped, but the stage recovers
+    assert stats["drop_reasons"]["deadline"] > 0
+    assert stats["completed"] - completed_before >= 15
+
+
+def test_concurrent_setup():
+    stages = [SetupStage(val=i, setup_wait=0.3) for i in range(4)]
+    pipeline = ParallelThreadPipeline(
+        stages, [f"Stage{i}" for i in range(4)], warmup_samples=[["sample"]]
+    )
+    assert all(stage.is_setup for stage in stages)
+    assert all(stage.warmup_samples == [["sample"]] for stage in stages)
+    # The stages are set up concurrently
+    assert 0.3 <= pipeline.ready_time < 0.9
+    pipeline.cleanup()
+
+
+def test_wait_ready():
+    stage = SetupStage(val=0, setup_wait=0.5)
+    pipeline = ParallelThreadPipeline(
+        [stage], ["Stage"], block_output=True, wait_ready=False
+    )
+    assert not pipeline.wait_ready(timeout=0)
+    assert pipeline.forward(PipelineData(data=[]))
+    assert pipeline.wait_ready(timeout=2)
+    assert pipeline.get_results().data == [0]
+    pipeline.cleanup()
+
+
+def test_pause_resume():
+    pipeline = ParallelThreadPipeline(
+        [DummyStage(val=0, wait=0)], ["Stage"], block_output=True, output_timeout=0.3
+    )
+    threads = list(pipeline.stage_threads)
+    pipeline.pause()
+    assert pipeline.is_paused
+    assert pipeline.forward(PipelineData(data=[]))
+    assert pipeline.get_results().data is None
+    pipeline.resume()
+    assert not pipeline.is_paused
+    assert pipeline.get_results().data == [0]
+    assert pipeline.stage_threads == threads
+    assert all(thread.is_alive() for thread in threads)
+    pipeline.cleanup()
+
+
+def test_reconfigure():
+    pipeline = ParallelThreadPipeline(
+        [DummyStage(val=0, wait=0)], ["Stage"], block_input=False
+    )
+    pipeline.pause()
+    # The paused stage holds one data, and the queue holds another one
+    assert pipeline.forward(PipelineData(data=[]))
+    time.sleep(0.1)
+    results = [pipeline.forward(PipelineData(data=[])) for _ in range(2)]
+    assert results == [True, False]
+    pipeline.reconfigure(queue_size=3, stage_output_timeout=1)
+    results = [pipeline.forward(PipelineData(data=[])) for _ in range(3)]
+    assert results == [True, True, False]
+    assert pipeline.queue_size == 3
+    assert all(thread.send_output_timeout == 1 for thread in pipeline.stage_threads)
+    pipeline.reconfigure(block_input=True, input_timeout=0.05)
+    start = time.perf_counter()
+    assert not pipeline.forward(PipelineData(data=[]))
+    assert time.perf_counter() - start >= 0.05
+    pipeline.cleanup()
+
+
+def test_drain():
+    received = []
+
+    class ListSink:
+        def put(self, item):
+            received.append(item)
+
+    pipeline = ParallelThreadPipeline(
+        [DummyStage(val=i, wait=0.1) for i in range(3)],
+        ["Stage1", "Stage2", "Stage3"],
+        sinks=[ListSink()],
+    )
+    for _ in range(4):
+        pipeline.forward(PipelineData(data=[]))
+    assert not pipeline.drain(timeout=0.05)
+    assert not pipeline.forward(PipelineData(data=[]))
+    start = time.perf_counter()
+    assert pipeline.drain()
+    assert time.perf_counter() - start < 1
+    assert received == [[0, 1, 2]] * 4
+    assert pipeline.stats()["completed"] == 4
+    start = time.perf_counter()
+    pipeline.cleanup()
+    # The empty pipeline is stopped without the cleanup waiting time
+    assert time.perf_counter() - start < 1.5
+
+
+def fail_on_negative(x):
+    if x < 0:
+        raise ValueError("Negative data")
+    return x
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_drain_broken():
+    pipeline = ParallelThreadPipeline(
+        [lambda x: x, lambda x: time.sleep(0.2) or x], ["Fast", "Slow"]
+    )
+    # The fast stage cannot wait for the full queue of the slow one
+    pipeline.stage_threads[0].all_out = False
+    for value in range(4):
+        pipeline.forward(PipelineData(data=value))
+        time.sleep(0.02)
+    # The lost data is not waited for
+    assert pipeline.drain(timeout=2)
+    assert pipeline.stage_threads[0].lost > 0
+    pipeline.cleanup()
+
+    pipeline = ParallelThreadPipeline([lambda x: time.sleep(0.5) or x], ["Slow"])
+    pipeline.forward(PipelineData(data=1))
+    pipeline.stopper.set()
+    start = time.perf_counter()
+    assert not pipeline.drain()
+    assert time.perf_counter() - start < 0.3
+    pipeline.cleanup()
+
+    pipeline = ParallelThreadPipeline([fail_on_negative], ["Stage"])
+    pipeline.forward(PipelineData(data=-1))
+    start = time.perf_counter()
+    assert not pipeline.drain()
+    assert time.perf_counter() - start < 0.5
+    pipeline.cleanup()
+
+
+def test_flatten():
+    received = []
+
+    class ListSink:
+        def put(self, item):
+            received.append(item)
+
+    child = ParallelThreadPipeline(
+        [lambda x: DROP if x[0] < 0 else x, DummyStage(val=0, wait=0.05)],
+        ["Filter", "Delay"],
+    )
+    pipeline = ParallelThreadPipeline(
+        [lambda x: [x], child, lambda x: x + ["end"]],
+        ["Wrap", "Child", "End"],
+        sinks=[ListSink()],
+        flatten=True,
+    )
+    # The child pipeline is run by the threads of the parent
+    assert not any(thread.is_alive() for thread in child.stage_threads)
+    names = [thread.name for thread in pipeline.stage_threads]
+    assert names == ["Wrap", "Child_Entry", "Filter", "Delay", "Child_Exit"] + names[5:]
+    start = time.perf_counter()
+    for value in [1, 2, 3, 4, 5, 6]:
+        data = PipelineData(data=value)
+        data.profile.tick_start(_PIPELINE_NAME_IN_PROFILE)
+        pipeline.forward(data)
+    assert pipeline.drain(timeout=2)
+    # The data streams through the child stages
+    assert time.perf_counter() - start < 0.6
+    assert received == [[value, 0, "end"] for value in [1, 2, 3, 4, 5, 6]]
+    assert child.stats()["completed"] == 6
+    pipeline.cleanup()
+
+
+def test_fuse():
+    profiler = ProfilerHandler()
+    pipeline = ParallelThreadPipeline(
+        [
+            DummyStage(val=1, wait=0),
+            DummyStage(val=2, wait=0),
+            DummyStage(val=3, wait=0),
+            DummyStage(val=4, wait=0.05),
+            DummyStage(val=5, wait=0),
+        ],
+        ["First", "Second", "Third", "Slow", "Last"],
+        profiler_handler=profiler,
+        options=[
+            StageOptions(cost=0.0004),
+            StageOptions(cost=0.0004),
+            StageOptions(),
+            StageOptions(cost=0.05),
+            StageOptions(cost=0.0001, deadline=5.0),
+        ],
+        fuse_threshold=0.001,
+        stage_costs={"Third": 0.0004, "Last": 0.05},
+    )
+    # The cheap stages are fused until the threshold is reached
+    assert pipeline.stage_groups == [
+        ["First", "Second"],
+        ["Third"],
+        ["Slow"],
+        ["Last"],
+    ]
+    names = [thread.name for thread in pipeline.stage_threads]
+    assert names[:4] == ["First+Second", "Third", "Slow", "Last"]
+    assert len(pipeline.stage_threads) == 5
+    assert pipeline.stage_threads[3].deadline == 5.0
+    for _ in range(3):
+        data = PipelineData(data=[])
+        data.profile.tick_start(_PIPELINE_NAME_IN_PROFILE)
+        pipeline.forward(data)
+    assert pipeline.drain(timeout=2)
+    # The fused stages are still profiled separately
+    latency, _ = profiler.summarize()
+    for name in ["First", "Second", "Third", "Slow", "Last"]:
+        assert f"{_PIPELINE_NAME_IN_PROFILE}{_PROFILE_LEVEL_SEPARATOR}{name}" in latency
+    assert pipeline.get_results().data == [1, 2, 3, 4, 5]
+    pipeline.cleanup()
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="Thread placement needs Linux"
+)
+def test_placement():
+    cpu = min(os.sched_getaffinity(0))
+    pipeline = ParallelThreadPipeline(
+        [lambda x: x, lambda x: x, lambda x: x],
+        ["Placed", "Cheap", "Cheaper"],
+        options=[
+            StageOptions(cost=0.0, cpus=[cpu], nice=1, blas_threads=1),
+            StageOptions(cost=0.0),
+            StageOptions(cost=0.0),
+        ],
+        fuse_threshold=0.001,
+    )
+    # The placed stage is not fused
+    assert pipeline.stage_groups == [["Placed"], ["Cheap", "Cheaper"]]
+    placement = pipeline.stats()["placement"]
+    assert placement["Placed"]["cpus"] == [cpu]
+    assert placement["Placed"]["nice"] == os.getpriority(os.PRIO_PROCESS, 0) + 1
+    assert all(v == 1 for v in placement["Placed"]["blas_threads"].values())
+    assert placement["Cheap+Cheaper"]["blas_threads"] is None
+    pipeline.cleanup()
+
+
+def hang_on_negative(x):
+    if x < 0:
+        time.sleep(1.0)
+    return x * 2
+
+
+@pytest.mark.parametrize("action", ["report", "drop", "bypass"])
+def test_watchdog(action):
+    received = []
+
+    class ListSink:
+        def put(self, item):
+            received.append(item)
+
+    pipeline = ParallelThreadPipeline(
+        [hang_on_negative, lambda x: x + 1],
+        ["Driver", "Next"],
+        sinks=[ListSink()],
+        options=[StageOptions(time_budget=0.1), StageOptions()],
+        watchdog=StageWatchdog(action=action, interval=0.02),
+    )
+    stalled = pipeline.stage_threads[0]
+    start = time.perf_counter()
+    for value in [1, -1, 2]:
+        data = PipelineData(data=value)
+        data.profile.tick_start(_PIPELINE_NAME_IN_PROFILE)
+        pipeline.forward(data)
+    assert pipeline.drain(timeout=3)
+    elapsed = time.perf_counter() - start
+    stats = pipeline.stats()
+    assert stats["stalls"] == {"Driver": 1}
+    if action == "report":
+        # The stage is waited for
+        assert elapsed >= 1.0
+        assert received == [3, -1, 5]
+        assert pipeline.stage_threads[0] is stalled
+    else:
+        # The data keeps flowing while the stalled call is running
+        assert elapsed < 0.8
+        assert pipeline.stage_threads[0] is not stalled
+        assert stalled.abandoned
+    if action == "drop":
+        assert received == [3, 5]
+        assert stats["drop_reasons"] == {"stalled": 1}
+    if action == "bypass":
+        assert received == [3, 0, 5]
+    pipeline.cleanup()
+
+
+def test_release_stalled_full_output():
+    received = []
+    release = Event()
+
+    class ListSink:
+        def put(self, item):
+            received.append(item)
+
+    pipeline = ParallelThreadPipeline(
+        [hang_on_negative, lambda x: release.wait() and x + 10],
+        ["Driver", "Blocked"],
+        sinks=[ListSink()],
+        options=[StageOptions(time_budget=5.0), StageOptions()],
+        queue_size=1,
+    )
+    for value in [1, 2, -1]:
+        data = PipelineData(data=value)
+        data.profile.tick_start(_PIPELINE_NAME_IN_PROFILE)
+        pipeline.forward(data)
+    time.sleep(0.3)
+    # The next stage is busy and its queue is full, but the release returns
+    start = time.perf_counter()
+    assert pipeline.release_stalled(pipeline.stage_threads[0], drop=False)
+    assert time.perf_counter() - start < 0.1
+    release.set()
+    assert pipeline.drain(timeout=3)
+    assert received == [12, 14, 9]
+    pipeline.cleanup()
+
+
+def test_replace_stalled_stage():
+    received = []
+
+    class ListSink:
+        def put(self, item):
+            received.append(item)
+
+    pipeline = ParallelThreadPipeline(
+        [hang_on_negative, lambda x: x + 1],
+        ["Driver", "Next"],
+        sinks=[ListSink()],
+        options=[StageOptions(time_budget=5.0), StageOptions()],
+    )
+    data = PipelineData(data=-1)
+    data.profile.tick_start(_PIPELINE_NAME_IN_PROFILE)
+    pipeline.forward(data)
+    time.sleep(0.2)
+    stalled = pipeline.stage_threads[0]
+    assert pipeline.release_stalled(stalled, drop=True)
+    # The stalled call is not waited for
+    start = time.perf_counter()
+    find_stage(pipeline.stages, "Driver").replace(lambda x: x * 3)
+    assert time.perf_counter() - start < 0.5
+    assert stalled.is_alive()
+    data = PipelineData(data=2)
+    data.profile.tick_start(_PIPELINE_NAME_IN_PROFILE)
+    pipeline.forward(data)
+    assert pipeline.drain(timeout=3)
+    assert received == [7]
+    pipeline.cleanup()
+
+
+def test_watchdog_default():
+    pipeline = ParallelThreadPipeline(
+        [lambda x: x], ["Stage"], options=[StageOptions(time_budget=1.0)]
+    )
+    assert pipeline.watchdog is not None
+    assert pipeline.watchdog.action == "report"
+    assert pipeline.stats()["stalls"] == {}
+    pipeline.cleanup()
+    pipeline = ParallelThreadPipeline([lambda x: x], ["Stage"])
+    assert pipeline.watchdog is None
+    assert "stalls" not in pipeline.stats()
+    pipeline.cleanup()
+
+
+def test_flatten_drop():
+    child = ParallelThreadPipeline([lambda x: DROP if x < 0 else x], ["Filter"])
+    pipeline = ParallelThreadPipeline(
+        [child, lambda x: x * 2], ["Child", "Double"], flatten=True
+    )
+    for value in [1, -1, 2]:
+        data = PipelineData(data=value)
+        data.profile.tick_start(_PIPELINE_NAME_IN_PROFILE)
+        pipeline.forward(data)
+    assert pipeline.drain(timeout=2)
+    stats = pipeline.stats()
+    assert stats["completed"] == 2
+    assert stats["dropped_by"] == {"Child__Filter": 1}
+    assert child.stats()["dropped"] == 1
+    pipeline.cleanup()
+
+
+class FailingSetupStage(DummyStage):
+    def setup(self) -> None:
+        raise RuntimeError("model not found")
+
+
+def test_setup_error():
+    with pytest.raises(PipelineInitiationError):
+        ParallelThreadPipeline(
+            [SetupStage(setup_wait=0), FailingSetupStage()], ["Good", "Bad"]
+        )
+
+
+def test_admission():
+    pipeline = ParallelThreadPipeline(
+        [DummyStage(val=0, wait=0.2)],
+        ["Stage"],
+        admission=[MaxInFlight(2)],
+    )
+    results = [pipeline.forward(PipelineData(data=[])) for _ in range(4)]
+    assert results == [True, True, False, False]
+    stats = pipeline.stats()
+    assert stats["admitted"] == 2
+    assert stats["rejected"] == {"MaxInFlight": 2}
+    assert stats["in_flight"] == 2
+    time.sleep(0.6)
+    assert pipeline.load().in_flight == 0
+    assert pipeline.forward(PipelineData(data=[]))
+    pipeline.cleanup()
+
+
+def test_admission_cancel():
+    bucket = TokenBucket(rate=0.001, burst=4)
+    pipeline = ParallelThreadPipeline(
+        [DummyStage(val=0, wait=0.3)], ["Stage"], admission=[bucket, MaxInFlight(1)]
+    )
+    results = [pipeline.forward(PipelineData(data=[])) for _ in range(2)]
+    pipeline.cleanup()
+    assert results == [True, False]
+    # The token taken by the data rejected by the next policy is given back
+    assert bucket.tokens == pytest.approx(3, abs=0.01)
+
+    bucket = TokenBucket(rate=0.001, burst=4)
+    pipeline = ParallelThreadPipeline(
+        [DummyStage(val=0, wait=0.3)],
+        ["Stage"],
+        admission=[bucket],
+        queue_size=1,
+        block_input=False,
+    )
+    results = [pipeline.forward(PipelineData(data=[]))]
+    time.sleep(0.1)
+    results += [pipeline.forward(PipelineData(data=[])) for _ in range(2)]
+    pipeline.cleanup()
+    assert results == [True, True, False]
+    # The data that could not be sent gives its token back
+    assert bucket.tokens == pytest.approx(2, abs=0.01)
+
+
+class TestParallelThreadPipelineBranches:
+    @pytest.fixture(autouse=True)
+    def _create_pipeline(self):
+        self.wait = 0.1
+        self.branch_stages = [CopyStage(val=i, wait=self.wait) for i in range(4)]
+        branches = Branches(
+            {
+                "A": [(self.branch_stages[0], "A0"), (self.branch_stages[1], "A1")],
+                "B": [(self.branch_stages[2], "B0"), (self.branch_stages[3], "B1")],
+            },
+            join=lambda outputs: (outputs["A"], outputs["B"]),
+        )
+        self.profiler = ProfilerHandler()
+        self.pipeline = ParallelThreadPipeline(
+            [list, branches],
+            ["Prepare", "Fusion"],
+            block_output=True,
+            profiler_handler=self.profiler,
+        )
+        yield
+        self.pipeline.cleanup()
+
+    def test_init(self):
+        # 1 stage + 4 branch stages + fork + join + final stage
+        assert len(self.pipeline.stage_threads) == 8
+        for stage_thread in self.pipeline.stage_threads:
+            assert stage_thread.is_alive()
+
+    def test_forward_and_get_results(self):
+        num_data = 6
+        start = time.perf_counter()
+        for i in range(num_data):
+            data = PipelineData(data=[i])
+            data.profile.tick_start(_PIPELINE_NAME_IN_PROFILE)
+            assert self.pipeline.forward(data)
+        while True:
+            res = self.pipeline.get_results()
+            if res.data[0][0] == num_data - 1:
+                break
+        elapsed = time.perf_counter() - start
+        # Branch stages run concurrently and are pipelined across data
+        assert elapsed < num_data * 4 * self.wait / 2
+        assert res.data == ([num_data - 1, 0, 1], [num_data - 1, 2, 3])
+
+        latency, _ = self.profiler.summarize()
+        prefix = f"{_PIPELINE_NAME_IN_PROFILE}{_PROFILE_LEVEL_SEPARATOR}Fusion"
+        for name in ["A", "A__A0", "A__A1", "B", "B__B0", "B__B1", "Join"]:
+            assert f"{prefix}{_PROFILE_LEVEL_SEPARATOR}{name}" in latency
+        assert latency[f"{prefix}{_PROFILE_LEVEL_SEPARATOR}A"] > 2 * self.wait * 0.9
+
+    def test_drop_in_branch(self):
+        branches = Branches(
+            {"A": lambda x: x, "B": [(lambda x: DROP if x[0] < 0 else x, "Filter")]},
+            join=lambda outputs: outputs["A"],
+        )
+        pipeline = ParallelThreadPipeline(
+            [branches], ["Fusion"], block_output=True, output_timeout=1
+        )
+        results = []
+        for value in [-1, 1]:
+            pipeline.forward(PipelineData(data=[value]))
+            results.append(pipeline.get_results().data)
+        assert results == [None, [1]]
+        assert pipeline.stats()["dropped_by"] == {"Fusion__B__Filter": 1}
+        pipeline.cleanup()
+
+    def test_cleanup(self):
+        self.pipeline.cleanup()
+        for stage_thread in self.pipeline.stage_threads:
+            assert not stage_thread.is_alive()
+        for stage in self.branch_stages:
+            assert stage.val is None
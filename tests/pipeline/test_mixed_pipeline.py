@@ -21,6 +21,7 @@ class MixedPipelineTester:
     child_idx = 1
     num_child_stages = 2
     child_mode = SerialPipeline
+    flatten = False
 
     def _init_tester(self, dummy_stage, tmp_path: Path):
         set_profiler_db_folder(str(tmp_path))
@@ -33,6 +34,7 @@ class MixedPipelineTester:
             num_child_stages=self.num_child_stages,
             child_mode=self.child_mode,
             use_profiler=True,
+            flatten=self.flatten,
         )
 
     def _construct_pipeline(
@@ -46,6 +48,7 @@ class MixedPipelineTester:
         child_mode: Type = ParallelThreadPipeline,
         parent_name: str = "",
         use_profiler: bool = False,
+        flatten: bool = False,
     ):
         stages = {}
         child_stages = {}
@@ -68,7 +71,7 @@ class MixedPipelineTester:
         if mode is SerialPipeline:
             pipeline.serialize()
         elif mode is ParallelThreadPipeline:
-            pipeline.parallelize(block_output=True, output_timeout=10)
+            pipeline.parallelize(block_output=True, output_timeout=10, flatten=flatten)
         return pipeline, stages, child_stages
 
     def test_forward_and_get_results(self):
@@ -151,3 +154,17 @@ class TestThreadInSerial(MixedPipelineTester):
         self.num_child_stages = 2
         self.child_mode = ParallelThreadPipeline
         self._init_tester(dummy_stage, tmp_path)
+
+
+class TestThreadInThreadFlattened(MixedPipelineTester):
+    @pytest.fixture(autouse=True)
+    def _create_pipeline(self, dummy_stage, tmp_path: Path):
+        set_profiler_db_folder(str(tmp_path))
+        self.num_stages = 3
+        self.wait_time = 0.1
+        self.mode = ParallelThreadPipeline
+        self.child_idx = 1
+        self.num_child_stages = 2
+        self.child_mode = ParallelThreadPipeline
+        self.flatten = True
+        self._init_tester(dummy_stage, tmp_path)
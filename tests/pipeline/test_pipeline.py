@@ -6,9 +6,18 @@ from pystream import Pipeline, Stage
 from pystream.pipeline import SerialPipeline
 from pystream.pipeline import ParallelThreadPipeline
 from pystream.pipeline.pipeline import PipelineUndefined
+from pystream.utils.errors import InvalidStageName, PipelineInitiationError
 from pystream.pipeline.pipeline_base import PipelineBase
+from pystream.data.buffer_pool import BufferPool
+from pystream.pipeline.utils.admission import TokenBucket
+from pystream.pipeline.utils.autotune import TuningConstraints
+from pystream.pipeline.utils.controller import LatencyController
 from pystream.pipeline.utils.profiler import ProfilerHandler
+from pystream.pipeline.utils.simulator import PipelineSimulator, SimulatedLayout
+from pystream.pipeline.utils.watchdog import StageWatchdog
 from pystream.data.pipeline_data import PipelineData
+from pystream.functional import cached, func_accumulate
+from tests.conftest import SetupStage
 
 
 class MockPipeline(PipelineBase):
@@ -122,6 +131,526 @@ class TestPipeline:
         assert isinstance(ret, PipelineData)
         assert ret.data == new_data
 
+    def test_iterable_input(self):
+        pipeline = Pipeline(iter(range(3)), input_prefetch=2)
+        pipeline.serialize()
+        results = []
+        while pipeline.forward():
+            results.append(pipeline.get_results())
+        assert results == [0, 1, 2]
+        assert pipeline.input_exhausted
+        pipeline.cleanup()
+
+    def test_loop_exhausted(self):
+        pipeline = Pipeline(range(3))
+        pipeline.serialize()
+        pipeline.start_loop(period=0.01)
+        time.sleep(0.5)
+        assert pipeline._automation is not None
+        assert not pipeline._automation._loop_thread.is_alive()
+        assert pipeline.get_results() == 2
+        pipeline.stop_loop()
+        pipeline.cleanup()
+
+    def test_sink_parallel(self, dummy_stage):
+        received = []
+        batches = []
+        for _ in range(2):
+            self.pipeline.add(dummy_stage(wait=0.05))
+        self.pipeline.add_sink(received.append)
+        self.pipeline.add_sink(batches.append, batch_size=2, threaded=True)
+        self.pipeline.parallelize()
+        for _ in range(5):
+            self.pipeline.forward([])
+        time.sleep(0.5)
+        self.pipeline.cleanup()
+        assert len(received) == 5
+        assert sum(batches, []) == received
+        assert len(batches) == 3
+
+    def test_add_branches(self):
+        self.pipeline.add(lambda x: x * 2)
+        self.pipeline.add_branches(
+            {"Inc": lambda x: x + 1, "Dec": [lambda x: x - 1, lambda x: x - 1]},
+            join=lambda outputs: (outputs["Inc"], outputs["Dec"]),
+            name="Branch",
+        )
+        self.pipeline.serialize()
+        self.pipeline.forward(5)
+        assert self.pipeline.get_results() == (11, 8)
+
+    def test_add_filter(self):
+        processed = []
+        self.pipeline.add_filter(lambda x: x % 2 == 0, "Even")
+        self.pipeline.add(lambda x: processed.append(x) or x)
+        self.pipeline.serialize()
+        results = []
+        for value in range(4):
+            self.pipeline.forward(value)
+            results.append(self.pipeline.get_results())
+        assert results == [0, None, 2, None]
+        assert processed == [0, 2]
+        stats = self.pipeline.stats()["MainPipeline"]
+        assert stats["dropped"] == 2
+        assert stats["dropped_by"] == {"Even": 2}
+
+    def test_add_filter_parallel(self, dummy_stage):
+        received = []
+        self.pipeline.add(dummy_stage(wait=0.05))
+        self.pipeline.add_filter(lambda x: len(x) < 0, "Reject")
+        self.pipeline.add(dummy_stage(wait=0.05))
+        self.pipeline.add_sink(received.append)
+        self.pipeline.parallelize()
+        for _ in range(3):
+            self.pipeline.forward([])
+        time.sleep(0.5)
+        assert self.pipeline.get_results() is None
+        assert self.pipeline.stats()["MainPipeline"]["dropped"] == 3
+        self.pipeline.cleanup()
+        assert received == []
+
+    def test_add_flat_map(self):
+        received = []
+        self.pipeline.add_flat_map(lambda x: range(x), "Split")
+        self.pipeline.add(lambda x: x * 10)
+        self.pipeline.add_flat_map(func_accumulate(2, combine=sum), "Merge")
+        self.pipeline.add_sink(received.append)
+        self.pipeline.serialize()
+        for value in [3, 1]:
+            self.pipeline.forward(value)
+        assert received == [10, 20]
+        stats = self.pipeline.stats()["MainPipeline"]
+        assert stats["completed"] == 2
+        assert stats["absorbed"] == 2
+        assert stats["dropped"] == 0
+        latency, _ = self.pipeline.get_profiles()
+        assert "MainPipeline__Split" in latency
+
+    def test_add_flat_map_parallel(self, dummy_stage):
+        received = []
+        self.pipeline.add_flat_map(lambda x: [[i] for i in range(x)], "Tiling")
+        self.pipeline.add(dummy_stage(val=1, wait=0.05))
+        self.pipeline.add_sink(received.append)
+        self.pipeline.parallelize()
+        for value in [2, 0, 3]:
+            self.pipeline.forward(value)
+        time.sleep(0.5)
+        assert self.pipeline.stats()["MainPipeline"]["absorbed"] == 1
+        self.pipeline.cleanup()
+        assert received == [[0, 1], [1, 1], [0, 1], [1, 1], [2, 1]]
+
+    def test_stage_deadline(self, dummy_stage):
+        self.pipeline.add(dummy_stage(val=1, wait=0.1), "Slow")
+        self.pipeline.add(dummy_stage(val=2, wait=0.1), "Late", deadline=0.05)
+        assert self.pipeline.stage_options[1].deadline == 0.05
+        self.pipeline.parallelize()
+        self.pipeline.forward([])
+        time.sleep(0.5)
+        stats = self.pipeline.stats()["MainPipeline"]
+        assert stats["dropped_by"] == {"Late": 1}
+        with pytest.raises(TypeError):
+            self.pipeline.add(dummy_stage(), unknown_option=1)
+
+    def test_stage_placement(self):
+        self.pipeline.add(lambda x: x, "Model", blas_threads=1)
+        assert self.pipeline.stage_options[0].blas_threads == 1
+        self.pipeline.parallelize()
+        placement = self.pipeline.stats()["MainPipeline"]["placement"]
+        assert placement["Model"]["blas_threads"] is not None
+        assert placement["FinalStage"]["blas_threads"] is None
+        self.pipeline.cleanup()
+
+    def test_watchdog(self):
+        received = []
+        self.pipeline.add(lambda x: time.sleep(0.5) or x, "Stuck", time_budget=0.05)
+        self.pipeline.add_sink(received.append)
+        self.pipeline.parallelize(watchdog=StageWatchdog(action="drop", interval=0.01))
+        self.pipeline.forward("stuck")
+        time.sleep(0.2)
+        stats = self.pipeline.stats()["MainPipeline"]
+        self.pipeline.cleanup()
+        assert received == []
+        assert stats["stalls"] == {"Stuck": 1}
+        assert stats["drop_reasons"] == {"stalled": 1}
+
+    def test_priority(self):
+        received = []
+        self.pipeline.add(lambda x: time.sleep(0.1) or x, "Slow")
+        self.pipeline.add_sink(received.append)
+        self.pipeline.parallelize(priority=True, queue_size=5)
+        for value in range(4):
+            self.pipeline.forward(f"bulk{value}")
+        self.pipeline.forward("urgent", priority=1)
+        time.sleep(0.8)
+        latency = self.pipeline.stats()["MainPipeline"]["latency_by_priority"]
+        self.pipeline.cleanup()
+        assert received.index("urgent") < received.index("bulk3")
+        assert latency[1]["mean"] < latency[0]["max"]
+
+    def test_admission(self):
+        self.pipeline.add(lambda x: x)
+        self.pipeline.parallelize(admission=[TokenBucket(rate=1, burst=1)])
+        assert self.pipeline.forward()
+        assert not self.pipeline.forward()
+        assert self.pipeline.stats()["MainPipeline"]["rejected"] == {"TokenBucket": 1}
+
+    def test_warmup(self):
+        stage = SetupStage(setup_wait=0.1)
+        self.pipeline.add(stage, "Model")
+        self.pipeline.add(lambda x: x, "Plain")
+        assert not self.pipeline.is_ready
+        self.pipeline.serialize(warmup_samples=[[]])
+        assert self.pipeline.is_ready
+        assert stage.warmup_samples == [[]]
+        ready_times = self.pipeline.ready_times()
+        assert list(ready_times.keys()) == [
+            "MainPipeline",
+            "MainPipeline__Model",
+            "MainPipeline__Plain",
+        ]
+        assert ready_times["MainPipeline__Model"] >= 0.1
+        assert ready_times["MainPipeline"] >= ready_times["MainPipeline__Model"]
+
+    def test_warmup_parallel(self):
+        self.pipeline.add(SetupStage(setup_wait=0.5), "Model")
+        self.pipeline.parallelize(wait_ready=False)
+        assert not self.pipeline.is_ready
+        assert self.pipeline.ready_times()["MainPipeline"] is None
+        assert self.pipeline.wait_ready(timeout=2)
+        assert self.pipeline.ready_times()["MainPipeline__Model"] >= 0.5
+        self.pipeline.cleanup()
+
+    def test_pause_resume(self):
+        received = []
+        self.pipeline.add(lambda x: x)
+        self.pipeline.add_sink(received.append)
+        self.pipeline.parallelize()
+        self.pipeline.start_loop(period=0.02)
+        time.sleep(0.2)
+        self.pipeline.pause()
+        assert self.pipeline.is_paused
+        time.sleep(0.2)
+        num_received = len(received)
+        time.sleep(0.3)
+        assert len(received) == num_received
+        self.pipeline.reconfigure(queue_size=4, input_timeout=1)
+        self.pipeline.resume()
+        time.sleep(0.3)
+        self.pipeline.stop_loop()
+        self.pipeline.cleanup()
+        assert len(received) > num_received
+
+    def test_replace_stage(self):
+        self.pipeline.add(lambda x: x + 1, "Model")
+        self.pipeline.add(lambda x: x * 2, "Scale")
+        self.pipeline.parallelize(block_output=True)
+        self.pipeline.forward(1)
+        assert self.pipeline.get_results() == 4
+        new_stage = SetupStage(val=0, setup_wait=0)
+        self.pipeline.replace_stage("Model", new_stage, warmup_samples=[[]])
+        assert new_stage.warmup_samples == [[]]
+        self.pipeline.forward([])
+        assert self.pipeline.get_results() == [0, 0]
+        assert self.pipeline.stages_sequence[0] is new_stage
+        with pytest.raises(InvalidStageName):
+            self.pipeline.replace_stage("Missing", lambda x: x)
+        time.sleep(0.1)
+        latency, _ = self.pipeline.get_profiles()
+        self.pipeline.cleanup()
+        assert "MainPipeline__Model" in latency
+
+    def test_cleanup_drain(self, dummy_stage):
+        received = []
+        self.pipeline.add(dummy_stage(val=0, wait=0.1))
+        self.pipeline.add_sink(received.append)
+        self.pipeline.parallelize()
+        for _ in range(3):
+            self.pipeline.forward([])
+        self.pipeline.cleanup(drain=True)
+        assert received == [[0]] * 3
+
+    def test_fuse(self):
+        self.pipeline.add(lambda x: x + [1], "Cheap")
+        self.pipeline.add(lambda x: x + [2], "Cheaper")
+        self.pipeline.add(lambda x: time.sleep(0.1) or x + [3], "Slow")
+        self.pipeline.add(lambda x: x + [4], "Hinted", cost=0.0)
+        with pytest.raises(PipelineUndefined):
+            self.pipeline.get_stage_groups()
+        self.pipeline.serialize()
+        assert self.pipeline.get_stage_groups() == [
+            ["Cheap", "Cheaper", "Slow", "Hinted"]
+        ]
+        for _ in range(3):
+            self.pipeline.forward([])
+        self.pipeline.cleanup()
+        # The costs are measured by the serialized run
+        self.pipeline.parallelize(block_output=True, fuse=True, fuse_threshold=0.05)
+        assert self.pipeline.get_stage_groups() == [
+            ["Cheap", "Cheaper"],
+            ["Slow"],
+            ["Hinted"],
+        ]
+        self.pipeline.forward([])
+        assert self.pipeline.get_results() == [1, 2, 3, 4]
+        self.pipeline.cleanup()
+
+    def test_fuse_unnamed(self):
+        self.pipeline.add(lambda x: x + [1])
+        self.pipeline.add(lambda x: x + [2])
+        self.pipeline.add(lambda x: time.sleep(0.05) or x + [3])
+        names = list(self.pipeline.stage_names)
+        self.pipeline.serialize()
+        for _ in range(3):
+            self.pipeline.forward([])
+        self.pipeline.cleanup()
+        # The default names are kept, so the measured costs still match
+        self.pipeline.parallelize(block_output=True, fuse=True, fuse_threshold=0.01)
+        assert self.pipeline.get_stage_groups() == [names[:2], names[2:]]
+        self.pipeline.forward([])
+        assert self.pipeline.get_results() == [1, 2, 3]
+        self.pipeline.cleanup()
+
+    def test_autotune(self):
+        received = []
+        self.pipeline.add(lambda x: x + 1, "Cheap")
+        self.pipeline.add(lambda x: x * 2, "Cheaper")
+        self.pipeline.add(lambda x: time.sleep(0.05) or x, "Slow")
+        self.pipeline.add(lambda x: time.sleep(0.05) or x, "Slower")
+        self.pipeline.add_sink(received.append)
+        report = self.pipeline.autotune(list(range(8)), queue_sizes=[1])
+        assert set(report.stage_costs.keys()) == {"Cheap", "Cheaper", "Slow", "Slower"}
+        modes = [result.config.mode for result in report.results]
+        assert modes[0] == "serial" and "parallel" in modes
+        # The slow stages are better run in parallel
+        assert report.best is not None
+        assert report.best.config.mode == "parallel"
+        assert report.best.throughput > report.results[0].throughput
+        assert ["Slow"] in report.best.stage_groups or ["Slower"] in (
+            report.best.stage_groups
+        )
+        assert self.pipeline.get_stage_groups() == report.best.stage_groups
+        assert received == []
+        with pytest.raises(PipelineInitiationError):
+            self.pipeline.autotune([1])
+        self.pipeline.cleanup()
+
+        # A single thread is required
+        report = self.pipeline.autotune(
+            [1, 2],
+            objective="latency",
+            constraints=TuningConstraints(max_threads=1),
+            apply=False,
+        )
+        assert report.best.config.mode == "serial"
+        assert self.pipeline.pipeline is None
+        with pytest.raises(ValueError):
+            self.pipeline.autotune([1], objective="unknown")
+
+    def test_autotune_setup(self):
+        events = []
+
+        class CountingStage(SetupStage):
+            def setup(self):
+                events.append("setup")
+
+            def cleanup(self):
+                events.append("cleanup")
+
+        self.pipeline.add(CountingStage(val=0, wait=0.01), "Model")
+        self.pipeline.add(lambda x: x, "Post")
+        self.pipeline.autotune([[], []], queue_sizes=[1, 2], apply=False)
+        # The stage is set up once for all configurations
+        assert events == ["setup", "cleanup"]
+
+    def test_autotune_reset(self):
+        calls = []
+        self.pipeline.add_change_gate(name="Gate")
+        self.pipeline.add(cached(lambda x: calls.append(x) or x), "Cached")
+        report = self.pipeline.autotune([1, 1, 2], queue_sizes=[1], apply=False)
+        # Each benchmark starts without the state left by the previous one
+        assert calls == [1, 2] * (len(report.results) + 1)
+        assert all(result.throughput > 0 for result in report.results)
+
+    def test_autotune_unnamed(self):
+        self.pipeline.add(lambda x: x + 1)
+        self.pipeline.add(lambda x: x * 2)
+        self.pipeline.add(lambda x: time.sleep(0.05) or x)
+        names = list(self.pipeline.stage_names)
+        report = self.pipeline.autotune(list(range(4)), queue_sizes=[1], apply=False)
+        assert set(report.stage_costs.keys()) == set(names)
+        fused = [r for r in report.results if r.config.fuse_threshold is not None]
+        assert len(fused) > 0
+        # The costs match the stages, so the cheap stages are actually fused
+        for result in fused:
+            assert any(len(group) > 1 for group in result.stage_groups)
+
+    def test_simulate_unnamed(self):
+        self.pipeline.add(lambda x: x + 1)
+        self.pipeline.add(lambda x: time.sleep(0.05) or x)
+        names = list(self.pipeline.stage_names)
+        self.pipeline.serialize()
+        for i in range(5):
+            self.pipeline.forward(i)
+            self.pipeline.get_results()
+        self.pipeline.cleanup()
+        simulator = PipelineSimulator(self.pipeline.profiler.latency_records())
+        self.pipeline.parallelize()
+        # The profiled names still match the stages of the rebuilt pipeline
+        layout = SimulatedLayout.of(self.pipeline.as_stage())
+        assert [unit.stages for unit in layout.units] == [names[:1], names[1:]]
+        validation = simulator.validate(
+            self.pipeline.as_stage(), list(range(5)), timeout=5
+        )
+        self.pipeline.cleanup()
+        assert validation.predicted.completed == 5
+
+    def test_buffer_pool(self):
+        pool = BufferPool()
+
+        def frame_sum(x):
+            frame = pool.borrow((8, 8))
+            frame.fill(x)
+            return float(frame.sum())
+
+        self.pipeline.add(frame_sum, "Sum")
+        self.pipeline.add_branches(
+            {"Copy": lambda x: pool.borrow(4) is not None and x, "Same": lambda x: x},
+            join=lambda outputs: outputs["Copy"] + outputs["Same"],
+        )
+        self.pipeline.parallelize(block_output=True)
+        for _ in range(5):
+            self.pipeline.forward(1)
+            assert self.pipeline.get_results() == 128.0
+        self.pipeline.cleanup()
+        stats = pool.stats()
+        assert stats["hits"] == 8
+        assert stats["in_use_bytes"] == 0
+        assert stats["footprint_bytes"] == 8 * 8 * 8 + 4 * 8
+
+    @pytest.mark.parametrize("parallel", [False, True])
+    def test_buffer_pool_flat_map(self, parallel):
+        pool = BufferPool()
+        received = []
+        keep_rows = [True]
+
+        def frame(x):
+            buffer = pool.borrow((4, 4))
+            buffer.fill(x)
+            return buffer
+
+        def split(x):
+            if keep_rows[0]:
+                return [x[0], float(x[1].sum())]
+            return [float(x.sum())] * 2
+
+        self.pipeline.add(frame, "Frame")
+        self.pipeline.add_flat_map(split, "Split")
+        self.pipeline.add_sink(received.append)
+        for keep_rows[0] in [True, False]:
+            received.clear()
+            if parallel:
+                self.pipeline.parallelize()
+            else:
+                self.pipeline.serialize()
+            for value in range(5):
+                self.pipeline.forward(value)
+            assert self.pipeline.drain(timeout=3)
+            self.pipeline.cleanup()
+            assert pool.stats()["in_use_bytes"] == 0
+        # The buffers viewed by the first rows are given away, the others reused
+        assert received == [16.0 * i for i in range(5) for _ in range(2)]
+        assert pool.stats()["hits"] > 0
+
+    def test_add_change_gate(self):
+        processed = []
+        self.pipeline.add_change_gate(name="Gate")
+        self.pipeline.add(lambda x: processed.append(x) or x * 2, "Double")
+        self.pipeline.serialize()
+        for value in [1, 1, 1, 2]:
+            self.pipeline.forward(value)
+            last_result = self.pipeline.get_results()
+        assert last_result == 4
+        assert processed == [1, 2]
+        assert self.pipeline.stats()["MainPipeline__Gate"]["skipped"] == 2
+        latency, throughput = self.pipeline.get_profiles()
+        assert "MainPipeline__Double" in latency
+        assert throughput["MainPipeline__Double"] > 0
+
+    def test_add_change_gate_parallel(self):
+        received = []
+        self.pipeline.add_change_gate(name="Gate")
+        self.pipeline.add_branches(
+            {"Inc": lambda x: x + 1, "Dec": lambda x: x - 1},
+            join=lambda outputs: (outputs["Inc"], outputs["Dec"]),
+        )
+        self.pipeline.add_sink(received.append)
+        self.pipeline.parallelize()
+        for value in [1, 1, 2]:
+            self.pipeline.forward(value)
+            time.sleep(0.2)
+        assert self.pipeline.stats()["MainPipeline__Gate"]["skipped"] == 1
+        self.pipeline.cleanup()
+        assert received == [(2, 0), (2, 0), (3, 1)]
+
+    def test_add_change_gate_in_flight(self):
+        received = []
+        processed = []
+        self.pipeline.add_change_gate(name="Gate")
+        self.pipeline.add(lambda x: time.sleep(0.05) or processed.append(x) or x, "A")
+        self.pipeline.add(lambda x: time.sleep(0.05) or x * 2, "B")
+        self.pipeline.add_sink(received.append)
+        self.pipeline.parallelize(queue_size=100)
+        # Frames arrive faster than the pipeline latency
+        for value in [1] * 10 + [2] * 10:
+            self.pipeline.forward(value)
+            time.sleep(0.03)
+        time.sleep(0.3)
+        stats = self.pipeline.stats()["MainPipeline__Gate"]
+        self.pipeline.cleanup()
+        assert processed == [1, 2]
+        assert stats["skipped"] == 18
+        assert received == [2] * 10 + [4] * 10
+
+    def test_add_change_gate_flat_map(self):
+        self.pipeline.add_change_gate(name="Gate")
+        self.pipeline.add_flat_map(lambda x: [x * 10], "Split")
+        self.pipeline.add(lambda x: x + 1)
+        # The outputs of the flat-map stage are new data, so none can be reused
+        with pytest.raises(PipelineInitiationError):
+            self.pipeline.serialize()
+        with pytest.raises(PipelineInitiationError):
+            self.pipeline.parallelize()
+
+    def test_add_change_gate_time_budget(self):
+        received = []
+        self.pipeline.add_change_gate(name="Gate")
+        self.pipeline.add(lambda x: time.sleep(0.05) or x * 2, "A", time_budget=1.0)
+        self.pipeline.add_sink(received.append)
+        self.pipeline.parallelize(queue_size=100)
+        # The data in flight may be abandoned, so its output is not reused
+        for value in [1] * 3:
+            self.pipeline.forward(value)
+        assert self.pipeline.drain(timeout=3)
+        stats = self.pipeline.stats()["MainPipeline__Gate"]
+        self.pipeline.cleanup()
+        assert received == [2] * 3
+        assert stats["skipped"] == 0
+
+    def test_latency_controller_drops(self):
+        self.pipeline.add(lambda x: time.sleep(0.03) or x, "A")
+        self.pipeline.add(lambda x: time.sleep(0.03) or x, "B")
+        self.pipeline.parallelize()
+        # The target cannot be met, so the budget drops every data
+        controller = LatencyController(target=0.05, interval=0.3)
+        self.pipeline.start_loop(period=0.0, controller=controller)
+        time.sleep(2.5)
+        self.pipeline.stop_loop()
+        expired = self.pipeline.count_expired()
+        self.pipeline.cleanup()
+        # The dropped data keeps the controller deciding
+        assert len(controller.get_decisions()) >= 4
+        assert expired > 0
+
     def test_profiler(self):
         assert isinstance(self.pipeline.profiler, ProfilerHandler)
         assert self.pipeline.get_profiles() == ({}, {})
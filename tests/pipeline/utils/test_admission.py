@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from pystream.data.pipeline_data import PipelineData
+from pystream.pipeline.utils.admission import (
+    EarlyDrop,
+    MaxInFlight,
+    PipelineLoad,
+    TokenBucket,
+)
+
+
+def make_load(in_flight=0, queue_depth=0, latency=float("nan")):
+    return PipelineLoad(in_flight=in_flight, queue_depth=queue_depth, latency=latency)
+
+
+def test_token_bucket():
+    policy = TokenBucket(rate=10, burst=2)
+    data = PipelineData()
+    assert [policy.admit(data, make_load()) for _ in range(3)] == [True, True, False]
+    time.sleep(0.15)
+    assert policy.admit(data, make_load())
+    assert policy.name == "TokenBucket"
+
+    # The token of a data that did not enter the pipeline is given back
+    policy = TokenBucket(rate=0.001, burst=1)
+    assert policy.admit(data, make_load())
+    policy.cancel(data)
+    assert policy.admit(data, make_load())
+    assert not policy.admit(data, make_load())
+    policy.cancel(data)
+    policy.cancel(data)
+    assert policy.tokens <= 1
+
+
+def test_max_in_flight():
+    policy = MaxInFlight(2)
+    assert policy.admit(PipelineData(), make_load(in_flight=1))
+    assert not policy.admit(PipelineData(), make_load(in_flight=2))
+
+
+def test_early_drop():
+    policy = EarlyDrop(min_depth=2, max_depth=6, max_probability=0.5, seed=0)
+    assert policy.rejection_probability(make_load(queue_depth=1)) == 0
+    assert policy.rejection_probability(make_load(queue_depth=4)) == 0.25
+    assert policy.rejection_probability(make_load(queue_depth=6)) == 1
+    admitted = [
+        policy.admit(PipelineData(), make_load(queue_depth=4)) for _ in range(400)
+    ]
+    assert 0.65 < sum(admitted) / len(admitted) < 0.85
+
+    policy = EarlyDrop(min_latency=0.1, max_latency=0.2)
+    assert policy.rejection_probability(make_load()) == 0
+    assert policy.rejection_probability(make_load(latency=0.15)) == pytest.approx(0.5)
+    with pytest.raises(ValueError):
+        EarlyDrop(min_depth=1)
@@ -35,6 +35,11 @@ class TestPipelineAutomation:
         assert self.automation.pipeline == self.mock_inteface_pipeline
         assert self.automation._loop_period == self.period
 
+    def test_period(self):
+        assert self.automation.period == self.period
+        self.automation.period = 0.1
+        assert self.automation._loop_period == 0.1
+
     def test_start_stop(self):
         self.automation.start()
         assert self.automation._loop_is_start.is_set()
@@ -60,3 +65,17 @@ class TestPipelineAutomation:
                 delta = times[i + 1] - times[i]
                 # make sure the cycle period is within 10% error
                 assert pytest.approx(self.period, rel=0.1) == delta
+
+    def test_pause_resume(self):
+        self.automation.period = 0.05
+        self.automation.start()
+        time.sleep(0.2)
+        self.automation.pause()
+        time.sleep(0.1)
+        paused_count = self.mock_inteface_pipeline.data_count
+        time.sleep(0.3)
+        assert self.mock_inteface_pipeline.data_count == paused_count
+        self.automation.resume()
+        time.sleep(0.2)
+        assert self.mock_inteface_pipeline.data_count > paused_count
+        self.automation.stop()
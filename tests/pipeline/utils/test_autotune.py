@@ -0,0 +1,82 @@
+import math
+
+from pystream.pipeline.serial_pipeline.pipeline import SerialPipeline
+from pystream.pipeline.utils.autotune import (
+    TuningConfig,
+    TuningConstraints,
+    TuningResult,
+    benchmark,
+    candidate_configs,
+    fusable_costs,
+    measure_stage_costs,
+    select_best,
+)
+from pystream.stage.branch import Branches
+from tests.conftest import DummyStage
+
+
+def make_result(throughput, latency, feasible=True):
+    return TuningResult(TuningConfig(), throughput, latency, 2, [], feasible)
+
+
+def test_constraints():
+    constraints = TuningConstraints(max_latency=0.1, min_throughput=10, max_threads=3)
+    assert constraints.allows(throughput=20, latency=0.05, threads=3)
+    assert not constraints.allows(throughput=20, latency=0.2, threads=3)
+    assert not constraints.allows(throughput=5, latency=0.05, threads=3)
+    assert not constraints.allows(throughput=20, latency=0.05, threads=4)
+    assert not constraints.allows(throughput=20, latency=float("nan"), threads=3)
+    assert TuningConstraints().allows(throughput=0, latency=float("nan"), threads=9)
+
+
+def test_measure_stage_costs():
+    pipeline = SerialPipeline(
+        [
+            DummyStage(val=1, wait=0.05),
+            lambda x: x,
+            Branches({"A": lambda x: x}, join=lambda outputs: outputs["A"]),
+        ],
+        ["Slow", "Fast", "Branch"],
+    )
+    costs = measure_stage_costs(pipeline, [[], []])
+    assert set(costs.keys()) == {"Slow", "Fast", "Branch"}
+    assert costs["Slow"] >= 0.05
+    assert costs["Fast"] < 0.01
+    # Branches cannot be fused
+    assert fusable_costs(pipeline, costs) == [costs["Slow"], costs["Fast"], None]
+
+
+def test_candidate_configs():
+    configs = candidate_configs([0.1, 0.1, None, 0.1], queue_sizes=[1, 2])
+    assert configs[0].mode == "serial"
+    # No fusion, and fusion of the first two stages
+    assert [(c.queue_size, c.fuse_threshold) for c in configs[1:]] == [
+        (1, None),
+        (2, None),
+        (1, 0.2),
+        (2, 0.2),
+    ]
+
+
+def test_benchmark():
+    pipeline = SerialPipeline([DummyStage(val=1, wait=0.02)], ["Stage"])
+    samples = [[], []]
+    throughput, latency, finished = benchmark(pipeline, samples)
+    assert finished
+    assert 0 < throughput <= 50
+    assert latency >= 0.02
+    # The samples are copied
+    assert samples == [[], []]
+
+
+def test_select_best():
+    results = [
+        make_result(10, 0.3),
+        make_result(30, 0.2),
+        make_result(50, 0.1, feasible=False),
+        make_result(20, 0.05),
+    ]
+    assert select_best(results, "throughput") is results[1]
+    assert select_best(results, "latency") is results[3]
+    assert select_best([results[2]], "throughput") is None
+    assert math.isnan(make_result(0, float("nan")).latency)
@@ -0,0 +1,103 @@
+import pytest
+
+from pystream.pipeline.utils.controller import LatencyController
+
+
+class MockPipeline:
+    def __init__(self):
+        self.loop_period = 0.01
+        self.latency_budget = None
+        self.expired = 0
+
+    def set_latency_budget(self, latency_budget):
+        self.latency_budget = latency_budget
+
+    def count_expired(self):
+        return self.expired
+
+
+class MockMonitor:
+    def __init__(self):
+        self.num_records = 0
+        self.latency = 0.0
+        self.last = None
+
+    def live_latency(self, q=99, last=None):
+        self.last = last
+        return self.latency
+
+
+class TestLatencyController:
+    @pytest.fixture(autouse=True)
+    def _create_controller(self):
+        self.pipeline = MockPipeline()
+        self.monitor = MockMonitor()
+        self.controller = LatencyController(
+            target=0.1, interval=0.05, period_step=0.005, backoff=2, min_samples=5
+        )
+        self.controller._pipeline = self.pipeline
+        self.controller._monitor = self.monitor
+
+    def feed(self, num_records, latency, num_expired=0):
+        self.monitor.num_records += num_records
+        self.monitor.latency = latency
+        self.pipeline.expired += num_expired
+
+    def test_not_enough_samples(self):
+        self.feed(4, 1.0)
+        assert self.controller.step() is None
+        assert self.pipeline.loop_period == 0.01
+
+    def test_slow_down(self):
+        self.feed(10, 0.2)
+        decision = self.controller.step()
+        assert self.monitor.last == 10
+        assert decision.action == "slow_down"
+        assert self.pipeline.loop_period == pytest.approx(0.02)
+        assert self.pipeline.latency_budget == 0.1
+
+    def test_speed_up(self):
+        self.pipeline.latency_budget = 0.1
+        self.feed(10, 0.05)
+        decision = self.controller.step()
+        assert decision.action == "speed_up"
+        assert self.pipeline.loop_period == pytest.approx(0.005)
+        assert self.pipeline.latency_budget is None
+
+        self.feed(10, 0.05)
+        self.controller.step()
+        assert self.pipeline.loop_period == 0.0
+
+    def test_late_data(self):
+        # The completed data is fast, but too much data misses the deadline
+        self.feed(5, 0.05, num_expired=5)
+        decision = self.controller.step()
+        assert self.monitor.last == 5
+        assert decision.action == "slow_down"
+        assert self.pipeline.latency_budget == 0.1
+
+    def test_relax(self):
+        self.pipeline.latency_budget = 0.1
+        self.feed(0, 0.0, num_expired=4)
+        assert self.controller.step() is None
+        # All data has been dropped, so the budget cannot be met
+        self.feed(0, 0.0, num_expired=4)
+        decision = self.controller.step()
+        assert decision.action == "relax"
+        assert self.pipeline.loop_period == pytest.approx(0.02)
+        assert self.pipeline.latency_budget is None
+
+    def test_hold(self):
+        self.feed(10, 0.09)
+        assert self.controller.step().action == "hold"
+        assert self.pipeline.loop_period == 0.01
+        assert len(self.controller.get_decisions()) == 1
+
+    def test_start_stop(self):
+        controller = LatencyController(target=0.1, interval=0.05, min_samples=1)
+        controller.start(self.pipeline, self.monitor)
+        self.feed(10, 0.2)
+        controller._stopper.wait(0.2)
+        controller.stop()
+        assert len(controller.get_decisions()) >= 1
+        assert self.pipeline.loop_period > 0.01
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+from pystream.pipeline.utils.prefetch import (
+    InputSource,
+    PrefetchInputSource,
+    create_input_source,
+)
+from pystream.utils.errors import InputExhausted
+
+
+NUM_ITEMS = 5
+
+
+def test_input_source_callable():
+    source = InputSource(lambda: "data")
+    for _ in range(3):
+        assert source.get() == "data"
+    assert not source.exhausted
+
+
+def test_input_source_iterable():
+    source = InputSource(range(NUM_ITEMS))
+    assert [source.get() for _ in range(NUM_ITEMS)] == list(range(NUM_ITEMS))
+    with pytest.raises(InputExhausted):
+        source.get()
+    assert source.exhausted
+
+
+def test_create_input_source():
+    assert type(create_input_source(list)) is InputSource
+    assert isinstance(create_input_source(list, prefetch=2), PrefetchInputSource)
+
+
+class TestPrefetchInputSource:
+    @pytest.fixture(autouse=True)
+    def _create_source(self):
+        self.generated = []
+
+        def _generator():
+            for i in range(NUM_ITEMS):
+                self.generated.append(i)
+                yield i
+
+        self.prefetch = 2
+        self.source = PrefetchInputSource(_generator(), size=self.prefetch)
+        yield
+        self.source.stop()
+
+    def test_prefetch(self):
+        self.source.start()
+        time.sleep(0.3)
+        # One item is held by the thread while waiting for a free slot
+        assert len(self.generated) == self.prefetch + 1
+        assert self.source.get() == 0
+
+    def test_exhausted(self):
+        ret = [self.source.get() for _ in range(NUM_ITEMS)]
+        assert ret == list(range(NUM_ITEMS))
+        with pytest.raises(InputExhausted):
+            self.source.get()
+        assert self.source.exhausted
+
+    def test_stop_and_resume(self):
+        self.source.start()
+        time.sleep(0.3)
+        self.source.stop()
+        ret = [self.source.get() for _ in range(NUM_ITEMS)]
+        assert ret == list(range(NUM_ITEMS))
+
+    def test_source_error(self):
+        def _failing():
+            yield 0
+            raise RuntimeError("source failed")
+
+        source = PrefetchInputSource(_failing(), size=1)
+        assert source.get() == 0
+        with pytest.raises(RuntimeError):
+            source.get()
+        assert source.exhausted
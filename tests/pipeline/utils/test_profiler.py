@@ -9,7 +9,12 @@ import pytest
 
 import pystream.pipeline.utils.profiler as _profiler
 from pystream.data.profiler_data import ProfileData, TimeProfileData
-from pystream.pipeline.utils.profiler import ProfileDBHandler, ProfilerHandler
+from pystream.pipeline.utils.profiler import (
+    ProfileDBHandler,
+    ProfilerHandler,
+    read_latency_records,
+)
+from pystream.utils.errors import ProfilingError
 from pystream.utils.general import (
     _PIPELINE_NAME_IN_PROFILE,
     _PROFILE_LEVEL_SEPARATOR,
@@ -206,3 +211,38 @@ class TestProfilerHandler:
             else:
                 assert pytest.approx(latencies[k], rel=0.001) == latency
             assert pytest.approx(throughputs[k], rel=0.001) == throughput
+
+    def test_shared_stage_runs(self):
+        # Outputs of a flat-map stage end the stages before it at the same time
+        data = generate_test_profile_data(num_data=3, num_stages=2, latency=0.5)
+        data[1].data.substage["0"].ended = data[0].data.substage["0"].ended
+        for d in data:
+            self.profiler_handler.process_data(d)
+        _, throughputs = self.profiler_handler.summarize()
+        name = f"{_PIPELINE_NAME_IN_PROFILE}{_PROFILE_LEVEL_SEPARATOR}0"
+        assert np.isfinite(throughputs[name])
+
+    def test_live_latency(self):
+        assert np.isnan(self.profiler_handler.live_latency())
+        data = generate_test_profile_data(num_data=5, num_stages=2, latency=0.5)
+        for d in data:
+            self.profiler_handler.process_data(d)
+        assert self.profiler_handler.num_records == 5
+        assert pytest.approx(self.profiler_handler.live_latency(), rel=0.001) == 1.0
+        assert pytest.approx(self.profiler_handler.live_latency(last=2)) == 1.0
+
+    def test_latency_records(self):
+        data = generate_test_profile_data(num_data=4, num_stages=2, latency=0.5)
+        for d in data:
+            self.profiler_handler.process_data(d)
+        records = self.profiler_handler.latency_records()
+        name = f"{_PIPELINE_NAME_IN_PROFILE}{_PROFILE_LEVEL_SEPARATOR}1"
+        assert set(records.keys()) == {
+            _PIPELINE_NAME_IN_PROFILE,
+            f"{_PIPELINE_NAME_IN_PROFILE}{_PROFILE_LEVEL_SEPARATOR}0",
+            name,
+        }
+        np.testing.assert_allclose(records[name], [0.5, 0.5, 0.5])
+        assert read_latency_records().keys() == records.keys()
+        with pytest.raises(ProfilingError):
+            read_latency_records(self.db_path + ".missing")
@@ -0,0 +1,52 @@
+from queue import Full, Queue
+from threading import Thread
+import time
+
+import pytest
+
+from pystream.data.pipeline_data import PipelineData
+from pystream.pipeline.utils.queues import PriorityStageQueue, resize_queue
+
+
+def make_data(value, priority):
+    return PipelineData(data=value, priority=priority)
+
+
+def test_priority_order():
+    queue = PriorityStageQueue(maxsize=5, max_wait=None)
+    for value, priority in [("a", 0), ("b", 1), ("c", 0), ("d", 1), ("e", 2)]:
+        queue.put(make_data(value, priority))
+    with pytest.raises(Full):
+        queue.put(make_data("f", 0), block=False)
+    assert [queue.get().data for _ in range(5)] == ["e", "b", "d", "a", "c"]
+    assert queue.empty()
+
+
+def test_starvation_protection():
+    queue = PriorityStageQueue(max_wait=0.1)
+    queue.put(make_data("low", 0))
+    queue.put(make_data("high", 1))
+    assert queue.get().data == "high"
+    queue.put(make_data("high", 1))
+    time.sleep(0.15)
+    queue.put(make_data("high", 1))
+    assert queue.get().data == "low"
+    assert queue.qsize() == 2
+
+
+def test_resize_queue():
+    queue = Queue(maxsize=1)
+    queue.put(make_data("a", 0))
+    # A blocked producer is released when the queue grows
+    producer = Thread(target=queue.put, args=(make_data("b", 0),))
+    producer.start()
+    time.sleep(0.1)
+    assert producer.is_alive()
+    resize_queue(queue, 2)
+    producer.join(timeout=1)
+    assert not producer.is_alive()
+    assert queue.qsize() == 2
+    resize_queue(queue, 1)
+    assert queue.qsize() == 2
+    with pytest.raises(Full):
+        queue.put(make_data("c", 0), block=False)
@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+from pystream.pipeline.parallel_thread_pipeline.pipeline import ParallelThreadPipeline
+from pystream.pipeline.utils.simulator import (
+    PipelineSimulator,
+    SimulatedLayout,
+    SimulatedUnit,
+)
+
+
+@pytest.fixture
+def simulator():
+    return PipelineSimulator(
+        {
+            "MainPipeline": [0.4],
+            "MainPipeline__A": [0.1],
+            "MainPipeline__B": [0.1],
+            "Slow": [0.2],
+        },
+        seed=0,
+    )
+
+
+def test_layout():
+    layout = SimulatedLayout.parallel([["A", "B"], ["C"]], replicas={"C": 2})
+    assert [unit.name for unit in layout.units] == ["A+B", "C"]
+    assert [unit.replicas for unit in layout.units] == [1, 2]
+    serial = SimulatedLayout.serial(["A", "B"])
+    assert serial.synchronous and len(serial.units) == 1
+    pipeline = ParallelThreadPipeline([lambda x: x], ["A"], queue_size=3)
+    layout = SimulatedLayout.of(pipeline)
+    pipeline.cleanup()
+    assert layout.queue_size == 3
+    assert [unit.stages for unit in layout.units] == [["A"]]
+
+
+def test_serial(simulator: PipelineSimulator):
+    result = simulator.run(SimulatedLayout.serial(["A", "B"]), num_data=10)
+    assert result.completed == 10
+    assert pytest.approx(result.throughput) == 5.0
+    assert pytest.approx(result.latency["mean"]) == 0.2
+    assert result.utilization["A+B"] == pytest.approx(1.0)
+
+
+def test_parallel(simulator: PipelineSimulator):
+    result = simulator.run(SimulatedLayout.parallel([["A"], ["B"]]), num_data=10)
+    assert pytest.approx(result.throughput) == 10 / 1.1
+    assert result.latency["p50"] == pytest.approx(0.4)
+    assert result.queue_occupancy["A"]["max"] == 1
+    assert result.queue_occupancy["B"]["max"] == 0
+
+    # The slow stage is the bottleneck unless it is replicated
+    layout = SimulatedLayout.parallel([["A"], ["Slow"]])
+    slow = simulator.run(layout, num_data=20)
+    layout.units[1] = SimulatedUnit(["Slow"], replicas=2)
+    replicated = simulator.run(layout, num_data=20)
+    assert slow.throughput == pytest.approx(20 / 4.1)
+    assert replicated.throughput > 1.5 * slow.throughput
+
+
+def test_input_rate(simulator: PipelineSimulator):
+    layout = SimulatedLayout.parallel([["A"], ["B"]])
+    result = simulator.run(layout, num_data=10, input_rate=2)
+    assert result.latency["max"] == pytest.approx(0.2)
+    assert result.utilization["A"] < 0.3
+    result = simulator.run(layout, num_data=50, input_rate=2, poisson=True)
+    assert result.completed == 50
+
+    layout = SimulatedLayout.parallel([["A"]], block_input=False)
+    result = simulator.run(layout, num_data=20, input_rate=20)
+    assert result.rejected > 0
+    assert result.completed + result.rejected == 20
+    with pytest.raises(ValueError):
+        simulator.run(layout)
+    with pytest.raises(ValueError):
+        simulator.run(SimulatedLayout.serial(["Unknown"]))
+
+
+def test_validate():
+    pipeline = ParallelThreadPipeline(
+        [lambda x: time.sleep(0.05) or x, lambda x: time.sleep(0.05) or x],
+        ["A", "B"],
+    )
+    simulator = PipelineSimulator({"A": [0.05], "B": [0.05]})
+    validation = simulator.validate(pipeline, list(range(10)), timeout=5)
+    pipeline.cleanup()
+    assert validation.predicted.completed == 10
+    assert abs(validation.throughput_error) < 0.5
+    assert abs(validation.latency_error) < 0.5
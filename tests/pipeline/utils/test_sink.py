@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from pystream.pipeline.utils.sink import ResultSink
+
+
+class TestResultSink:
+    @pytest.fixture(autouse=True)
+    def _init_sink(self):
+        self.received = []
+
+    def test_put(self):
+        sink = ResultSink(self.received.append)
+        for i in range(5):
+            sink.put(i)
+        assert self.received == list(range(5))
+
+    def test_batch_size(self):
+        sink = ResultSink(self.received.append, batch_size=2)
+        for i in range(5):
+            sink.put(i)
+        assert self.received == [[0, 1], [2, 3]]
+        sink.close()
+        assert self.received == [[0, 1], [2, 3], [4]]
+
+    def test_threaded(self):
+        sink = ResultSink(self.received.append, threaded=True)
+        sink.start()
+        for i in range(5):
+            sink.put(i)
+        sink.close()
+        assert self.received == list(range(5))
+
+    def test_threaded_batch_period(self):
+        sink = ResultSink(self.received.append, batch_period=0.2, threaded=True)
+        sink.start()
+        sink.put(0)
+        sink.put(1)
+        time.sleep(0.1)
+        assert self.received == []
+        time.sleep(0.3)
+        assert self.received == [[0, 1]]
+        sink.close()
+
+    def test_callback_exception(self):
+        def _failing(x):
+            raise RuntimeError("sink failed")
+
+        sink = ResultSink(_failing)
+        sink.put(0)
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+from pystream.pipeline.utils.watchdog import StageWatchdog
+
+
+class MockStage:
+    def __init__(self, name, time_budget=0.1):
+        self.name = name
+        self.time_budget = time_budget
+        self.busy_since = None
+
+
+class MockPipeline:
+    def __init__(self, stages, releasable=True):
+        self.stages = stages
+        self.releasable = releasable
+        self.released = []
+
+    def watched_stages(self):
+        return self.stages
+
+    def release_stalled(self, stage, drop):
+        if not self.releasable:
+            return False
+        self.released.append((stage.name, drop))
+        stage.busy_since = None
+        return True
+
+
+def test_report():
+    events = []
+    stalled, busy, idle = MockStage("Stalled"), MockStage("Busy"), MockStage("Idle")
+    stalled.busy_since = time.perf_counter() - 0.2
+    busy.busy_since = time.perf_counter()
+    pipeline = MockPipeline([stalled, busy, idle])
+    watchdog = StageWatchdog(callbacks=[events.append])
+    detected = watchdog.check(pipeline)
+    assert [event.stage for event in detected] == ["Stalled"]
+    assert detected[0].elapsed >= 0.2
+    assert detected[0].action == "report"
+    assert events == detected
+    assert pipeline.released == []
+    # The same data is reported once
+    assert watchdog.check(pipeline) == []
+    stalled.busy_since = time.perf_counter() - 0.2
+    assert len(watchdog.check(pipeline)) == 1
+    assert watchdog.stall_counts() == {"Stalled": 2}
+    assert len(watchdog.get_events()) == 2
+
+
+@pytest.mark.parametrize("action", ["drop", "bypass"])
+def test_release(action):
+    stage = MockStage("Stalled")
+    stage.busy_since = time.perf_counter() - 0.2
+    pipeline = MockPipeline([stage])
+    watchdog = StageWatchdog(action=action)
+    assert watchdog.check(pipeline)[0].action == action
+    assert pipeline.released == [("Stalled", action == "drop")]
+
+
+def test_not_released():
+    stage = MockStage("Stalled")
+    stage.busy_since = time.perf_counter() - 0.2
+    watchdog = StageWatchdog(action="drop")
+    assert watchdog.check(MockPipeline([stage], releasable=False)) == []
+    assert watchdog.stall_counts() == {}
+
+
+def test_start_stop():
+    stage = MockStage("Stalled", time_budget=0.05)
+    pipeline = MockPipeline([stage])
+    watchdog = StageWatchdog(action="drop", interval=0.01)
+    watchdog.start(pipeline)
+    stage.busy_since = time.perf_counter()
+    time.sleep(0.2)
+    watchdog.stop()
+    assert pipeline.released == [("Stalled", True)]
+    with pytest.raises(ValueError):
+        StageWatchdog(action="restart")
@@ -0,0 +1,25 @@
+from pystream.stage.branch import Branches
+from tests.conftest import DummyStage
+
+
+def test_branches_call():
+    stage_a = DummyStage(val="a", wait=0)
+    stage_b = DummyStage(val="b", wait=0)
+    branches = Branches(
+        {"A": [lambda x: x + ["a1"], lambda x: x + ["a2"]], "B": (stage_b, "StageB")},
+        join=lambda outputs: outputs,
+    )
+    assert branches.branches["B"] == [(stage_b, "StageB")]
+    assert len(branches.branches["A"]) == 2
+    ret = branches([])
+    assert ret["A"] == ["a1", "a2"]
+    assert ret["B"] == ["b"]
+
+
+def test_branches_cleanup():
+    stage_a = DummyStage(val="a", wait=0)
+    join = DummyStage(val="join", wait=0)
+    branches = Branches({"A": stage_a}, join=join)
+    branches.cleanup()
+    assert stage_a.val is None
+    assert join.val is None
@@ -1,14 +1,34 @@
+from threading import Thread
+import time
+
 import pytest
 from typing import Type
 
 import pystream.stage.container as _container
-from pystream.data.pipeline_data import PipelineData
+from pystream.data.pipeline_data import DROP, PipelineData
 from pystream.pipeline.pipeline_base import PipelineBase
 from pystream.stage.final_stage import FinalStage
-from pystream.stage.container import PipelineContainer, StageContainer
-from pystream.utils.errors import InvalidStageName
-from pystream.utils.general import _FINAL_STAGE_NAME, _PIPELINE_NAME_IN_PROFILE
-from tests.conftest import DummyStage
+from pystream.stage.branch import Branches
+from pystream.stage.flat_map import FlatMap
+from pystream.stage.container import (
+    BranchContainer,
+    BranchTail,
+    FlatMapContainer,
+    FusedStage,
+    PipelineContainer,
+    StageContainer,
+    collect_ready_times,
+    collect_stage_stats,
+    containerize_stage,
+    find_stage,
+)
+from pystream.utils.errors import InvalidStageName, PipelineInitiationError
+from pystream.utils.general import (
+    _FINAL_STAGE_NAME,
+    _JOIN_STAGE_NAME,
+    _PIPELINE_NAME_IN_PROFILE,
+)
+from tests.conftest import DummyStage, SetupStage
 
 
 DEFAULT_NAME = "DefaultName"
@@ -92,6 +112,68 @@ class TestStageContainer:
         cont.cleanup()
         assert self.stage.val is None
 
+    def test_prepare(self):
+        stage = SetupStage(setup_wait=0.1)
+        container = StageContainer(stage, self.name)
+        assert container.ready_time is None
+        container.prepare(["a", "b"])
+        assert stage.is_setup
+        assert stage.warmup_samples == ["a", "b"]
+        assert container.ready_time >= 0.1
+        container.prepare(["c"])
+        assert stage.warmup_samples == ["a", "b"]
+
+    def test_replace(self):
+        old_stage = DummyStage(val=1, wait=0.3)
+        new_stage = SetupStage(val=2, setup_wait=0)
+        container = StageContainer(old_stage, self.name)
+        worker = Thread(target=container, args=(PipelineData(data=[]),))
+        worker.start()
+        time.sleep(0.1)
+        container.replace(new_stage, warmup_samples=[[]])
+        # The old stage finishes its data before it is cleaned up
+        assert not worker.is_alive()
+        assert old_stage.val is None
+        assert new_stage.is_setup
+        assert new_stage.warmup_samples == [[]]
+        assert new_stage.name == self.name
+        assert container(PipelineData(data=[])).data == [2]
+
+    def test_replace_released(self):
+        old_stage = DummyStage(val=1, wait=1.0)
+        container = StageContainer(old_stage, self.name)
+        worker = Thread(target=container, args=(PipelineData(data=[]),))
+        worker.start()
+        time.sleep(0.1)
+        container.release_thread(worker.ident)
+        # The released call is not waited for
+        start = time.perf_counter()
+        container.replace(SetupStage(val=2, setup_wait=0))
+        assert time.perf_counter() - start < 0.5
+        assert worker.is_alive()
+        worker.join()
+        assert container(PipelineData(data=[])).data == [2]
+
+    def test_replace_invalid(self):
+        container = StageContainer(self.stage, self.name)
+        with pytest.raises(PipelineInitiationError):
+            container.replace(FlatMap(lambda x: [x]))
+        with pytest.raises(PipelineInitiationError):
+            FlatMapContainer(FlatMap(lambda x: [x])).replace(dummy_stage_func)
+
+    def test_drop(self):
+        cont = StageContainer(lambda x: DROP, self.name)
+        ret = cont(PipelineData(data=[]))
+        assert ret.is_dropped
+        assert ret.dropped_by == self.name
+        assert ret.drop_reason == "filtered"
+        assert ret.data == []
+        assert ret.profile.is_at_main
+
+        # Dropped data is skipped
+        cont = StageContainer(self.stage, self.name)
+        assert cont(ret).data == []
+
     def test_name_func(self, monkeypatch):
         monkeypatch.setattr(_container, "get_default_stage_name", mock_default_name)
         cont = StageContainer(dummy_stage_func)
@@ -117,3 +199,190 @@ class TestPipelineContainer(TestStageContainer):
         data = PipelineData(data=[])
         ret = cont(data)
         assert isinstance(cont.stage.data, PipelineData)  # type: ignore
+
+
+def test_containerize_stage():
+    assert type(containerize_stage(dummy_stage_func)) is StageContainer
+    assert type(containerize_stage(MockPipeline())) is PipelineContainer
+    branches = Branches({"A": dummy_stage_func}, join=lambda x: x)
+    assert type(containerize_stage(branches)) is BranchContainer
+
+
+class TestFlatMapContainer:
+    def test_iterate(self):
+        cont = FlatMapContainer(FlatMap(lambda x: [x, x + 1]), "Split")
+        data = PipelineData(data=1)
+        data.profile.tick_start(_PIPELINE_NAME_IN_PROFILE)
+        outputs = list(cont.iterate(data))
+        assert [out.data for out in outputs] == [1, 2]
+        for out in outputs:
+            assert out.profile.is_at_main
+            assert out.profile.data.started == data.profile.data.started
+            assert out.profile.data.substage["Split"].ended is not None
+        assert outputs[0].profile is not outputs[1].profile
+
+    def test_absorb(self):
+        cont = FlatMapContainer(FlatMap(lambda x: []), "Absorb")
+        data = PipelineData(data=1)
+        outputs = list(cont.iterate(data))
+        assert outputs == [data]
+        assert data.drop_reason == "absorbed"
+        assert data.profile.is_at_main
+
+    def test_invalid(self):
+        with pytest.raises(PipelineInitiationError):
+            FlatMapContainer(dummy_stage_func)
+        with pytest.raises(PipelineInitiationError):
+            BranchContainer(Branches({"A": FlatMap(lambda x: [x])}, dict))
+
+
+class TestBranchContainer:
+    @pytest.fixture(autouse=True)
+    def _init_stage(self, dummy_stage: Type[DummyStage]) -> None:
+        self.stages = {
+            "A": [dummy_stage(val="a1", wait=0), dummy_stage(val="a2", wait=0)],
+            "B": [dummy_stage(val="b1", wait=0)],
+        }
+        self.branches = Branches(
+            {k: [(s, s.val) for s in v] for k, v in self.stages.items()},
+            join=lambda outputs: outputs,
+        )
+        self.name = "Test_Name"
+
+    def test_init(self):
+        cont = BranchContainer(self.branches, self.name)
+        assert list(cont.branch_stages.keys()) == ["A", "B"]
+        assert len(cont.branch_stages["A"]) == 2
+        assert isinstance(cont.branch_stages["A"][-1], BranchTail)
+        assert [s.name for s in cont.branch_stages["A"]] == ["a1", "a2"]
+
+    def test_default_names_kept(self):
+        branches = Branches({"A": dummy_stage_func}, dict)
+        first = BranchContainer(branches, self.name)
+        second = BranchContainer(branches, self.name)
+        assert first.branch_stages["A"][0].name == second.branch_stages["A"][0].name
+
+    def test_invalid_branches(self):
+        with pytest.raises(InvalidStageName):
+            BranchContainer(Branches({_JOIN_STAGE_NAME: dummy_stage_func}, dict))
+        with pytest.raises(InvalidStageName):
+            BranchContainer(Branches({"Branch-A": dummy_stage_func}, dict))
+        with pytest.raises(PipelineInitiationError):
+            BranchContainer(Branches({"A": []}, dict))
+        with pytest.raises(PipelineInitiationError):
+            BranchContainer(dummy_stage_func)
+
+    def test_call(self):
+        cont = BranchContainer(self.branches, self.name)
+        data = PipelineData(data=[])
+        ret = cont(data)
+        assert ret.data["A"] == ret.data["B"]
+        assert set(ret.data["A"]) == {"a1", "a2", "b1"}
+        assert ret.profile.is_at_main
+        time_data = ret.profile.data.substage[self.name]
+        assert time_data.started is not None and time_data.ended is not None
+        assert set(time_data.substage.keys()) == {"A", "B", _JOIN_STAGE_NAME}
+        assert set(time_data.substage["A"].substage.keys()) == {"a1", "a2"}
+        for branch_name in ["A", "B"]:
+            assert time_data.substage[branch_name].started is not None
+            assert time_data.substage[branch_name].ended is not None
+
+    def test_drop(self):
+        branches = Branches(
+            {"A": dummy_stage_func, "B": [(lambda x: DROP, "Filter")]}, join=dict
+        )
+        cont = BranchContainer(branches, self.name)
+        ret = cont(PipelineData(data=[]))
+        assert ret.is_dropped
+        assert ret.dropped_by == f"{self.name}__B__Filter"
+        assert ret.data == []
+        assert ret.profile.is_at_main
+
+    def test_cleanup(self):
+        cont = BranchContainer(self.branches, self.name)
+        cont.cleanup()
+        for stages in self.stages.values():
+            for stage in stages:
+                assert stage.val is None
+
+
+class StatsStage(DummyStage):
+    def stats(self):
+        return {"count": self.val}
+
+
+def test_collect_stage_stats():
+    child = MockPipeline()
+    child.stages = [StageContainer(StatsStage(val=2), "Inner"), child.final_stage]
+    branches = Branches({"A": [(StatsStage(val=3), "InA")]}, join=dict)
+    stages = [
+        StageContainer(StatsStage(val=1), "Top"),
+        StageContainer(dummy_stage_func, "Plain"),
+        PipelineContainer(child, "Child"),
+        BranchContainer(branches, "Branch"),
+        FinalStage(None),
+    ]
+    assert collect_stage_stats(stages) == {
+        "Top": {"count": 1},
+        "Child": child.final_stage.stats(),
+        "Child__Inner": {"count": 2},
+        "Branch__A__InA": {"count": 3},
+    }
+
+
+def test_collect_ready_times():
+    branch_stage = SetupStage(setup_wait=0)
+    stages = [
+        StageContainer(SetupStage(setup_wait=0), "First"),
+        BranchContainer(
+            Branches(
+                {"Left": (branch_stage, "Inner"), "Right": (dummy_stage_func, "Plain")},
+                join=list,
+            ),
+            "Branch",
+        ),
+        FinalStage(MockProfilerHandler()),
+    ]
+    assert collect_ready_times(stages)["First"] is None
+    for stage in stages[:2]:
+        stage.prepare(["sample"])
+    ready_times = collect_ready_times(stages)
+    assert set(ready_times.keys()) == {
+        "First",
+        "Branch",
+        "Branch__Left__Inner",
+        "Branch__Right__Plain",
+    }
+    assert all(t is not None for t in ready_times.values())
+    assert branch_stage.warmup_samples == ["sample"]
+
+
+def test_find_stage():
+    inner = StageContainer(dummy_stage_func, "Inner")
+    branches = BranchContainer(
+        Branches({"Left": (dummy_stage_func, "Inner")}, join=list), "Branch"
+    )
+    stages = [inner, branches, FinalStage(MockProfilerHandler())]
+    assert find_stage(stages, "Inner") is inner
+    found = find_stage(stages, "Branch__Left__Inner")
+    assert found is branches.branch_stages["Left"][0].stage
+    assert find_stage(stages, "Branch") is branches
+    assert find_stage(stages, "Branch__Right__Inner") is None
+    assert find_stage(stages, "Missing") is None
+
+
+def test_fused_stage():
+    first, second = SetupStage(val=1, setup_wait=0), SetupStage(val=2, setup_wait=0)
+    fused = FusedStage(
+        [StageContainer(first, "First"), StageContainer(second, "Second")]
+    )
+    assert fused.name == "First+Second"
+    fused.prepare(["sample"])
+    assert first.is_setup and second.is_setup
+    assert second.warmup_samples == ["sample"]
+    data = fused(PipelineData(data=[]))
+    assert data.data == [1, 2]
+    assert "First" in data.profile.data.substage
+    assert "Second" in data.profile.data.substage
+    fused.cleanup()
+    assert first.val is None and second.val is None
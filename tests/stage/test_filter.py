@@ -0,0 +1,8 @@
+from pystream.data.pipeline_data import DROP
+from pystream.stage.filter import Filter
+
+
+def test_filter():
+    stage = Filter(lambda x: x > 0)
+    assert stage(1) == 1
+    assert stage(-1) is DROP
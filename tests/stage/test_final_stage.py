@@ -1,7 +1,7 @@
 import pytest
 
 from pystream.data.pipeline_data import PipelineData
-from pystream.data.profiler_data import ProfileData
+from pystream.data.profiler_data import LatencyWindow, ProfileData
 from pystream.stage.final_stage import FinalStage
 from pystream.utils.general import _FINAL_STAGE_NAME, _PIPELINE_NAME_IN_PROFILE
 
@@ -14,6 +14,14 @@ class MockProfilerHandler:
         self.data = data
 
 
+class MockSink:
+    def __init__(self):
+        self.items = []
+
+    def put(self, item) -> None:
+        self.items.append(item)
+
+
 class TestFinalStage:
     @pytest.fixture(autouse=True)
     def _init_stage(self) -> None:
@@ -35,3 +43,55 @@ class TestFinalStage:
         ret = self.stage(data)
         assert ret.profile.data.started is None
         assert ret.profile.data.ended is None
+
+    def test_sinks(self):
+        sink = MockSink()
+        stage = FinalStage(self.profiler, [sink])
+        stage(PipelineData(data="main"))
+        assert sink.items == ["main"]
+
+        data = PipelineData(data="child")
+        data.profile.current_stages = ["test"]
+        stage(data)
+        assert sink.items == ["main"]
+
+    def test_drop(self):
+        sink = MockSink()
+        stage = FinalStage(self.profiler, [sink])
+        stage(PipelineData(data="kept"))
+        data = PipelineData(data="dropped")
+        data.drop("Filter", "filtered")
+        stage(data)
+        assert sink.items == ["kept"]
+        assert self.profiler.data is not data.profile
+        stats = stage.stats()
+        assert stats["completed"] == 1
+        assert stats["dropped"] == 1
+        assert stats["drop_ratio"] == 0.5
+        assert stats["dropped_by"] == {"Filter": 1}
+        assert stats["drop_reasons"] == {"filtered": 1}
+
+    def test_latency_by_priority(self):
+        for priority in [0, 1, 1]:
+            data = PipelineData(data=[], priority=priority)
+            data.profile.tick_start(_PIPELINE_NAME_IN_PROFILE)
+            self.stage(data)
+        latency = self.stage.stats()["latency_by_priority"]
+        assert list(latency.keys()) == [0, 1]
+        assert latency[1]["count"] == 2
+        assert latency[1]["max"] >= latency[1]["mean"] > 0
+
+
+def test_latency_window():
+    window = LatencyWindow(size=3)
+    assert window.summary() == {"count": 0}
+    for latency in [10, 1, 2, 3]:
+        window.add(latency)
+    assert window.summary() == {
+        "count": 4,
+        "mean": 2.0,
+        "p50": 2.0,
+        "p95": pytest.approx(2.9),
+        "max": 3.0,
+    }
+    assert window.percentile(100) == 3.0
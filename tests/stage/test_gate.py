@@ -0,0 +1,95 @@
+import numpy as np
+
+from pystream.data.pipeline_data import PipelineData
+from pystream.stage.container import StageContainer
+from pystream.stage.gate import ChangeGate
+
+
+def finish(pipeline_data):
+    pipeline_data.profile.tick_start("Stage")
+    pipeline_data.profile.tick_end()
+    pipeline_data.profile.tick_end()
+    return pipeline_data
+
+
+def finished_data(data):
+    return finish(PipelineData(data=data))
+
+
+def test_gate_hash():
+    gate = ChangeGate()
+    first = gate(PipelineData(data=[1, 2]))
+    assert not first.bypass
+    # The previous data has not finished, so its output is taken later
+    second = gate(PipelineData(data=[1, 2]))
+    assert second.bypass
+    assert second.reuse is first
+    first.data = "output"
+    finish(first)
+    assert second.take_reused_output()
+    assert second.data == "output"
+    assert second.reuse is None
+
+    gate = ChangeGate()
+    first = gate(finished_data([1, 2]))
+    first.data = "output"
+    second = gate(PipelineData(data=[1, 2]))
+    assert second.bypass
+    assert second.data == "output"
+    assert not gate(PipelineData(data=[1, 3])).bypass
+    assert gate.stats() == {"checked": 3, "skipped": 1, "skip_ratio": 1 / 3}
+
+
+def test_gate_in_flight():
+    gate = ChangeGate()
+    first = gate(PipelineData(data=1))
+    # Data with higher priority may overtake the last data, so it is forwarded
+    assert not gate(PipelineData(data=1, priority=1)).bypass
+    gate = ChangeGate()
+    first = gate(PipelineData(data=1))
+    second = gate(PipelineData(data=1))
+    first.drop("Stage", "filtered")
+    second.take_reused_output()
+    assert (second.dropped_by, second.drop_reason) == ("Stage", "filtered")
+    # The dropped data is not reused anymore
+    assert not gate(PipelineData(data=1)).bypass
+
+    # The last data did not leave the pipeline, e.g. it was lost on the way
+    gate = ChangeGate()
+    first = gate(PipelineData(data=1))
+    second = gate(PipelineData(data=1))
+    first.data = "input"
+    assert not second.take_reused_output()
+    assert second.data == 1
+
+    # Without in-flight reuse, only finished data is reused
+    gate = ChangeGate()
+    gate.reuse_in_flight = False
+    first = gate(PipelineData(data=1))
+    assert not gate(PipelineData(data=1)).bypass
+    finish(gate._last_forwarded)
+    assert gate(PipelineData(data=1)).bypass
+
+
+def test_gate_similarity():
+    frame = np.zeros((16, 16, 3), dtype=np.uint8)
+    gate = ChangeGate(method="similarity", threshold=1.0, step=4)
+    gate(finished_data(frame))
+    noisy = frame.copy()
+    noisy[1, 1] = 255
+    assert gate(PipelineData(data=noisy)).bypass
+    assert not gate(PipelineData(data=frame + 10)).bypass
+    assert not gate(PipelineData(data=np.zeros((8, 8, 3)))).bypass
+
+
+def test_gate_key():
+    gate = ChangeGate(key=lambda x: x["frame"])
+    gate(finished_data({"frame": 1, "time": 0}))
+    assert gate(PipelineData(data={"frame": 1, "time": 1})).bypass
+
+
+def test_bypass_container():
+    container = StageContainer(lambda x: x + 1, "Stage")
+    data = PipelineData(data=1, bypass=True)
+    assert container(data).data == 1
+    assert data.profile.data.substage == {}
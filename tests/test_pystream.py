@@ -7,8 +7,10 @@ def test_version():
 
 
 def test_import():
-    from pystream import Stage, Pipeline, MAIN_PIPELINE_NAME, logger
+    from pystream import Stage, Pipeline, MAIN_PIPELINE_NAME, DROP, logger
     from pystream.functional import func_parallel_thread, func_serial
+    from pystream.functional import func_gather_thread, func_parallel_process
+    from pystream.functional import func_map_chunks
 
 
 def test_constants():
@@ -0,0 +1,30 @@
+import numpy as np
+
+from pystream.utils.hashing import hash_payload
+
+
+def test_hash_payload():
+    data = np.arange(12).reshape(3, 4)
+    assert hash_payload(data) == hash_payload(data.copy())
+    assert hash_payload(data) != hash_payload(data.reshape(4, 3))
+    assert hash_payload(data) != hash_payload(data.astype(np.float32))
+    assert hash_payload(data[:, ::2]) == hash_payload(data[:, ::2].copy())
+
+    assert hash_payload([1, "a", data]) == hash_payload([1, "a", data.copy()])
+    assert hash_payload([1, 2]) != hash_payload((1, 2))
+    assert hash_payload({"a": data}) != hash_payload({"b": data})
+    assert hash_payload(b"abc") != hash_payload("abc")
+    assert hash_payload(None) == hash_payload(None)
+
+
+def test_hash_payload_collision():
+    # Adjacent variable-length fields must not shift into each other
+    assert hash_payload(["abstr", "c"]) != hash_payload(["ab", "strc"])
+    assert hash_payload([b"ab", b"c"]) != hash_payload([b"a", b"bc"])
+    assert hash_payload(("a", 1)) != hash_payload(("a1",))
+    assert hash_payload([np.zeros(2), np.zeros(0)]) != hash_payload(
+        [np.zeros(1), np.zeros(1)]
+    )
+    # Dicts are hashed regardless of the insertion order
+    assert hash_payload({"a": 1, "b": 2}) == hash_payload({"b": 2, "a": 1})
+    assert hash_payload({"a": 1, "b": 2}) != hash_payload({"a": 2, "b": 1})
@@ -0,0 +1,50 @@
+import os
+import sys
+from threading import Thread
+
+import numpy as np
+import pytest
+
+from pystream.utils.placement import (
+    apply_thread_placement,
+    get_thread_placement,
+    limit_pool_threads,
+)
+
+
+linux_only = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="Thread placement needs Linux"
+)
+
+
+def run_in_thread(func, *args):
+    out = {}
+    thread = Thread(target=lambda: out.update(result=func(*args)))
+    thread.start()
+    thread.join()
+    return out["result"]
+
+
+@linux_only
+def test_apply_thread_placement():
+    cpu = min(os.sched_getaffinity(0))
+    nice = os.getpriority(os.PRIO_PROCESS, 0)
+    placement = run_in_thread(apply_thread_placement, [cpu], nice + 1)
+    assert placement["cpus"] == [cpu]
+    assert placement["nice"] == nice + 1
+    assert placement["blas_threads"] is None
+    # Only the placed thread is affected
+    assert get_thread_placement()["nice"] == nice
+
+
+@linux_only
+def test_apply_thread_placement_invalid():
+    cpus = sorted(os.sched_getaffinity(0))
+    placement = run_in_thread(apply_thread_placement, [-1])
+    assert placement["cpus"] == cpus
+
+
+def test_limit_pool_threads():
+    assert np.ones((4, 4)).dot(np.ones(4)).sum() == 16
+    limits = run_in_thread(limit_pool_threads, 1)
+    assert all(value == 1 for value in limits.values())